@@ -1,13 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends
-from datetime import datetime
-from app.models.schemas import StockRequest, AnalysisResponse, ReportRequest
+from fastapi import APIRouter, HTTPException, Depends, Query
+from app.models.schemas import StockRequest, BatchStockRequest, AnalysisResponse, ReportRequest, BatchReportRequest
 from app.services.data_fetcher import AkShareFetcher, StockDataFetcher
 from app.services.analyzer import TechnicalAnalyzer
+from app.services.incremental import IndicatorStateStore
 from app.services.sentiment import SentimentAnalyzer
 from app.services.advisor import InvestmentAdvisor
-from fastapi.responses import HTMLResponse, Response
-from app.services.report_generator import report_generator
+from app.services.pipeline import AnalysisPipeline, DataNotFoundError, StageTimeoutError
+from app.services.result_cache import get_analysis_cache
+from app.services.upstream import CircuitOpenError
+from app.services.history_store import MOVER_METRICS, get_history_store
+from app.services.warmup import get_warmup_scheduler
+from app.services.signal_hub import get_signal_hub
+from app.core.concurrency import run_blocking
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
+from app.core.config import settings
+import json
 import logging
+import os
+from typing import Optional
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -20,6 +30,8 @@ def get_data_fetcher():
     return AkShareFetcher()
 
 def get_analyzer():
+    if settings.incremental_indicators:
+        return TechnicalAnalyzer(IndicatorStateStore(os.path.join(settings.data_dir, "indicators")))
     return TechnicalAnalyzer()
 
 def get_sentiment_analyzer():
@@ -28,79 +40,209 @@ def get_sentiment_analyzer():
 def get_advisor():
     return InvestmentAdvisor()
 
-@router.post("/analyze", response_model=AnalysisResponse)
-async def analyze_stock(
-    request: StockRequest,
+def get_pipeline(
     fetcher: StockDataFetcher = Depends(get_data_fetcher),
     tech_analyzer: TechnicalAnalyzer = Depends(get_analyzer),
     sentiment_analyzer: SentimentAnalyzer = Depends(get_sentiment_analyzer),
     advisor: InvestmentAdvisor = Depends(get_advisor)
+):
+    cache = get_analysis_cache() if settings.analysis_cache_ttl > 0 else None
+    history = get_history_store() if settings.history_enabled else None
+    return AnalysisPipeline(fetcher, tech_analyzer, sentiment_analyzer, advisor, cache=cache, history=history)
+
+def build_pipeline(record_history: bool = True):
+    """
+    Pipeline wired like get_pipeline, for use outside a request (e.g. the warm-up
+    job). With record_history=False its results are not added to the history store.
+    """
+    pipeline = get_pipeline(get_data_fetcher(), get_analyzer(), get_sentiment_analyzer(), get_advisor())
+    if not record_history:
+        pipeline.history = None
+    return pipeline
+
+@router.post("/analyze", response_model=AnalysisResponse)
+async def analyze_stock(
+    request: StockRequest,
+    pipeline: AnalysisPipeline = Depends(get_pipeline)
 ):
     try:
-        # 1. Fetch Data
-        df = fetcher.fetch_history(request.stock_code)
-        if df.empty:
-            raise HTTPException(status_code=404, detail=f"No data found for {request.stock_code}")
-            
-        current_price = fetcher.get_current_price(request.stock_code)
-        
-        # 2. Technical Analysis
-        tech_result = tech_analyzer.analyze(df)
-        
-        # 3. Sentiment Analysis
-        sentiment_result = sentiment_analyzer.analyze(request.stock_code)
-        
-        # 4. Generate Advice
-        advice = advisor.generate_advice(
-            current_price=current_price,
-            tech_score=tech_result.score,
-            sentiment_score=sentiment_result['score'],
-            holding_cost=request.holding_cost
-        )
-        
-        # 5. Construct Response
-        overall_score = (tech_result.score * 0.4) + (sentiment_result['score'] * 0.3) + (20) # +20 base/mock for advice component? 
-        # Actually let's just use weighted average logic
-        # 40% Tech, 30% Sentiment, 20% Advice (Action Strength?), 10% Summary
-        # We'll simplify to just returning the components and let frontend display or normalized score
-        
-        return AnalysisResponse(
-            ticker=request.stock_code,
-            current_price=current_price,
-            analysis_date=datetime.now().isoformat(),
-            
-            tech_score=tech_result.score,
-            tech_signal=tech_result.signal,
-            indicators=tech_result.indicators,
-            
-            sentiment_score=sentiment_result['score'],
-            sentiment_summary=sentiment_result['summary'],
-            news_headlines=sentiment_result['headlines'],
-            
-            advice_action=advice.action,
-            advice_rationale=advice.rationale,
-            entry_point=advice.entry_point,
-            exit_point=advice.exit_point,
-            
-            overall_score=overall_score, # Placeholder calculation
-            summary_text=f"Analysis complete for {request.stock_code}. {advice.action} recommendation."
-        )
-        
-    except HTTPException:
-        raise
+        return await pipeline.run(request.stock_code, request.holding_cost)
+    except DataNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except StageTimeoutError as e:
+        logger.error(f"Analysis timed out: {str(e)}")
+        raise HTTPException(status_code=504, detail=str(e))
+    except CircuitOpenError as e:
+        # AkShare is down and nothing is stored for this ticker to fall back on
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_in)))})
     except Exception as e:
         logger.error(f"Analysis failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
-from fastapi.responses import HTMLResponse, Response
-from app.services.report_generator import report_generator
+
+@router.post("/analyze/batch")
+async def analyze_batch(
+    request: BatchStockRequest,
+    pipeline: AnalysisPipeline = Depends(get_pipeline)
+):
+    """
+    Analyze many tickers in one call. Results are streamed as NDJSON, one line per
+    ticker in completion order; failed tickers produce {"ticker": ..., "error": ...}.
+    """
+    async def stream():
+        async for code, result in pipeline.run_many(
+                request.stock_codes, request.holding_costs, concurrency=settings.batch_concurrency):
+            if isinstance(result, Exception):
+                logger.error(f"Batch analysis failed for {code}: {str(result)}")
+                yield json.dumps({"ticker": code, "error": str(result) or type(result).__name__}) + "\n"
+            else:
+                yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.get("/stream/signals")
+async def stream_signals(tickers: str = Query(..., description="Comma-separated tickers, e.g. 600519,000001")):
+    """
+    Server-Sent Events: a snapshot per ticker, then deltas of the fields that
+    changed each time the server refreshes it (every settings.stream_interval s).
+    """
+    hub = get_signal_hub()
+    if hub is None:
+        raise HTTPException(status_code=503, detail="Signal stream is not running")
+    codes = list(dict.fromkeys(code.strip().upper() for code in tickers.split(",") if code.strip()))
+    if not codes:
+        raise HTTPException(status_code=422, detail="No tickers given")
+    if len(codes) > settings.stream_max_tickers:
+        raise HTTPException(status_code=422, detail=f"At most {settings.stream_max_tickers} tickers per stream")
+    return StreamingResponse(hub.stream(codes), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/stream/status")
+async def stream_status():
+    hub = get_signal_hub()
+    if hub is None:
+        raise HTTPException(status_code=503, detail="Signal stream is not running")
+    return hub.snapshot()
+
+@router.get("/warmup/status")
+async def warmup_status():
+    scheduler = get_warmup_scheduler()
+    if scheduler is None:
+        return {"state": "disabled"}
+    return scheduler.snapshot()
+
+@router.post("/warmup/run", status_code=202)
+async def warmup_run():
+    scheduler = get_warmup_scheduler()
+    if scheduler is None:
+        raise HTTPException(status_code=404, detail="Warm-up is disabled")
+    if not scheduler.trigger():
+        raise HTTPException(status_code=409, detail="Warm-up already running")
+    return scheduler.snapshot()
+
+def _history_store():
+    if not settings.history_enabled:
+        raise HTTPException(status_code=404, detail="Analysis history is disabled")
+    return get_history_store()
+
+@router.get("/history/movers")
+async def history_movers(start: str, end: Optional[str] = None, metric: str = "tech_score",
+                         direction: str = "both", limit: int = Query(20, ge=1, le=500), offset: int = Query(0, ge=0)):
+    """
+    Tickers whose score moved the most between their first and last analysis in
+    [start, end] (ISO dates or timestamps). direction: up, down or both.
+    """
+    if metric not in MOVER_METRICS or direction not in ("up", "down", "both"):
+        raise HTTPException(status_code=422, detail=f"metric must be one of {', '.join(MOVER_METRICS)}; "
+                                                    f"direction one of up, down, both")
+    movers = await run_blocking(_history_store().movers, start, end, metric, limit, offset, direction)
+    return {"start": start, "end": end, "metric": metric, "movers": movers}
+
+@router.get("/history/{ticker}")
+async def ticker_history(ticker: str, start: Optional[str] = None, end: Optional[str] = None,
+                         limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None):
+    """
+    Score and signal history of one ticker, oldest first. Pass `next_cursor`
+    back as `cursor` to fetch the following page.
+    """
+    try:
+        points, next_cursor = await run_blocking(_history_store().history, ticker.upper(), start, end, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"ticker": ticker.upper(), "points": points, "next_cursor": next_cursor}
+from fastapi.responses import FileResponse, HTMLResponse, Response
+from app.services.report_generator import get_report_generator
+from app.services.pdf_renderer import PDFRenderer, RenderQueueFullError, get_pdf_renderer
 
 @router.post("/report/html", response_class=HTMLResponse)
 async def generate_html_report(request: ReportRequest):
-    return report_generator.generate_html(request.analysis_data)
+    return get_report_generator().generate_html(request.analysis_data, request.language)
 
 @router.post("/report/pdf")
 async def generate_pdf_report(request: ReportRequest):
-    pdf_bytes = report_generator.generate_pdf(request.analysis_data)
+    try:
+        pdf_bytes = await get_pdf_renderer().render(request.analysis_data, request.language)
+    except RenderQueueFullError as e:
+        raise HTTPException(status_code=503, detail=f"Report renderer busy: {str(e)}", headers={"Retry-After": "5"})
     return Response(content=pdf_bytes, media_type="application/pdf", headers={
         "Content-Disposition": f"attachment; filename=report_{request.analysis_data.ticker}.pdf"
     })
+
+@router.post("/report/pdf/jobs", status_code=202)
+async def submit_pdf_report(request: ReportRequest):
+    """
+    Queue a PDF render and return at once. The job id is a hash of the report
+    content, so submitting the same report twice yields the same job.
+    """
+    try:
+        job_id = get_pdf_renderer().submit(request.analysis_data, request.language)
+    except RenderQueueFullError as e:
+        raise HTTPException(status_code=503, detail=f"Report renderer busy: {str(e)}", headers={"Retry-After": "5"})
+    return get_pdf_renderer().status(job_id)
+
+@router.post("/report/batch")
+async def generate_batch_report(request: BatchReportRequest):
+    """
+    Render many reports at once: a zip with one PDF per analysis (format="zip")
+    or a single combined PDF (format="pdf").
+    """
+    try:
+        path = await get_pdf_renderer().render_batch(request.analyses, request.language, request.format)
+    except RenderQueueFullError as e:
+        raise HTTPException(status_code=503, detail=f"Report renderer busy: {str(e)}", headers={"Retry-After": "5"})
+    return _report_file(path, request.format)
+
+@router.post("/report/batch/jobs", status_code=202)
+async def submit_batch_report(request: BatchReportRequest):
+    try:
+        job_id = get_pdf_renderer().submit_batch(request.analyses, request.language, request.format)
+    except RenderQueueFullError as e:
+        raise HTTPException(status_code=503, detail=f"Report renderer busy: {str(e)}", headers={"Retry-After": "5"})
+    return get_pdf_renderer().status(job_id)
+
+@router.get("/report/pdf/jobs/{job_id}")
+@router.get("/report/batch/jobs/{job_id}")
+async def report_job_status(job_id: str):
+    _check_job_id(job_id)
+    status = get_pdf_renderer().status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown report job {job_id}")
+    return status
+
+@router.get("/report/pdf/jobs/{job_id}/download")
+@router.get("/report/batch/jobs/{job_id}/download")
+async def download_report(job_id: str):
+    _check_job_id(job_id)
+    renderer = get_pdf_renderer()
+    status = renderer.status(job_id)
+    if status is None or status["status"] != "done":
+        raise HTTPException(status_code=404, detail=f"Report {job_id} is not ready")
+    return _report_file(*renderer.artifact(job_id))
+
+def _check_job_id(job_id: str):
+    # The id becomes a file name under the report cache; never echo or join anything else
+    if not PDFRenderer.is_job_id(job_id):
+        raise HTTPException(status_code=404, detail="Unknown report job")
+
+def _report_file(path: str, fmt: str):
+    media_type = "application/zip" if fmt == "zip" else "application/pdf"
+    return FileResponse(path, media_type=media_type, filename=f"report_{os.path.basename(path)[:12]}.{fmt}")
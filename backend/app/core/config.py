@@ -0,0 +1,109 @@
+from typing import List, Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """
+    Runtime configuration. Every field can be overridden with a
+    QUANTAI_ prefixed environment variable (e.g. QUANTAI_DATA_DIR=/data).
+    """
+    model_config = SettingsConfigDict(env_prefix="QUANTAI_")
+
+    # Root directory for everything we persist locally (bar store, caches...)
+    data_dir: str = "data"
+
+    # Local OHLCV bar store
+    bar_store_enabled: bool = True
+    # Stored bars younger than this (seconds) are served without asking AkShare for a delta
+    bar_store_max_age: float = 60.0
+
+    # Seconds a quote stays valid before get_current_price asks upstream again
+    quote_cache_ttl: float = 5.0
+    # Seconds a full-market spot snapshot (ak.stock_zh_a_spot_em) is reused
+    spot_cache_ttl: float = 10.0
+
+    # Persist per-ticker indicator state and only fold in new bars on each analysis
+    incremental_indicators: bool = True
+
+    # Sentiment: width of the pseudo-random offset added to the mock polarity (0 = off),
+    # the seed it is derived from together with the ticker and headlines (so identical
+    # requests always score the same), and the polarity cache size
+    sentiment_noise: float = 0.2
+    sentiment_seed: int = 0
+    sentiment_cache_size: int = 10000
+    # News index lookups: how many days back count, and how many headlines are returned
+    news_window_days: int = 7
+    news_max_headlines: int = 10
+
+    # AkShare request budget, shared by all workers on the host when rate_limit_shared is on
+    akshare_requests_per_min: int = 60
+    rate_limit_shared: bool = True
+
+    # AkShare resilience (app/services/upstream.py): per-attempt timeout, retries with
+    # jittered exponential backoff, a hedged duplicate request for attempts slower than
+    # upstream_hedge_after (0 = off), at most upstream_max_inflight requests at once, and a
+    # per-endpoint breaker that opens for upstream_breaker_reset seconds after
+    # upstream_breaker_failures consecutive failures. Stored bars are served as stale meanwhile.
+    upstream_timeout: float = 8.0
+    upstream_retries: int = 2
+    upstream_backoff: float = 0.5
+    upstream_backoff_max: float = 4.0
+    upstream_hedge_after: float = 3.0
+    upstream_max_inflight: int = 16
+    upstream_breaker_failures: int = 5
+    upstream_breaker_reset: float = 30.0
+
+    # Thread pool for blocking pipeline stages, and per-stage timeouts (seconds, 0 = none)
+    worker_threads: int = 16
+    fetch_timeout: float = 30.0
+    technical_timeout: float = 5.0
+    sentiment_timeout: float = 5.0
+
+    # /analyze/batch: max tickers per request and how many run concurrently
+    batch_max_size: int = 1000
+    batch_concurrency: int = 8
+
+    # /analyze response cache: seconds a result is reused for an unchanged last bar (0 = off)
+    analysis_cache_ttl: float = 60.0
+    analysis_cache_size: int = 1024
+
+    # PDF reports: render processes, max renders queued or running (503 past that),
+    # and how many rendered PDFs are kept under data_dir/reports
+    report_workers: int = 2
+    report_queue_size: int = 32
+    report_cache_files: int = 1000
+    # Batch reports: max reports per request, and reports per worker task for zips
+    report_batch_max_size: int = 500
+    report_batch_chunk: int = 8
+
+    # Analysis history (SQLite, default <data_dir>/history.sqlite3); rows queued beyond
+    # history_queue_size while the writer catches up are dropped
+    history_enabled: bool = True
+    history_path: Optional[str] = None
+    history_queue_size: int = 10000
+
+    # Live signal stream (GET /stream/signals): seconds between refreshes of a ticker, max
+    # tickers per subscription, refreshes running at once, and events buffered per client
+    stream_interval: float = 60.0
+    stream_max_tickers: int = 50
+    stream_concurrency: int = 8
+    stream_queue_size: int = 256
+    stream_heartbeat: float = 15.0
+
+    # Modules the gunicorn master imports before forking workers (gunicorn.conf.py), so the
+    # workers share those pages instead of each importing them on first use. WeasyPrint is
+    # not listed: PDFs are rendered in the report process pool, never in API workers.
+    preload_modules: List[str] = ["akshare", "textblob"]
+
+    # Pre-market warm-up (app/services/warmup.py): weekdays at warmup_time in warmup_timezone.
+    # An empty watchlist warms the whole universe, which takes about
+    # universe size / akshare_requests_per_min minutes.
+    warmup_enabled: bool = True
+    warmup_time: str = "07:30"
+    warmup_timezone: str = "Asia/Shanghai"
+    warmup_watchlist: List[str] = []
+    warmup_on_startup: bool = False
+    warmup_concurrency: int = 4
+
+
+settings = Settings()
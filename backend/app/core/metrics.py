@@ -0,0 +1,99 @@
+"""
+Prometheus metrics and request-scoped profiling.
+
+Stage timings, upstream (AkShare) calls, rate-limit waits and cache lookups are
+recorded here and exposed by GET /metrics. Hit ratios come from the cache
+counters, e.g. rate(quantai_cache_requests_total{result="hit"}[5m]) /
+rate(quantai_cache_requests_total[5m]).
+
+With several server processes (gunicorn), set PROMETHEUS_MULTIPROC_DIR to an
+empty directory so /metrics aggregates across workers.
+
+Profiling: a request sent with the `X-QuantAI-Profile: 1` header collects every
+span it goes through and gets them back in a Server-Timing response header.
+"""
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+PROFILE_HEADER = "X-QuantAI-Profile"
+
+# Sub-millisecond cache hits up to multi-second upstream fetches
+_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram("quantai_stage_seconds", "Time spent in each analysis stage", ["stage"], buckets=_BUCKETS)
+HTTP_SECONDS = Histogram("quantai_http_request_seconds", "HTTP request latency", ["method", "route", "status"],
+                         buckets=_BUCKETS)
+UPSTREAM_CALLS = Counter("quantai_upstream_calls_total", "AkShare calls by endpoint and outcome",
+                         ["endpoint", "outcome"])
+UPSTREAM_SECONDS = Histogram("quantai_upstream_seconds", "AkShare call latency", ["endpoint"], buckets=_BUCKETS)
+UPSTREAM_RETRIES = Counter("quantai_upstream_retries_total", "AkShare calls retried after a failure", ["endpoint"])
+UPSTREAM_HEDGES = Counter("quantai_upstream_hedges_total", "Hedged (duplicate) AkShare requests sent", ["endpoint"])
+CIRCUIT_STATE = Gauge("quantai_upstream_circuit_state", "AkShare circuit breaker: 0 closed, 1 half-open, 2 open",
+                      ["endpoint"], multiprocess_mode="max")
+RATE_LIMIT_WAITS = Counter("quantai_rate_limit_waits_total", "AkShare calls that had to wait for the rate limiter")
+RATE_LIMIT_WAIT_SECONDS = Counter("quantai_rate_limit_wait_seconds_total", "Time spent waiting for the rate limiter")
+CACHE_REQUESTS = Counter("quantai_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"])
+
+# Spans of the current request when profiling is on, else None. The list is
+# shared by reference with tasks and worker threads started from the request.
+_profile: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "quantai_profile", default=None)
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Time a block into quantai_stage_seconds (and the request profile, if on).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def record(stage: str, seconds: float):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    spans = _profile.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+def cache_result(cache: str, result: str):
+    CACHE_REQUESTS.labels(cache, result).inc()
+
+
+def start_profile() -> contextvars.Token:
+    return _profile.set([])
+
+
+def finish_profile(token: contextvars.Token) -> str:
+    """
+    Stop profiling and return the spans as a Server-Timing header value.
+    """
+    spans = _profile.get() or []
+    _profile.reset(token)
+    # Server-Timing names are tokens; repeated stages get an index
+    seen = {}
+    entries = []
+    for stage, seconds in spans:
+        seen[stage] = seen.get(stage, 0) + 1
+        name = stage if seen[stage] == 1 else f"{stage}-{seen[stage]}"
+        entries.append(f"{name};dur={seconds * 1000:.2f}")
+    return ", ".join(entries)
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """
+    Exposition payload and content type for GET /metrics.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,86 @@
+"""
+Cold-start helpers: deferred imports of the heavy stacks and process memory.
+
+AkShare (~0.8 s), TextBlob/NLTK and WeasyPrint are only needed once a request
+actually fetches bars, scores headlines or renders a PDF, so the modules using
+them hold a `LazyModule` instead of importing at the top:
+
+    ak = LazyModule("akshare")
+    ak.stock_zh_a_hist(...)   # first attribute access imports akshare
+
+Under gunicorn (gunicorn.conf.py) the master imports the app plus
+settings.preload_modules once with `preload()` before forking, so every worker
+starts with those modules already loaded and shares their pages copy-on-write.
+`python -m benchmarks.startup` reports import cost per module and the RSS of
+a worker with and without the preload.
+"""
+import importlib
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """
+    Module proxy that imports `name` on first attribute access.
+    Rebinding the module-level name (e.g. to a fake in benchmarks) works as before.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
+
+
+def preload(names: Iterable[str]) -> Dict[str, Optional[float]]:
+    """
+    Import each module now; seconds per module (None if it is not installed).
+    """
+    timings: Dict[str, Optional[float]] = {}
+    for name in names:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Preload of {name} skipped: {str(e)}")
+            timings[name] = None
+            continue
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def memory_usage() -> Dict[str, int]:
+    """
+    Resident set size of this process in bytes, split into shared and private
+    pages where the kernel reports them (Linux). Empty elsewhere.
+    """
+    usage: Dict[str, int] = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"):
+                    usage[key.lower()] = int(value.split()[0]) * 1024
+        usage["shared"] = usage.get("shared_clean", 0) + usage.get("shared_dirty", 0)
+        usage["private"] = usage.get("private_clean", 0) + usage.get("private_dirty", 0)
+    except OSError:
+        try:
+            with open("/proc/self/statm") as f:
+                usage["rss"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            pass
+    return usage
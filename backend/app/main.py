@@ -1,10 +1,50 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import functools
+import logging
+import os
+import sys
+import time
+
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from app.core import metrics
+from app.core.config import settings
+from app.core.startup import memory_usage
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from app.api.endpoints import build_pipeline
+    from app.services.history_store import get_history_store
+    from app.services.pdf_renderer import get_pdf_renderer
+    from app.services.signal_hub import start_signal_hub
+    from app.services.warmup import start_warmup
+
+    scheduler = start_warmup(build_pipeline)
+    hub = start_signal_hub(functools.partial(build_pipeline, record_history=False))
+    usage = memory_usage()
+    logger.info(f"Worker {os.getpid()} ready: app imported in {IMPORT_SECONDS * 1000:.0f} ms, "
+                f"{len(sys.modules)} modules, RSS {usage.get('rss', 0) / 2**20:.0f} MB "
+                f"({usage.get('shared', 0) / 2**20:.0f} MB shared)")
+    yield
+    await hub.stop()
+    if scheduler is not None:
+        await scheduler.stop()
+    get_pdf_renderer().shutdown()
+    if settings.history_enabled:
+        get_history_store().close()
+
 
 app = FastAPI(
     title="QuantAI Stock Analysis",
     description="Stock analysis API with technical indicators and sentiment analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration
@@ -22,10 +62,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def instrument(request: Request, call_next):
+    profiling = request.headers.get(metrics.PROFILE_HEADER, "").lower() in ("1", "true", "yes")
+    token = metrics.start_profile() if profiling else None
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        server_timing = metrics.finish_profile(token) if token is not None else None
+    elapsed = time.perf_counter() - start
+    # Route template, not the raw path, to keep label cardinality bounded
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    metrics.HTTP_SECONDS.labels(request.method, route, str(response.status_code)).observe(elapsed)
+    if server_timing is not None:
+        response.headers["Server-Timing"] = ", ".join(filter(None, [server_timing, f"total;dur={elapsed * 1000:.2f}"]))
+    return response
+
 from app.api.endpoints import router as api_router
 
 app.include_router(api_router, prefix="/api/v1")
 
+# Under gunicorn this is paid once in the master, not per worker
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    payload, content_type = metrics.render_latest()
+    return Response(content=payload, media_type=content_type)
+
 @app.get("/")
 def read_root():
     return {"message": "QuantAI Stock Prediction API is running"}
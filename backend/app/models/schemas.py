@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, validator
 from typing import Optional, List, Dict, Any
+from app.core.config import settings
 
 class StockRequest(BaseModel):
     stock_code: str = Field(..., description="Stock ticker symbol (e.g., AAPL, 0700.HK)")
@@ -18,6 +19,25 @@ class StockRequest(BaseModel):
             raise ValueError('Holding cost must be non-negative')
         return v
 
+class BatchStockRequest(BaseModel):
+    stock_codes: List[str] = Field(..., min_length=1, description="A-share codes to analyze (e.g., 000001, 600519)")
+    holding_costs: Dict[str, float] = Field(default_factory=dict, description="Optional holding cost per stock code")
+
+    @validator('stock_codes')
+    def validate_stock_codes(cls, v):
+        codes = list(dict.fromkeys(code.strip().upper() for code in v if code and code.strip()))
+        if not codes:
+            raise ValueError('No valid stock codes')
+        if len(codes) > settings.batch_max_size:
+            raise ValueError(f'At most {settings.batch_max_size} stock codes per batch')
+        return codes
+
+    @validator('holding_costs')
+    def validate_holding_costs(cls, v):
+        if any(cost < 0 for cost in v.values()):
+            raise ValueError('Holding cost must be non-negative')
+        return {code.upper(): cost for code, cost in v.items()}
+
 class AnalysisResponse(BaseModel):
     ticker: str
     current_price: float
@@ -43,6 +63,26 @@ class AnalysisResponse(BaseModel):
     overall_score: float # Computed or passed
     summary_text: str
 
+    # True when AkShare was unavailable and the analysis used the last stored bars
+    stale: bool = False
+
 class ReportRequest(BaseModel):
     analysis_data: AnalysisResponse
     language: str = "en" # 'en' or 'zh'
+
+class BatchReportRequest(BaseModel):
+    analyses: List[AnalysisResponse] = Field(..., min_length=1, description="Analyses to render, in page order")
+    language: str = "en" # 'en' or 'zh'
+    format: str = Field("zip", description="'zip' for one PDF per ticker, 'pdf' for a single combined PDF")
+
+    @validator('analyses')
+    def validate_analyses(cls, v):
+        if len(v) > settings.report_batch_max_size:
+            raise ValueError(f'At most {settings.report_batch_max_size} reports per batch')
+        return v
+
+    @validator('format')
+    def validate_format(cls, v):
+        if v not in ("zip", "pdf"):
+            raise ValueError("format must be 'zip' or 'pdf'")
+        return v
@@ -0,0 +1,297 @@
+"""
+Universe screener: fetch -> technical -> advice for every ticker, outside HTTP.
+
+    cd backend && python -m app.screener [--tickers 600519,000001 | --tickers-file codes.txt]
+                                         [--workers 4] [--shard-size 50] [--sentiment]
+                                         [--out screen.csv|screen.parquet] [--checkpoint-dir DIR] [--resume]
+
+Without --tickers/--tickers-file the universe is every code in the AkShare
+spot snapshot, whose prices are also used as current prices. The universe is
+cut into shards that run on a process pool; each worker builds its own
+fetcher, TechnicalAnalyzer and InvestmentAdvisor and keeps them for all the
+shards it gets. Results are ranked by composite alpha (the advisor's
+tech/sentiment weighting) and written as CSV or Parquet (by extension).
+
+Every finished shard is checkpointed under --checkpoint-dir, together with the
+universe (and spot prices) it was cut from; rerunning with --resume skips
+those, so an interrupted run over the whole market only redoes the shards that
+were in flight. Without --tickers/--tickers-file a resumed run reuses the saved
+universe instead of taking a new spot snapshot, whose code list may have changed. A JSON throughput report (overall and per
+worker process) goes to stdout.
+
+AkShare requests draw from the host-wide rate limit (settings.rate_limit_shared),
+so on a cold bar store throughput is bounded by akshare_requests_per_min no
+matter how many workers run; with a warm store the run is CPU bound.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Indicators copied into the output next to the scores
+INDICATOR_COLUMNS = ("RSI", "MACD", "KDJ_K", "MA5", "MA20", "BB_High", "BB_Low")
+NEUTRAL_SENTIMENT = 50.0
+
+# Per-process services, built once by the pool initializer
+_worker = None
+
+
+def _init_worker(sentiment: bool):
+    global _worker
+    from app.services.advisor import InvestmentAdvisor
+    from app.services.analyzer import TechnicalAnalyzer
+    from app.services.data_fetcher import AkShareFetcher
+    from app.services.incremental import IndicatorStateStore
+    from app.services.sentiment import SentimentAnalyzer
+
+    logging.basicConfig(level=logging.WARNING)
+    state_store = None
+    if settings.incremental_indicators:
+        state_store = IndicatorStateStore(os.path.join(settings.data_dir, "indicators"))
+    _worker = (AkShareFetcher(), TechnicalAnalyzer(state_store), InvestmentAdvisor(),
+               SentimentAnalyzer() if sentiment else None)
+
+
+def _screen_one(ticker: str, price: Optional[float], sentiment_score: float) -> Dict[str, Any]:
+    fetcher, analyzer, advisor, _ = _worker
+    bars = fetcher.fetch_bars(ticker)
+    if bars.empty:
+        raise ValueError("No data")
+    tech = analyzer.analyze_incremental(ticker, bars)
+    if price is None:
+        price = float(bars["Close"][-1])
+    advice = advisor.generate_advice(price, tech.score, sentiment_score)
+    row = {
+        "ticker": ticker,
+        "last_date": str(bars["Date"][-1])[:10],
+        "current_price": price,
+        "tech_score": float(tech.score),
+        "tech_signal": tech.signal,
+        "sentiment_score": sentiment_score,
+        "alpha": tech.score * advisor.TECH_WEIGHT + sentiment_score * advisor.SENTIMENT_WEIGHT,
+        "advice_action": advice.action,
+        "entry_point": advice.entry_point,
+        "exit_point": advice.exit_point,
+        "stale": bool(bars.attrs.get("stale")),
+    }
+    row.update({name: tech.indicators.get(name) for name in INDICATOR_COLUMNS})
+    return row
+
+
+def _screen_shard(shard: int, tickers: List[str], prices: Dict[str, float]) -> Tuple[int, List[Dict], Dict]:
+    """
+    Runs in a worker process. Failed tickers become rows with an `error`.
+    """
+    start = time.perf_counter()
+    sentiment_analyzer = _worker[3]
+    sentiments = sentiment_analyzer.analyze_batch(tickers) if sentiment_analyzer is not None else {}
+    rows, errors = [], 0
+    for ticker in tickers:
+        score = sentiments[ticker]["score"] if ticker in sentiments else NEUTRAL_SENTIMENT
+        try:
+            rows.append(_screen_one(ticker, prices.get(ticker), score))
+        except Exception as e:
+            errors += 1
+            rows.append({"ticker": ticker, "error": str(e) or type(e).__name__})
+    stats = {"pid": os.getpid(), "tickers": len(tickers), "errors": errors,
+             "seconds": time.perf_counter() - start}
+    return shard, rows, stats
+
+
+class Checkpoints:
+    """
+    One JSON file per finished shard under `root`, plus a manifest that ties
+    them to the universe and shard size they were computed for, and the
+    universe itself (universe.json) so a resume can reuse it.
+    """
+
+    def __init__(self, root: str, tickers: List[str], shard_size: int):
+        self.root = root
+        self.tickers = tickers
+        self.manifest = {"universe": hashlib.sha256("\n".join(tickers).encode()).hexdigest(),
+                         "tickers": len(tickers), "shard_size": shard_size}
+
+    def _path(self, shard: int) -> str:
+        return os.path.join(self.root, f"shard-{shard:05d}.json")
+
+    @staticmethod
+    def saved_universe(root: str) -> Optional[Tuple[List[str], Dict[str, float]]]:
+        """
+        (tickers, spot prices) of the run checkpointed under `root`, if any.
+        """
+        try:
+            with open(os.path.join(root, "universe.json"), encoding="utf-8") as f:
+                universe = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return universe["tickers"], universe["prices"]
+
+    def open(self, resume: bool, prices: Optional[Dict[str, float]] = None) -> Dict[int, List[Dict]]:
+        """
+        Finished shards to reuse (none unless resuming). Raises ValueError when
+        resuming checkpoints of a different universe or shard size.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        manifest_path = os.path.join(self.root, "manifest.json")
+        done: Dict[int, List[Dict]] = {}
+        if resume and os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                if json.load(f) != self.manifest:
+                    raise ValueError(f"Checkpoints in {self.root} are for another universe or shard size")
+            for name in os.listdir(self.root):
+                if name.startswith("shard-") and name.endswith(".json"):
+                    with open(os.path.join(self.root, name), encoding="utf-8") as f:
+                        done[int(name[6:11])] = json.load(f)
+        else:
+            for name in os.listdir(self.root):
+                if name.startswith("shard-"):
+                    os.remove(os.path.join(self.root, name))
+            with open(os.path.join(self.root, "universe.json"), "w", encoding="utf-8") as f:
+                json.dump({"tickers": self.tickers, "prices": prices or {}}, f)
+            with open(manifest_path, "w", encoding="utf-8") as f:
+                json.dump(self.manifest, f)
+        return done
+
+    def save(self, shard: int, rows: List[Dict]) -> None:
+        path = self._path(shard)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(rows, f)
+        os.replace(f"{path}.tmp", path)
+
+
+def load_universe(tickers: Optional[str], tickers_file: Optional[str]) -> Tuple[List[str], Dict[str, float]]:
+    """
+    (tickers, spot prices). Prices are only known for the spot-snapshot universe.
+    """
+    if tickers:
+        codes = [code.strip().upper() for code in tickers.split(",") if code.strip()]
+        return list(dict.fromkeys(codes)), {}
+    if tickers_file:
+        with open(tickers_file, encoding="utf-8") as f:
+            codes = [line.strip().upper() for line in f if line.strip() and not line.startswith("#")]
+        return list(dict.fromkeys(codes)), {}
+    from app.services.data_fetcher import AkShareFetcher
+    snapshot = AkShareFetcher().get_spot_snapshot()
+    return sorted(snapshot), snapshot
+
+
+def rank(rows: List[Dict]) -> pd.DataFrame:
+    df = pd.DataFrame(rows)
+    for column in ("error", "alpha", "tech_score"):
+        if column not in df.columns:  # Every ticker failed, or none did
+            df[column] = None
+    ok = df[df["error"].isna()].sort_values(["alpha", "tech_score", "ticker"], ascending=[False, False, True])
+    ok.insert(0, "rank", pd.array(np.arange(1, len(ok) + 1), dtype="Int64"))
+    # Failed tickers go last, unranked
+    return pd.concat([ok, df[df["error"].notna()]], ignore_index=True)
+
+
+def write(df: pd.DataFrame, path: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def screen(tickers: List[str], prices: Dict[str, float], workers: int, shard_size: int,
+           checkpoints: Checkpoints, resume: bool, sentiment: bool) -> Tuple[List[Dict], Dict]:
+    shards = [tickers[i:i + shard_size] for i in range(0, len(tickers), shard_size)]
+    done = checkpoints.open(resume, prices)
+    todo = [i for i in range(len(shards)) if i not in done]
+    logger.info(f"{len(tickers)} tickers in {len(shards)} shards, {len(done)} already done, {workers} workers")
+
+    per_worker: Dict[int, Dict[str, float]] = {}
+    start = time.perf_counter()
+    finished = 0
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(sentiment,)) as pool:
+            futures = [pool.submit(_screen_shard, i, shards[i], {t: prices[t] for t in shards[i] if t in prices})
+                       for i in todo]
+            for future in as_completed(futures):
+                shard, rows, stats = future.result()
+                checkpoints.save(shard, rows)
+                done[shard] = rows
+                worker = per_worker.setdefault(stats["pid"], {"shards": 0, "tickers": 0, "errors": 0, "seconds": 0.0})
+                worker["shards"] += 1
+                for key in ("tickers", "errors", "seconds"):
+                    worker[key] += stats[key]
+                finished += stats["tickers"]
+                elapsed = time.perf_counter() - start
+                logger.info(f"Shard {shard} done: {finished}/{sum(len(shards[i]) for i in todo)} tickers, "
+                            f"{finished / elapsed:.1f} tickers/s")
+    elapsed = time.perf_counter() - start
+
+    rows = [row for i in sorted(done) for row in done[i]]
+    report = {
+        "tickers": len(tickers),
+        "shards": len(shards),
+        "resumed_shards": len(shards) - len(todo),
+        "screened": finished,
+        "errors": sum(1 for row in rows if row.get("error")),
+        "elapsed_s": round(elapsed, 3),
+        "tickers_per_s": round(finished / elapsed, 2) if elapsed > 0 else None,
+        "workers": [{"pid": pid, **{k: round(v, 3) for k, v in stats.items()},
+                     "tickers_per_s": round(stats["tickers"] / stats["seconds"], 2) if stats["seconds"] else None}
+                    for pid, stats in sorted(per_worker.items())],
+    }
+    return rows, report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    universe = parser.add_mutually_exclusive_group()
+    universe.add_argument("--tickers", help="Comma-separated tickers")
+    universe.add_argument("--tickers-file", help="File with one ticker per line")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-size", type=int, default=50, help="Tickers per task (and per checkpoint)")
+    parser.add_argument("--sentiment", action="store_true", help="Score sentiment too (default: neutral 50)")
+    parser.add_argument("--out", default="screen.csv", help="Ranked output; .parquet for Parquet, else CSV")
+    parser.add_argument("--checkpoint-dir", default=None, help="Default: <data_dir>/screener")
+    parser.add_argument("--resume", action="store_true", help="Skip shards finished by a previous run")
+    args = parser.parse_args(argv)
+
+    checkpoint_dir = args.checkpoint_dir or os.path.join(settings.data_dir, "screener")
+    saved = None
+    if args.resume and not (args.tickers or args.tickers_file):
+        saved = Checkpoints.saved_universe(checkpoint_dir)
+    if saved is not None:
+        tickers, prices = saved
+        logger.info(f"Resuming on the saved universe of {len(tickers)} tickers")
+    else:
+        tickers, prices = load_universe(args.tickers, args.tickers_file)
+    if not tickers:
+        logger.error("Empty universe")
+        return 1
+    shard_size = max(1, args.shard_size)
+    checkpoints = Checkpoints(checkpoint_dir, tickers, shard_size)
+    try:
+        rows, report = screen(tickers, prices, max(1, args.workers), shard_size, checkpoints,
+                              args.resume, args.sentiment)
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+
+    write(rank(rows), args.out)
+    report["out"] = args.out
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -1,5 +1,8 @@
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
 
 @dataclass
 class AdviceResult:
@@ -8,7 +11,65 @@ class AdviceResult:
     exit_point: Optional[float] = None
     rationale: str = ""
 
+@dataclass
+class AdviceBatch:
+    """
+    Element-wise advice from InvestmentAdvisor.generate_advice_batch.
+    Missing entry/exit points are NaN (None in the scalar AdviceResult).
+    """
+    action: np.ndarray
+    entry_point: np.ndarray
+    exit_point: np.ndarray
+    alpha: np.ndarray
+
+    def __len__(self) -> int:
+        return self.action.size
+
+    def rationale(self, i: int) -> str:
+        return f"Composite Score: {self.alpha.flat[i]:.1f}. " + InvestmentAdvisor.RATIONALES[self.action.flat[i]]
+
+    def result(self, i: int) -> AdviceResult:
+        """
+        Element i (flat index) as the AdviceResult generate_advice returns.
+        """
+        entry, exit_val = self.entry_point.flat[i], self.exit_point.flat[i]
+        return AdviceResult(action=str(self.action.flat[i]),
+                            entry_point=None if np.isnan(entry) else float(entry),
+                            exit_point=None if np.isnan(exit_val) else float(exit_val),
+                            rationale=self.rationale(i))
+
 class InvestmentAdvisor:
+    # Composite alpha weights (60% tech, 40% sentiment)
+    TECH_WEIGHT = 0.6
+    SENTIMENT_WEIGHT = 0.4
+
+    # Alpha cutoffs when the user is holding
+    ADD_ALPHA = 75
+    CUT_LOSS_ALPHA = 30
+    HOLD_ALPHA = 50
+    # Alpha cutoffs when the user is planning to enter
+    BUY_ALPHA = 70
+    WATCH_ALPHA = 50
+
+    # Entry/exit price multipliers relative to the current price
+    CUT_LOSS_EXIT = 0.99 # Immediate exit suggestion
+    HOLD_TARGET = 1.15
+    BUY_ENTRY = 1.005 # Just above market
+    BUY_TARGET = 1.10 # 10% target
+    WATCH_ENTRY = 0.98 # Wait for dip
+
+    # Rationale text per action, after the "Composite Score: ..." prefix
+    RATIONALES = {
+        "ADD POSITION": "Strong signals suggest upside. Consider increasing exposure.",
+        "HOLD/AVERAGE DOWN": "Strong signals suggest upside. Consider increasing exposure.",
+        "SELL/CUT LOSS": "Weak signals detected. Protect capital.",
+        "HOLD": "Neutral to positive outlook. Continue holding.",
+        "REDUCE": "Outlook weakening. Consider taking partial profits.",
+        "BUY": "Strong buy signal. Good entry point detected.",
+        "WATCH": "Positive but wait for better entry.",
+        "AVOID": "Technical/Sentiment mix is weak. Not recommended.",
+    }
+
     def generate_advice(self, current_price: float, tech_score: float, sentiment_score: float, 
                        holding_cost: Optional[float] = None) -> AdviceResult:
         """
@@ -26,7 +87,7 @@ class InvestmentAdvisor:
         
         # Calculate composite alpha (0-100)
         # Using 60% tech, 40% sentiment for simplicity of advice generation
-        alpha = (tech_score * 0.6) + (sentiment_score * 0.4)
+        alpha = (tech_score * self.TECH_WEIGHT) + (sentiment_score * self.SENTIMENT_WEIGHT)
         
         action = "HOLD"
         entry = None
@@ -37,35 +98,35 @@ class InvestmentAdvisor:
             # User is HOLDING
             profit_pct = (current_price - holding_cost) / holding_cost
             
-            if alpha > 75:
+            if alpha > self.ADD_ALPHA:
                 action = "ADD POSITION" if profit_pct > 0 else "HOLD/AVERAGE DOWN"
-                rationale += "Strong signals suggest upside. Consider increasing exposure."
-            elif alpha < 30:
+                rationale += self.RATIONALES["ADD POSITION"]
+            elif alpha < self.CUT_LOSS_ALPHA:
                 action = "SELL/CUT LOSS"
-                rationale += "Weak signals detected. Protect capital."
-                exit_val = current_price * 0.99 # Immediate exit suggestion
-            elif alpha > 50:
+                rationale += self.RATIONALES["SELL/CUT LOSS"]
+                exit_val = current_price * self.CUT_LOSS_EXIT
+            elif alpha > self.HOLD_ALPHA:
                 action = "HOLD"
-                rationale += "Neutral to positive outlook. Continue holding."
-                exit_val = current_price * 1.15 # Target
+                rationale += self.RATIONALES["HOLD"]
+                exit_val = current_price * self.HOLD_TARGET
             else:
                 action = "REDUCE"
-                rationale += "Outlook weakening. Consider taking partial profits."
+                rationale += self.RATIONALES["REDUCE"]
                 
         else:
             # User is PLANNING TO ENTER
-            if alpha > 70:
+            if alpha > self.BUY_ALPHA:
                 action = "BUY"
-                entry = current_price * 1.005 # Just above market
-                exit_val = current_price * 1.10 # 10% target
-                rationale += "Strong buy signal. Good entry point detected."
-            elif alpha > 50:
+                entry = current_price * self.BUY_ENTRY
+                exit_val = current_price * self.BUY_TARGET
+                rationale += self.RATIONALES["BUY"]
+            elif alpha > self.WATCH_ALPHA:
                 action = "WATCH"
-                entry = current_price * 0.98 # Wait for dip
-                rationale += "Positive but wait for better entry."
+                entry = current_price * self.WATCH_ENTRY
+                rationale += self.RATIONALES["WATCH"]
             else:
                 action = "AVOID"
-                rationale += "Technical/Sentiment mix is weak. Not recommended."
+                rationale += self.RATIONALES["AVOID"]
                 
         return AdviceResult(
             action=action,
@@ -73,3 +134,86 @@ class InvestmentAdvisor:
             exit_point=exit_val,
             rationale=rationale
         )
+
+    def generate_advice_batch(self, current_price, tech_score, sentiment_score, holding_cost=None,
+                              tech_weight=None, sentiment_weight=None) -> AdviceBatch:
+        """
+        generate_advice over arrays (or Series) in one vectorized pass. Inputs
+        broadcast against each other, so scalars, per-position vectors and grids
+        mix freely. A NaN or 0 holding cost means no position (None in the scalar
+        call). Weights default to TECH_WEIGHT/SENTIMENT_WEIGHT.
+
+        Element for element the result matches generate_advice exactly: the same
+        float operations run in the same order, and the branch order is kept by np.select.
+        """
+        tech_weight = self.TECH_WEIGHT if tech_weight is None else tech_weight
+        sentiment_weight = self.SENTIMENT_WEIGHT if sentiment_weight is None else sentiment_weight
+        holding_cost = np.nan if holding_cost is None else holding_cost
+        price, tech, sentiment, cost, w_tech, w_sentiment = np.broadcast_arrays(
+            *(np.asarray(a, dtype=np.float64) for a in
+              (current_price, tech_score, sentiment_score, holding_cost, tech_weight, sentiment_weight)))
+
+        alpha = (tech * w_tech) + (sentiment * w_sentiment)
+        # `if holding_cost:` in the scalar path: 0 and None (NaN here) mean not holding
+        holding = ~np.isnan(cost) & (cost != 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            in_profit = np.where(holding, (price - cost) / cost, np.nan) > 0
+
+        add = holding & (alpha > self.ADD_ALPHA)
+        cut = holding & ~add & (alpha < self.CUT_LOSS_ALPHA)
+        hold = holding & ~add & ~cut & (alpha > self.HOLD_ALPHA)
+        buy = ~holding & (alpha > self.BUY_ALPHA)
+        watch = ~holding & ~buy & (alpha > self.WATCH_ALPHA)
+
+        action = np.select(
+            [add & in_profit, add, cut, hold, holding, buy, watch],
+            ["ADD POSITION", "HOLD/AVERAGE DOWN", "SELL/CUT LOSS", "HOLD", "REDUCE", "BUY", "WATCH"],
+            default="AVOID").astype(object)
+        entry = np.select([buy, watch], [price * self.BUY_ENTRY, price * self.WATCH_ENTRY], default=np.nan)
+        exit_val = np.select([cut, hold, buy], [price * self.CUT_LOSS_EXIT, price * self.HOLD_TARGET,
+                                                price * self.BUY_TARGET], default=np.nan)
+        return AdviceBatch(action=action, entry_point=entry, exit_point=exit_val, alpha=alpha)
+
+    def generate_advice_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Advice for a portfolio frame with current_price, tech_score, sentiment_score
+        and optionally holding_cost columns (NaN = no position). Returns a copy with
+        alpha, advice_action, entry_point and exit_point added.
+        """
+        batch = self.generate_advice_batch(df["current_price"], df["tech_score"], df["sentiment_score"],
+                                           df["holding_cost"] if "holding_cost" in df.columns else None)
+        return df.assign(alpha=batch.alpha, advice_action=batch.action,
+                         entry_point=batch.entry_point, exit_point=batch.exit_point)
+
+    def scenario_grid(self, current_price, tech_score, sentiment_score, holding_costs: Iterable[Optional[float]],
+                      weights: Optional[Iterable[Tuple[float, float]]] = None) -> pd.DataFrame:
+        """
+        What-if grid: advice for every position x holding cost x (tech, sentiment)
+        weight mix, in one generate_advice_batch call. A None holding cost is the
+        "not holding" scenario. Default weights: the advisor's own mix. One row per combination.
+        """
+        weights = [(self.TECH_WEIGHT, self.SENTIMENT_WEIGHT)] if weights is None else weights
+        price, tech, sentiment = (np.atleast_1d(np.asarray(a, dtype=np.float64))
+                                  for a in (current_price, tech_score, sentiment_score))
+        costs = np.array([np.nan if cost is None else cost for cost in holding_costs], dtype=np.float64)
+        weights = np.asarray(list(weights), dtype=np.float64).reshape(-1, 2)
+
+        # Axes: (position, holding cost, weight mix)
+        batch = self.generate_advice_batch(
+            price[:, None, None], tech[:, None, None], sentiment[:, None, None], costs[None, :, None],
+            weights[None, None, :, 0], weights[None, None, :, 1])
+        shape = batch.action.shape
+        position, cost_idx, weight_idx = (axis.ravel() for axis in np.indices(shape))
+        return pd.DataFrame({
+            "position": position,
+            "current_price": np.broadcast_to(price[:, None, None], shape).ravel(),
+            "tech_score": np.broadcast_to(tech[:, None, None], shape).ravel(),
+            "sentiment_score": np.broadcast_to(sentiment[:, None, None], shape).ravel(),
+            "holding_cost": costs[cost_idx],
+            "tech_weight": weights[weight_idx, 0],
+            "sentiment_weight": weights[weight_idx, 1],
+            "alpha": batch.alpha.ravel(),
+            "advice_action": batch.action.ravel(),
+            "entry_point": batch.entry_point.ravel(),
+            "exit_point": batch.exit_point.ravel(),
+        })
@@ -1,30 +1,104 @@
+import logging
 import pandas as pd
 import numpy as np
 from dataclasses import dataclass
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple, Union
+from app.services import indicators as ta_numpy
+from app.services.bars import Bars
+from app.services.incremental import IndicatorEngine, IndicatorStateStore
+
+logger = logging.getLogger(__name__)
 
 try:
     import talib
+    INDICATOR_BACKEND = "TA-Lib"
 except ImportError:
-    # Mocking talib for environments where C-lib is missing (local dev without compiled lib)
-    class MockTalib:
-        def __getattr__(self, name):
-            def mock_func(*args, **kwargs):
-                # Return dummy values: mostly arrays of same length as input
-                if len(args) > 0:
-                    arr = args[0]
-                    if isinstance(arr, np.ndarray):
-                        if name == 'BBANDS':
-                            return arr, arr, arr
-                        if name == 'MACD':
-                            return arr, arr, arr
-                        if name == 'STOCH':
-                            return arr, arr
-                        return arr
-                return 0.0
-            return mock_func
-    talib = MockTalib()
-    print("WARNING: TA-Lib not found. Using Mock object for local dev.")
+    # TA-Lib C library missing (slim containers, local dev without compiled lib):
+    # fall back to the vectorized NumPy implementations, which follow TA-Lib's
+    # conventions (see benchmarks/indicators.py for the accuracy/throughput check).
+    talib = ta_numpy
+    INDICATOR_BACKEND = "NumPy"
+    logger.warning("TA-Lib not found. Using NumPy indicator backend.")
+
+def score_bars(rsi, macd_diff, k, ma5, ma20, close, bb_low, bb_high):
+    """
+    Technical score (0-100) from the latest indicator values. Works element-wise on
+    scalars or arrays, so the single-ticker, panel and backtest paths share the rules.
+    NaN indicators should already be replaced by 0.0 (see safe_get).
+    """
+    score = 50 # Start neutral
+
+    # RSI Score
+    score = score + np.where(rsi < 30, 15, np.where(rsi > 70, -15, 0))
+
+    # MACD Score
+    score = score + np.where(macd_diff > 0, 10, -10)
+
+    # KDJ Score
+    score = score + np.where(k < 20, 10, np.where(k > 80, -10, 0))
+
+    # MA Trend
+    score = score + np.where(ma5 > ma20, 10, -10)
+
+    # Bollinger
+    score = score + np.where(close < bb_low, 5, np.where(close > bb_high, -5, 0))
+
+    return np.clip(score, 0, 100)
+
+def signal_for(score):
+    """
+    Map technical score(s) to a signal string (or array of them).
+    """
+    return np.select(
+        [score >= 80, score >= 60, score <= 20, score <= 40],
+        ["STRONG_BUY", "BUY", "STRONG_SELL", "SELL"],
+        default="HOLD"
+    )
+
+def panel_indicators(close: np.ndarray, high: np.ndarray, low: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Full indicator arrays for an aligned (tickers, bars) panel, computed in one
+    vectorized pass. Same parameters as TechnicalAnalyzer.analyze.
+    """
+    macd, macd_signal, macd_hist = ta_numpy.MACD(close, fastperiod=12, slowperiod=26, signalperiod=9)
+    k, d = ta_numpy.STOCH(high, low, close, fastk_period=9, slowk_period=3, slowk_matype=0,
+                          slowd_period=3, slowd_matype=0)
+    upper, middle, lower = ta_numpy.BBANDS(close, timeperiod=20, nbdevup=2, nbdevdn=2, matype=0)
+    return {
+        "RSI": ta_numpy.RSI(close, timeperiod=14),
+        "MACD": macd,
+        "MACD_Signal": macd_signal,
+        "MACD_Hist": macd_hist,
+        "KDJ_K": k,
+        "KDJ_D": d,
+        "KDJ_J": 3 * k - 2 * d,
+        "MA5": ta_numpy.SMA(close, timeperiod=5),
+        "MA20": ta_numpy.SMA(close, timeperiod=20),
+        "BB_High": upper,
+        "BB_Low": lower,
+        "Close": close,
+    }
+
+def build_panel(frames: Dict[str, pd.DataFrame], bars: int = 500) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Align per-ticker history frames into right-aligned (tickers, bars) close/high/low
+    arrays. Tickers with shorter history are NaN-padded at the start.
+    """
+    tickers = [t for t, df in frames.items() if not df.empty]
+    close, high, low = (np.full((len(tickers), bars), np.nan) for _ in range(3))
+    for i, ticker in enumerate(tickers):
+        df = frames[ticker].iloc[-bars:]
+        n = len(df)
+        close[i, bars - n:] = df["Close"].values
+        high[i, bars - n:] = df["High"].values
+        low[i, bars - n:] = df["Low"].values
+    return tickers, close, high, low
+
+@dataclass
+class PanelResult:
+    scores: np.ndarray
+    signals: np.ndarray
+    indicators: Dict[str, np.ndarray] # Latest value per ticker, same keys as AnalysisResult.indicators
 
 @dataclass
 class AnalysisResult:
@@ -34,18 +108,23 @@ class AnalysisResult:
     signal: str 
 
 class TechnicalAnalyzer:
-    def analyze(self, df: pd.DataFrame) -> AnalysisResult:
+    def __init__(self, state_store: Optional[IndicatorStateStore] = None):
+        # Per-ticker incremental indicator state, used by analyze_incremental
+        self.state_store = state_store
+
+    def analyze(self, df: Union[Bars, pd.DataFrame]) -> AnalysisResult:
         """
-        Perform comprehensive technical analysis on the dataframe using TA-Lib.
-        Expects columns: Open, High, Low, Close, Volume
+        Perform comprehensive technical analysis on the bars using TA-Lib
+        (or the NumPy backend when TA-Lib is not installed).
+        Takes Bars or a DataFrame with columns: Open, High, Low, Close, Volume
         """
         if df.empty:
             return AnalysisResult(0, "No data", {}, "HOLD")
 
-        # TA-Lib requires numpy arrays of float type
-        close = df['Close'].values
-        high = df['High'].values
-        low = df['Low'].values
+        # TA-Lib requires float64 numpy arrays; views of Bars (and of float64 columns) are used as is
+        close = np.asarray(df['Close'], dtype=np.float64)
+        high = np.asarray(df['High'], dtype=np.float64)
+        low = np.asarray(df['Low'], dtype=np.float64)
 
         # 1. Calculate Indicators using TA-Lib
         # MACD (fast=12, slow=26, signal=9)
@@ -73,71 +152,68 @@ class TechnicalAnalyzer:
         ma5 = talib.SMA(close, timeperiod=5)
         ma20 = talib.SMA(close, timeperiod=20)
         
+        return self._result_from_latest({
+            "RSI": rsi[-1],
+            "MACD": macd[-1],
+            "MACD_Signal": macd_signal[-1],
+            "MACD_Hist": macd_hist[-1], # TA-Lib MACD Hist IS the "diff" usually (MACD - Signal)
+            "KDJ_K": k[-1],
+            "KDJ_D": d[-1],
+            "KDJ_J": j[-1],
+            "MA5": ma5[-1],
+            "MA20": ma20[-1],
+            "BB_High": upper[-1],
+            "BB_Low": lower[-1],
+            "Close": close[-1]
+        })
+
+    def analyze_incremental(self, ticker: str, df: Union[Bars, pd.DataFrame]) -> AnalysisResult:
+        """
+        Same result as analyze(df), but reuses the ticker's persisted indicator state
+        and only folds in the bars that arrived since the last run.
+
+        The state is persisted up to the second-to-last bar: the last one may be an
+        intraday bar that keeps changing, so it is applied to a throwaway copy.
+        """
+        if self.state_store is None or df.empty or "Date" not in df.columns:
+            return self.analyze(df)
+
+        engine = self.state_store.load(ticker)
+        if engine is None or not engine.matches(df[:-1]):
+            # No state yet, or prices were re-adjusted / window moved past it
+            engine = IndicatorEngine()
+        if engine.advance(df[:-1]):
+            self.state_store.save(ticker, engine)
+
+        provisional = engine.copy()
+        provisional.advance(df[-1:])
+        return self._result_from_latest(provisional.latest())
+
+    def _result_from_latest(self, latest: Dict[str, float]) -> AnalysisResult:
         # Safely get latest values (handle NaNs at start)
         # We need the last valid value or just the last element
-        def safe_get(arr):
-            val = arr[-1]
+        def safe_get(val):
             return float(val) if not np.isnan(val) else 0.0
 
-        latest_rsi = safe_get(rsi)
-        latest_macd_diff = safe_get(macd_hist) # TA-Lib MACD Hist IS the "diff" usually (MACD - Signal)
-        latest_macd = safe_get(macd)
-        latest_macd_signal = safe_get(macd_signal)
-        latest_k = safe_get(k)
-        latest_d = safe_get(d)
-        latest_j = safe_get(j)
-        latest_ma5 = safe_get(ma5)
-        latest_ma20 = safe_get(ma20)
-        latest_bb_low = safe_get(lower)
-        latest_bb_high = safe_get(upper)
-        latest_close = float(close[-1])
+        latest_rsi = safe_get(latest["RSI"])
+        latest_macd_diff = safe_get(latest["MACD_Hist"])
+        latest_macd = safe_get(latest["MACD"])
+        latest_macd_signal = safe_get(latest["MACD_Signal"])
+        latest_k = safe_get(latest["KDJ_K"])
+        latest_d = safe_get(latest["KDJ_D"])
+        latest_j = safe_get(latest["KDJ_J"])
+        latest_ma5 = safe_get(latest["MA5"])
+        latest_ma20 = safe_get(latest["MA20"])
+        latest_bb_low = safe_get(latest["BB_Low"])
+        latest_bb_high = safe_get(latest["BB_High"])
+        latest_close = float(latest["Close"])
         
         # 2. Scoring Logic (0-100)
-        score = 50 # Start neutral
-        
-        # RSI Score
-        if latest_rsi < 30:
-            score += 15
-        elif latest_rsi > 70:
-            score -= 15
-            
-        # MACD Score
-        if latest_macd_diff > 0:
-            score += 10
-        else:
-            score -= 10
-            
-        # KDJ Score
-        if latest_k < 20:
-             score += 10
-        elif latest_k > 80:
-             score -= 10
-             
-        # MA Trend
-        if latest_ma5 > latest_ma20:
-            score += 10
-        else:
-            score -= 10
-            
-        # Bollinger
-        if latest_close < latest_bb_low:
-            score += 5 
-        elif latest_close > latest_bb_high:
-            score -= 5
-
-        score = max(0, min(100, score))
+        score = int(score_bars(latest_rsi, latest_macd_diff, latest_k, latest_ma5, latest_ma20,
+                               latest_close, latest_bb_low, latest_bb_high))
         
         # 3. Determine Signal
-        if score >= 80:
-            signal = "STRONG_BUY"
-        elif score >= 60:
-            signal = "BUY"
-        elif score <= 20:
-            signal = "STRONG_SELL"
-        elif score <= 40:
-            signal = "SELL"
-        else:
-            signal = "HOLD"
+        signal = str(signal_for(score))
             
         indicators = {
             "RSI": latest_rsi,
@@ -155,7 +231,24 @@ class TechnicalAnalyzer:
         
         return AnalysisResult(
             score=score,
-            summary=f"Technical Score (TA-Lib): {score}/100. Trend detected.",
+            summary=f"Technical Score ({INDICATOR_BACKEND}): {score}/100. Trend detected.",
             indicators=indicators,
             signal=signal
         )
+
+    def analyze_panel(self, close: np.ndarray, high: np.ndarray, low: np.ndarray) -> PanelResult:
+        """
+        Score many tickers at once from aligned (tickers, bars) arrays (see build_panel).
+        Gives the same scores and signals as calling analyze on each ticker.
+        """
+        close, high, low = (np.atleast_2d(np.asarray(a, dtype=np.float64)) for a in (close, high, low))
+        full = panel_indicators(close, high, low)
+
+        # Same as safe_get: NaN (not enough history) counts as 0.0, except the close itself
+        latest = {name: np.nan_to_num(arr[:, -1], nan=0.0) for name, arr in full.items() if name != "Close"}
+        latest["Close"] = close[:, -1]
+
+        scores = score_bars(latest["RSI"], latest["MACD_Hist"], latest["KDJ_K"], latest["MA5"], latest["MA20"],
+                            latest["Close"], latest["BB_Low"], latest["BB_High"])
+        del latest["MACD_Hist"]
+        return PanelResult(scores=scores, signals=signal_for(scores), indicators=latest)
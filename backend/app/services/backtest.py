@@ -0,0 +1,215 @@
+"""
+Vectorized historical backtest of the TechnicalAnalyzer scoring rules and the
+InvestmentAdvisor entry/exit logic.
+
+Indicators and technical scores are computed for every bar of a (tickers, bars)
+panel at once (see analyzer.panel_indicators / score_bars). The trade
+simulation then walks the bars once, updating every ticker in the same array
+operation, so a 5000 x 500 panel runs in seconds.
+
+Trading model, per ticker (decisions at a bar's close, fills on the next bar):
+  * flat and alpha > buy_alpha      -> buy limit at close * buy_entry, valid for
+                                       the next bar only; target close * buy_target
+  * holding and alpha < cut_loss    -> sell at close * cut_loss_exit on the next bar
+  * holding and alpha > hold_alpha  -> target moves to close * hold_target
+    (but not above add_alpha, which the advisor treats as "add position")
+  * holding and the next bar's high reaches the target -> sell at the target
+ADD/REDUCE/WATCH advice does not change the (all-or-nothing) position.
+Historical sentiment is not available, so a constant sentiment score is used.
+
+    from app.services.backtest import run_backtest, sweep, param_grid
+    result = run_backtest(close, high, low)
+    result.summary()
+    results = sweep(close, high, low, param_grid(buy_alpha=[60, 65, 70], tech_weight=[0.5, 0.6]))
+"""
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields, replace
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.services.advisor import InvestmentAdvisor
+from app.services.analyzer import panel_indicators, score_bars
+
+_advisor = InvestmentAdvisor
+
+
+@dataclass(frozen=True)
+class BacktestParams:
+    tech_weight: float = _advisor.TECH_WEIGHT
+    sentiment_weight: float = _advisor.SENTIMENT_WEIGHT
+    sentiment_score: float = 50.0 # Neutral; no sentiment history to replay
+    buy_alpha: float = _advisor.BUY_ALPHA
+    add_alpha: float = _advisor.ADD_ALPHA
+    hold_alpha: float = _advisor.HOLD_ALPHA
+    cut_loss_alpha: float = _advisor.CUT_LOSS_ALPHA
+    buy_entry: float = _advisor.BUY_ENTRY
+    buy_target: float = _advisor.BUY_TARGET
+    hold_target: float = _advisor.HOLD_TARGET
+    cut_loss_exit: float = _advisor.CUT_LOSS_EXIT
+
+
+@dataclass
+class BacktestResult:
+    params: BacktestParams
+    total_return: np.ndarray # Per ticker, compounded, open positions marked to the last close
+    max_drawdown: np.ndarray # Per ticker, as a positive fraction of peak equity
+    trades: np.ndarray # Closed trades per ticker
+    wins: np.ndarray # Closed trades with a positive return
+    exposure: np.ndarray # Fraction of bars spent holding
+
+    def summary(self) -> Dict[str, float]:
+        trades = int(self.trades.sum())
+        return {
+            "tickers": int(self.total_return.size),
+            "mean_return": float(np.mean(self.total_return)),
+            "median_return": float(np.median(self.total_return)),
+            "mean_max_drawdown": float(np.mean(self.max_drawdown)),
+            "worst_max_drawdown": float(np.max(self.max_drawdown)),
+            "trades": trades,
+            "hit_rate": float(self.wins.sum() / trades) if trades else 0.0,
+            "mean_exposure": float(np.mean(self.exposure)),
+        }
+
+
+def tech_scores(close: np.ndarray, high: np.ndarray, low: np.ndarray) -> np.ndarray:
+    """
+    Technical score of every bar of every ticker, shape (tickers, bars).
+    Bars still in an indicator's lookback period score like analyze() does
+    (missing indicators count as 0.0).
+    """
+    full = panel_indicators(close, high, low)
+    latest = {name: np.nan_to_num(arr, nan=0.0) for name, arr in full.items() if name != "Close"}
+    return score_bars(latest["RSI"], latest["MACD_Hist"], latest["KDJ_K"], latest["MA5"], latest["MA20"],
+                      close, latest["BB_Low"], latest["BB_High"])
+
+
+def run_backtest(close: np.ndarray, high: np.ndarray, low: np.ndarray,
+                 params: BacktestParams = BacktestParams(),
+                 scores: Optional[np.ndarray] = None) -> BacktestResult:
+    """
+    Replay the advice rules over an aligned (tickers, bars) panel (see
+    analyzer.build_panel). NaN-padded leading bars are skipped per ticker.
+    Pass precomputed `scores` (from tech_scores) to reuse them across runs.
+    """
+    close, high, low = (np.atleast_2d(np.asarray(a, dtype=np.float64)) for a in (close, high, low))
+    if scores is None:
+        scores = tech_scores(close, high, low)
+    alpha = scores * params.tech_weight + params.sentiment_score * params.sentiment_weight
+
+    # Time-major copies so each bar is one contiguous slice of tickers
+    close_t, high_t, low_t, alpha_t = (np.ascontiguousarray(a.T) for a in (close, high, low, alpha))
+    n_tickers = close.shape[0]
+
+    holding = np.zeros(n_tickers, dtype=bool)
+    entry_price = np.zeros(n_tickers)
+    target = np.zeros(n_tickers)
+    buy_limit = np.full(n_tickers, np.nan) # Pending buy order for the next bar
+    buy_target = np.full(n_tickers, np.nan) # Target that comes with the pending buy
+    sell_limit = np.full(n_tickers, np.nan) # Pending cut-loss order for the next bar
+    realized = np.ones(n_tickers) # Equity from closed trades
+    peak = np.ones(n_tickers)
+    max_drawdown = np.zeros(n_tickers)
+    trades = np.zeros(n_tickers, dtype=np.int64)
+    wins = np.zeros(n_tickers, dtype=np.int64)
+    bars_held = np.zeros(n_tickers, dtype=np.int64)
+    bars_seen = np.zeros(n_tickers, dtype=np.int64)
+    last_close = np.full(n_tickers, np.nan)
+
+    for t in range(close_t.shape[0]):
+        c, h, l, a = close_t[t], high_t[t], low_t[t], alpha_t[t]
+        valid = ~np.isnan(c)
+
+        # 1. Exits for positions opened on earlier bars: cut-loss order first, then target
+        cut = holding & ~np.isnan(sell_limit) & valid
+        exit_price = np.where(cut, np.where(h >= sell_limit, sell_limit, c), np.nan)
+        hit = holding & ~cut & valid & (h >= target)
+        exit_price = np.where(hit, target, exit_price)
+        closing = cut | hit
+        if closing.any():
+            trade_return = np.where(closing, exit_price / np.where(closing, entry_price, 1.0), 1.0)
+            realized *= trade_return
+            trades += closing
+            wins += closing & (trade_return > 1.0)
+            holding &= ~closing
+
+        # 2. Fills of yesterday's buy orders
+        filled = ~holding & ~np.isnan(buy_limit) & valid & (l <= buy_limit)
+        entry_price = np.where(filled, buy_limit, entry_price)
+        target = np.where(filled, buy_target, target)
+        holding |= filled
+
+        # 3. Mark to market and track drawdown
+        with np.errstate(invalid="ignore", divide="ignore"):
+            equity = np.where(holding, realized * c / entry_price, realized)
+        equity = np.where(valid, equity, np.nan)
+        peak = np.fmax(peak, equity)
+        max_drawdown = np.fmax(max_drawdown, 1.0 - equity / peak)
+        bars_held += holding & valid
+        bars_seen += valid
+        last_close = np.where(valid, c, last_close)
+
+        # 4. Today's advice -> orders for tomorrow
+        buy = ~holding & valid & (a > params.buy_alpha)
+        buy_limit = np.where(buy, c * params.buy_entry, np.nan)
+        buy_target = c * params.buy_target
+        sell_limit = np.where(holding & valid & (a < params.cut_loss_alpha), c * params.cut_loss_exit, np.nan)
+        retarget = holding & valid & (a > params.hold_alpha) & (a <= params.add_alpha)
+        target = np.where(retarget, c * params.hold_target, target)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        final = np.where(holding, realized * last_close / entry_price, realized)
+    return BacktestResult(
+        params=params,
+        total_return=final - 1.0,
+        max_drawdown=max_drawdown,
+        trades=trades,
+        wins=wins,
+        exposure=np.where(bars_seen > 0, bars_held / np.maximum(bars_seen, 1), 0.0),
+    )
+
+
+def param_grid(**axes: Iterable) -> List[BacktestParams]:
+    """
+    Cartesian product of BacktestParams fields, e.g.
+    param_grid(buy_alpha=[60, 70], tech_weight=[0.5, 0.6]).
+    """
+    names = {f.name for f in fields(BacktestParams)}
+    unknown = set(axes) - names
+    if unknown:
+        raise ValueError(f"Unknown backtest parameters: {sorted(unknown)}")
+    keys = list(axes)
+    return [replace(BacktestParams(), **dict(zip(keys, values)))
+            for values in itertools.product(*(list(axes[k]) for k in keys))]
+
+
+# Per-process panel for sweep workers, shipped once through the pool initializer
+_worker_panel = None
+
+
+def _init_worker(close, high, low, scores):
+    global _worker_panel
+    _worker_panel = (close, high, low, scores)
+
+
+def _run_in_worker(params: BacktestParams) -> BacktestResult:
+    close, high, low, scores = _worker_panel
+    return run_backtest(close, high, low, params, scores=scores)
+
+
+def sweep(close: np.ndarray, high: np.ndarray, low: np.ndarray, grid: Iterable[BacktestParams],
+          max_workers: Optional[int] = None) -> List[BacktestResult]:
+    """
+    Run one backtest per parameter set on a process pool. Technical scores do not
+    depend on the advice parameters, so they are computed once up front and the
+    panel is sent to each worker process once.
+    """
+    grid = list(grid)
+    close, high, low = (np.atleast_2d(np.asarray(a, dtype=np.float64)) for a in (close, high, low))
+    scores = tech_scores(close, high, low)
+    if max_workers == 1 or len(grid) <= 1:
+        return [run_backtest(close, high, low, params, scores=scores) for params in grid]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(close, high, low, scores)) as pool:
+        return list(pool.map(_run_in_worker, grid))
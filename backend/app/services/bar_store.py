@@ -0,0 +1,73 @@
+import os
+import tempfile
+import time
+import logging
+from typing import Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Columns we keep on disk. Everything else AkShare returns (turnover, amplitude...)
+# is not used by the analyzers, so we don't pay for it.
+BAR_COLUMNS = ["Date", "Open", "Close", "High", "Low", "Volume"]
+
+
+class BarStore:
+    """
+    On-disk columnar OHLCV store, one Parquet file per (adjust mode, ticker):
+
+        <root>/<adjust>/<ticker>.parquet
+
+    The frame's `attrs` travel with the file and carry the first requested
+    date ("start") so the fetcher knows how far back the history goes.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, ticker: str, adjust: str) -> str:
+        return os.path.join(self.root, adjust or "raw", f"{ticker}.parquet")
+
+    def load(self, ticker: str, adjust: str) -> Optional[pd.DataFrame]:
+        path = self._path(ticker, adjust)
+        if not os.path.exists(path):
+            return None
+        try:
+            return pd.read_parquet(path)
+        except Exception as e:
+            # A torn or corrupt file is just a cache miss; it will be rewritten.
+            logger.warning(f"Discarding unreadable bar file {path}: {str(e)}")
+            return None
+
+    def save(self, ticker: str, adjust: str, df: pd.DataFrame) -> None:
+        path = self._path(ticker, adjust)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial file.
+        # The temp name is unique per write: threads may save the same ticker at once.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{ticker}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            df[BAR_COLUMNS].to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def touch(self, ticker: str, adjust: str) -> None:
+        """
+        Mark the stored history as freshly checked against upstream.
+        """
+        path = self._path(ticker, adjust)
+        if os.path.exists(path):
+            os.utime(path)
+
+    def age(self, ticker: str, adjust: str) -> Optional[float]:
+        """
+        Seconds since the stored history was last written or checked.
+        """
+        path = self._path(ticker, adjust)
+        try:
+            return time.time() - os.path.getmtime(path)
+        except OSError:
+            return None
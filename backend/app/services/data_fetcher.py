@@ -1,13 +1,58 @@
 from abc import ABC, abstractmethod
-import akshare as ak
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from typing import Optional, Dict, Tuple, Generator, Any, Union
+import os
 import time
 import logging
+from app.core.config import settings
+from app.core.metrics import RATE_LIMIT_WAIT_SECONDS, RATE_LIMIT_WAITS, cache_result
+from app.core.startup import LazyModule
+from app.services.bar_store import BarStore, BAR_COLUMNS
+from app.services.bars import Bars
+from app.core.concurrency import run_blocking
+from app.services.rate_limiter import TokenBucket, get_rate_limiter
+from app.services.upstream import get_upstream
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Imported on the first download; akshare alone takes most of the app's import time
+ak = LazyModule("akshare")
+
+# ticker -> (timestamp, price). Module level so it outlives the per-request fetchers.
+_quote_cache: Dict[str, Tuple[float, float]] = {}
+# (timestamp, {ticker: price}) of the last full-market spot snapshot
+_spot_cache: Tuple[float, Dict[str, float]] = (0.0, {})
+
+_PERIOD_UNITS = {"d": 1, "w": 5, "m": 21, "y": 250}
+
+# AkShare column for each of our price/volume columns (日期 is the date)
+_AK_COLUMNS = {"Open": "开盘", "Close": "收盘", "High": "最高", "Low": "最低", "Volume": "成交量"}
+
+def parse_period(period: str) -> int:
+    """
+    Convert a period string like "500d", "6m" or "1y" into a number of trading bars.
+    """
+    try:
+        count, unit = int(period[:-1]), _PERIOD_UNITS[period[-1].lower()]
+    except (KeyError, ValueError, IndexError):
+        raise ValueError(f"Invalid period '{period}', expected e.g. '500d', '6m' or '1y'")
+    if count <= 0:
+        raise ValueError(f"Invalid period '{period}', must be positive")
+    return count * unit
+
+def _step(plan: Generator, value: Optional[pd.DataFrame] = None) -> Tuple[bool, Any]:
+    """
+    Advance a history plan. Returns (done, value) instead of raising StopIteration,
+    which cannot cross thread/future boundaries.
+    """
+    try:
+        return False, plan.send(value)
+    except StopIteration as done:
+        return True, done.value
+
 class StockDataFetcher(ABC):
     @abstractmethod
     def fetch_history(self, ticker: str, period: str = "500d") -> pd.DataFrame:
@@ -17,108 +62,292 @@ class StockDataFetcher(ABC):
         """
         pass
 
+    async def fetch_history_async(self, ticker: str, period: str = "500d") -> pd.DataFrame:
+        """
+        Awaitable variant of fetch_history. Subclasses with a native async path
+        override this; the default just runs the blocking call in a thread.
+        """
+        return await run_blocking(self.fetch_history, ticker, period)
+
+    def fetch_bars(self, ticker: str, period: str = "500d") -> Bars:
+        """
+        fetch_history as array-backed Bars: one copy out of the frame, none after that.
+        """
+        return Bars.from_frame(self.fetch_history(ticker, period))
+
+    async def fetch_bars_async(self, ticker: str, period: str = "500d") -> Bars:
+        return Bars.from_frame(await self.fetch_history_async(ticker, period))
+
     @abstractmethod
-    def get_current_price(self, ticker: str) -> float:
+    def get_current_price(self, ticker: str, history: Optional[Union[Bars, pd.DataFrame]] = None) -> float:
         """
         Get the current price of the stock.
+        If the caller already holds the history (frame or Bars) it can pass it in
+        to avoid another upstream request.
         """
         pass
 
+    def get_spot_snapshot(self) -> Dict[str, float]:
+        """
+        Current prices for the whole market in one call, keyed by ticker.
+        Fetchers without a bulk quote source return an empty snapshot.
+        """
+        return {}
+
+    async def get_spot_snapshot_async(self) -> Dict[str, float]:
+        return await run_blocking(self.get_spot_snapshot)
+
 class AkShareFetcher(StockDataFetcher):
-    def __init__(self, max_requests_per_min: int = 60):
-        self.max_requests_per_min = max_requests_per_min
-        self.request_timestamps = []
+    def __init__(self, adjust: str = "qfq", store: Optional[BarStore] = None, limiter: Optional[TokenBucket] = None):
+        self.adjust = adjust
+        if store is None and settings.bar_store_enabled:
+            store = BarStore(os.path.join(settings.data_dir, "bars"))
+        self.store = store
+        # Shared by every fetcher in the process (and across workers, see rate_limiter)
+        self.limiter = limiter or get_rate_limiter()
 
     def _rate_limit(self):
+        waited = self.limiter.acquire()
+        if waited > 0:
+            RATE_LIMIT_WAITS.inc()
+            RATE_LIMIT_WAIT_SECONDS.inc(waited)
+            logger.warning(f"Rate limit reached. Slept for {waited:.2f} seconds.")
+
+    async def _rate_limit_async(self):
+        waited = await self.limiter.acquire_async()
+        if waited > 0:
+            RATE_LIMIT_WAITS.inc()
+            RATE_LIMIT_WAIT_SECONDS.inc(waited)
+            logger.warning(f"Rate limit reached. Waited {waited:.2f} seconds.")
+
+    def fetch_history(self, ticker: str, period: str = "500d") -> pd.DataFrame:
+        if not self._is_a_share(ticker):
+            return pd.DataFrame()
+
+        bars, start_str, end_str = self._window(period)
+        try:
+            plan = self._history_plan(ticker, start_str, end_str)
+            done, value = _step(plan)
+            while not done:
+                self._rate_limit()
+                try:
+                    frame = self._download(ticker, *value)
+                except Exception as e:
+                    stale = self._stale_history(ticker, bars, e)
+                    if stale is None:
+                        raise
+                    return stale
+                done, value = _step(plan, frame)
+            return self._tail(ticker, value, bars)
+        except Exception as e:
+            logger.error(f"Error fetching history for {ticker}: {str(e)}")
+            raise
+
+    async def fetch_history_async(self, ticker: str, period: str = "500d") -> pd.DataFrame:
         """
-        Simple sliding window rate limiter.
+        Same as fetch_history, but rate-limit waits are awaited on the event loop
+        and the blocking store/network work runs on the shared thread pool.
         """
-        now = time.time()
-        self.request_timestamps = [t for t in self.request_timestamps if now - t < 60]
-        
-        if len(self.request_timestamps) >= self.max_requests_per_min:
-            sleep_time = 60 - (now - self.request_timestamps[0])
-            if sleep_time > 0:
-                logger.warning(f"Rate limit reached. Sleeping for {sleep_time:.2f} seconds.")
-                time.sleep(sleep_time)
-        
-        self.request_timestamps.append(time.time())
+        if not self._is_a_share(ticker):
+            return pd.DataFrame()
 
-    def fetch_history(self, ticker: str, period: str = "500d") -> pd.DataFrame:
-        self._rate_limit()
+        bars, start_str, end_str = self._window(period)
         try:
-            # AkShare handles A-shares (e.g., 000001) well.
-            # Format usually: '000001' -> convert to specific format if needed or try auto.
-            # ak.stock_zh_a_hist expects 6 digit code.
-            
-            # Start/End date calculation
-            end_date = datetime.now()
-            # 500 trading days is roughly 2.5 years (730 days) to be safe
-            start_date = end_date - timedelta(days=500 * 1.5) 
-            
-            start_str = start_date.strftime("%Y%m%d")
-            end_str = end_date.strftime("%Y%m%d")
-            
-            logger.info(f"Fetching AkShare data for {ticker} from {start_str}")
-            
-            # This is specific for A-shares. Ideally we'd detect market.
-            # For this MVP, we assume A-share codes (6 digits).
-            # If ticker is like 'AAPL', this will fail or we need a configured US fetcher.
-            # Assuming User inputs 6-digit code for A-shares or we default to A-shares.
-            
-            if ticker.isdigit() and len(ticker) == 6:
-                df = ak.stock_zh_a_hist(symbol=ticker, start_date=start_str, end_date=end_str, adjust="qfq")
-                # Columns: 日期, 开盘, 收盘, 最高, 最低, 成交量, ...
-                # Rename to English
-                df = df.rename(columns={
-                    "日期": "Date",
-                    "开盘": "Open", 
-                    "收盘": "Close", 
-                    "最高": "High", 
-                    "最低": "Low", 
-                    "成交量": "Volume"
-                })
-                # Ensure float
-                cols = ["Open", "Close", "High", "Low", "Volume"]
-                df[cols] = df[cols].astype(float)
-                
-            else:
-                # Fallback or different generic function, akshare has US stock too?
-                # ak.stock_us_hist(symbol='105.AAPL', ...) - needs adjustment.
-                # For simplicity, let's treat non-digits as US stocks if supported, or error.
-                # But requirement said "AkShare + TA-Lib".
-                logger.warning(f"Ticker {ticker} format not standard A-share. Trying US logic or returning empty.")
-                return pd.DataFrame()
-
-            if df.empty:
-                logger.error(f"No data found for {ticker}")
-                return pd.DataFrame()
-
-            if len(df) > 500:
-                df = df.iloc[-500:]
-            
-            return df
+            plan = self._history_plan(ticker, start_str, end_str)
+            done, value = await run_blocking(_step, plan)
+            while not done:
+                await self._rate_limit_async()
+                try:
+                    frame = await run_blocking(self._download, ticker, *value)
+                except Exception as e:
+                    stale = self._stale_history(ticker, bars, e)
+                    if stale is None:
+                        raise
+                    return stale
+                done, value = await run_blocking(_step, plan, frame)
+            return self._tail(ticker, value, bars)
         except Exception as e:
             logger.error(f"Error fetching history for {ticker}: {str(e)}")
             raise
 
-    def get_current_price(self, ticker: str) -> float:
-        self._rate_limit()
+    def _is_a_share(self, ticker: str) -> bool:
+        # This is specific for A-shares. Ideally we'd detect market.
+        # For this MVP, we assume A-share codes (6 digits).
+        # If ticker is like 'AAPL', this will fail or we need a configured US fetcher.
+        # Assuming User inputs 6-digit code for A-shares or we default to A-shares.
+        if ticker.isdigit() and len(ticker) == 6:
+            return True
+        # Fallback or different generic function, akshare has US stock too?
+        # ak.stock_us_hist(symbol='105.AAPL', ...) - needs adjustment.
+        # For simplicity, let's treat non-digits as US stocks if supported, or error.
+        # But requirement said "AkShare + TA-Lib".
+        logger.warning(f"Ticker {ticker} format not standard A-share. Trying US logic or returning empty.")
+        return False
+
+    def _window(self, period: str) -> Tuple[int, str, str]:
+        bars = parse_period(period)
+        # Start/End date calculation
+        end_date = datetime.now()
+        # 500 trading days is roughly 2.5 years (730 days) to be safe.
+        # Short windows get extra slack to survive long holidays (Spring Festival).
+        start_date = end_date - timedelta(days=max(bars * 1.5, bars + 15))
+        return bars, start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d")
+
+    def _tail(self, ticker: str, df: pd.DataFrame, bars: int) -> pd.DataFrame:
+        if df.empty:
+            logger.error(f"No data found for {ticker}")
+            return pd.DataFrame()
+
+        if len(df) > bars:
+            df = df.iloc[-bars:]
+        return df
+
+    def _stale_history(self, ticker: str, bars: int, error: Exception) -> Optional[pd.DataFrame]:
+        """
+        Last known good bars from the store, for when AkShare keeps failing or its
+        circuit is open. The frame is flagged with attrs["stale"]; None if nothing is stored.
+        """
+        stored = self.store.load(ticker, self.adjust) if self.store else None
+        if stored is None or stored.empty:
+            return None
+        cache_result("bars", "stale")
+        logger.warning(f"AkShare unavailable for {ticker} ({str(error)}), serving stored bars as stale")
+        df = self._tail(ticker, stored, bars).copy()
+        df.attrs["stale"] = True
+        return df
+
+    def _history_plan(self, ticker: str, start_str: str, end_str: str) -> Generator[Tuple[str, str], pd.DataFrame, pd.DataFrame]:
+        """
+        Serve history from the local bar store, only asking AkShare for the bars
+        after the last stored date. Falls back to a full download when nothing
+        is stored yet or when the qfq adjustment has moved.
+
+        This is a generator so the sync and async fetch paths share the logic:
+        it yields the (start, end) window it needs from AkShare, is sent back the
+        downloaded frame, and finally returns the merged history.
+        """
+        stored = self.store.load(ticker, self.adjust) if self.store else None
+        if stored is not None and (len(stored) < 2 or stored.attrs.get("start", "") > start_str):
+            # Not enough stored history to cover the requested window.
+            stored = None
+
+        if stored is None:
+            if self.store:
+                cache_result("bars", "miss")
+            df = yield start_str, end_str
+            df.attrs["start"] = start_str
+        else:
+            age = self.store.age(ticker, self.adjust)
+            if age is not None and age < settings.bar_store_max_age:
+                cache_result("bars", "hit")
+                return stored
+            cache_result("bars", "delta")
+
+            # Re-request from the second-to-last stored bar. The last one may be an
+            # intraday bar that is still moving; the one before it is final, so if
+            # its price differs upstream the qfq adjustment has changed (dividend,
+            # split...) and every stored price is off.
+            anchor = stored.iloc[-2]
+            delta = yield anchor["Date"].strftime("%Y%m%d"), end_str
+            if delta.empty:
+                self.store.touch(ticker, self.adjust)
+                return stored
+
+            anchor_rows = delta[delta["Date"] == anchor["Date"]]
+            if anchor_rows.empty or abs(anchor_rows["Close"].iloc[0] - anchor["Close"]) > 1e-6:
+                logger.info(f"qfq adjustment changed for {ticker}, rewriting stored history")
+                df = yield start_str, end_str
+                df.attrs["start"] = start_str
+            else:
+                df = pd.concat([stored[stored["Date"] < anchor["Date"]], delta], ignore_index=True)
+                df.attrs["start"] = stored.attrs.get("start", start_str)
+
+        if self.store and not df.empty:
+            self.store.save(ticker, self.adjust, df)
+        return df
+
+    def _download(self, ticker: str, start_str: str, end_str: str) -> pd.DataFrame:
+        logger.info(f"Fetching AkShare data for {ticker} from {start_str}")
+
+        # ak.stock_zh_a_hist expects 6 digit code.
+        # Retries, hedges and the circuit breaker live in the upstream client;
+        # its extra requests draw from the same rate limit.
+        df = get_upstream("stock_zh_a_hist").call(ak.stock_zh_a_hist, symbol=ticker, start_date=start_str,
+                                                  end_date=end_str, adjust=self.adjust, throttle=self._rate_limit)
+        if df.empty:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+
+        # Columns: 日期, 开盘, 收盘, 最高, 最低, 成交量, ...
+        # Take just the ones we keep, straight into float64 arrays under English names
+        # (one copy per column, instead of rename + astype + select copying the whole frame)
+        return pd.DataFrame({"Date": pd.to_datetime(df["日期"]),
+                             **{name: df[column].to_numpy(dtype=np.float64) for name, column in _AK_COLUMNS.items()}})
+
+    def get_current_price(self, ticker: str, history: Optional[Union[Bars, pd.DataFrame]] = None) -> float:
+        # ak.stock_zh_a_spot_em() is real-time but returns ALL stocks (heavy).
+        # For a single ticker the last close of the daily history is the cheapest quote,
+        # and the /analyze path has already loaded that history, so reuse it when given.
+        if history is not None and not history.empty:
+            price = float(np.asarray(history["Close"])[-1])
+            _quote_cache[ticker] = (time.time(), price)
+            return price
+
+        cached = _quote_cache.get(ticker)
+        if cached and time.time() - cached[0] < settings.quote_cache_ttl:
+            cache_result("quote", "hit")
+            return cached[1]
+        cache_result("quote", "miss")
+
         try:
-            # ak.stock_zh_a_spot_em() retrieves all spot data (heavy).
-            # Better to use history last close or specific single stock spot if available.
-            # fast way: fetch 1 day history?
-            # Or use ak.stock_zh_a_spot_em() filtered (returns big DF though).
-            
-            # Let's try getting valid realtime data if possible. 
-            # ak.stock_zh_a_spot_em() is real-time but returns ALL stocks.
-            # Actually, `stock_zh_a_hist` with today's date might work if market closed or during trading?
-            # For efficiency in this specific tool, fetching history (last row) is safest/fastest individual query given constraints.
-            
             df = self.fetch_history(ticker, period="5d") # Fetch small history
             if not df.empty:
-                return df["Close"].iloc[-1]
+                price = float(df["Close"].iloc[-1])
+                _quote_cache[ticker] = (time.time(), price)
+                return price
             return 0.0
         except Exception as e:
             logger.error(f"Error fetching current price for {ticker}: {str(e)}")
             raise
+
+    def get_spot_snapshot(self) -> Dict[str, float]:
+        cached = self._cached_spot()
+        if cached is not None:
+            return cached
+        self._rate_limit()
+        return self._download_spot()
+
+    async def get_spot_snapshot_async(self) -> Dict[str, float]:
+        cached = self._cached_spot()
+        if cached is not None:
+            return cached
+        await self._rate_limit_async()
+        return await run_blocking(self._download_spot)
+
+    def _cached_spot(self) -> Optional[Dict[str, float]]:
+        fetched_at, snapshot = _spot_cache
+        if snapshot and time.time() - fetched_at < settings.spot_cache_ttl:
+            cache_result("spot", "hit")
+            return snapshot
+        cache_result("spot", "miss")
+        return None
+
+    def _download_spot(self) -> Dict[str, float]:
+        global _spot_cache
+        logger.info("Fetching AkShare spot snapshot for all A-shares")
+        # ak.stock_zh_a_spot_em() returns ALL stocks; that is exactly what we want here.
+        try:
+            df = get_upstream("stock_zh_a_spot_em").call(ak.stock_zh_a_spot_em, throttle=self._rate_limit)
+        except Exception as e:
+            fetched_at, snapshot = _spot_cache
+            if not snapshot:
+                raise
+            cache_result("spot", "stale")
+            logger.warning(f"Spot snapshot unavailable ({str(e)}), reusing the one from {time.time() - fetched_at:.0f}s ago")
+            return snapshot
+        df = df[["代码", "最新价"]].dropna() # Suspended stocks have no price
+        now = time.time()
+        snapshot = dict(zip(df["代码"].astype(str), df["最新价"].astype(float)))
+        _spot_cache = (now, snapshot)
+        # Single-ticker quotes can be served from the snapshot too
+        _quote_cache.update({ticker: (now, price) for ticker, price in snapshot.items()})
+        return snapshot
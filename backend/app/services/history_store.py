@@ -0,0 +1,239 @@
+"""
+Append-only history of every analysis, in SQLite (WAL mode).
+
+The request path only puts the response on an in-memory queue; a background
+thread writes queued rows in batches, one transaction per batch, so writes
+never wait on disk. Readers use their own per-thread connections and, thanks
+to WAL, do not block the writer.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.models.schemas import AnalysisResponse
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    ticker TEXT NOT NULL,
+    analysis_date TEXT NOT NULL,
+    current_price REAL,
+    tech_score REAL,
+    tech_signal TEXT,
+    sentiment_score REAL,
+    overall_score REAL,
+    advice_action TEXT,
+    indicators TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_ticker_date ON analyses (ticker, analysis_date);
+-- Every ticker ever written, so cross-ticker queries can seek the index per ticker
+-- instead of scanning the whole table
+CREATE TABLE IF NOT EXISTS tickers (ticker TEXT PRIMARY KEY) WITHOUT ROWID;
+"""
+
+_COLUMNS = ("id", "ticker", "analysis_date", "current_price", "tech_score", "tech_signal",
+            "sentiment_score", "overall_score", "advice_action", "indicators")
+
+# Scores /history/movers can rank by
+MOVER_METRICS = ("tech_score", "sentiment_score", "overall_score")
+
+
+def _end_bound(end: str) -> str:
+    # analysis_date is an ISO timestamp; a bare day as the end includes that whole day
+    return end if "T" in end else f"{end}T99"
+
+
+class HistoryStore:
+    def __init__(self, path: str, queue_size: int = 10000, batch_size: int = 500):
+        self.path = path
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Tuple]]" = queue.Queue(maxsize=queue_size)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        conn.close()
+
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: a crash can lose the last transactions but never corrupts the file
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only=ON")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    # --- writes -----------------------------------------------------------
+
+    def append(self, response: AnalysisResponse) -> None:
+        """
+        Queue a response for writing. Never blocks: if the writer has fallen this
+        far behind, the row is dropped and counted.
+        """
+        row = (response.ticker, response.analysis_date, response.current_price, response.tech_score,
+               response.tech_signal, response.sentiment_score, response.overall_score,
+               response.advice_action, json.dumps(response.indicators))
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"History writer is behind, dropped {self.dropped} rows so far")
+
+    def _write_loop(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            rows = [self._queue.get()]
+            # Drain whatever else is waiting into the same transaction
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in rows:
+                stopping = True
+                rows = [row for row in rows if row is not None]
+            if not rows:
+                continue
+            try:
+                with conn:
+                    conn.executemany("INSERT OR IGNORE INTO tickers (ticker) VALUES (?)",
+                                     {(row[0],) for row in rows})
+                    conn.executemany(
+                        "INSERT INTO analyses (ticker, analysis_date, current_price, tech_score, tech_signal, "
+                        "sentiment_score, overall_score, advice_action, indicators) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to write {len(rows)} history rows: {str(e)}")
+        conn.close()
+
+    def close(self, timeout: float = 10.0):
+        """
+        Write out everything queued so far and stop the writer.
+        """
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout)
+
+    # --- reads ------------------------------------------------------------
+
+    @staticmethod
+    def _point(row: sqlite3.Row) -> Dict[str, Any]:
+        point = dict(zip(_COLUMNS, row))
+        point["indicators"] = json.loads(point["indicators"]) if point["indicators"] else {}
+        return point
+
+    def history(self, ticker: str, start: Optional[str] = None, end: Optional[str] = None,
+                limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Analyses of `ticker` with start <= analysis_date <= end, oldest first.
+        Keyset pagination: pass the returned cursor to get the next page.
+        Returns (points, next_cursor); next_cursor is None on the last page.
+        """
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM analyses WHERE ticker = ?"
+        params: List[Any] = [ticker]
+        if start:
+            sql += " AND analysis_date >= ?"
+            params.append(start)
+        if end:
+            sql += " AND analysis_date <= ?"
+            params.append(_end_bound(end))
+        if cursor:
+            after_date, after_id = self._parse_cursor(cursor)
+            sql += " AND (analysis_date, id) > (?, ?)"
+            params.extend([after_date, after_id])
+        sql += " ORDER BY analysis_date, id LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._reader().execute(sql, params).fetchall()
+        points = [self._point(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = points[-1]
+            next_cursor = f"{last['analysis_date']}|{last['id']}"
+        return points, next_cursor
+
+    @staticmethod
+    def _parse_cursor(cursor: str) -> Tuple[str, int]:
+        try:
+            after_date, after_id = cursor.rsplit("|", 1)
+            return after_date, int(after_id)
+        except ValueError:
+            raise ValueError(f"Invalid cursor '{cursor}'")
+
+    def movers(self, start: str, end: Optional[str] = None, metric: str = "tech_score",
+               limit: int = 20, offset: int = 0, direction: str = "both") -> List[Dict[str, Any]]:
+        """
+        Tickers ranked by how much `metric` changed between their first and last
+        analysis in [start, end]. direction: "up", "down" or "both" (by size of the move).
+        """
+        if metric not in MOVER_METRICS:
+            raise ValueError(f"metric must be one of {', '.join(MOVER_METRICS)}")
+        bounds = "a.ticker = t.ticker AND a.analysis_date >= ? AND a.analysis_date <= ?"
+        end = _end_bound(end) if end else "9999"
+        # Two index seeks per ticker for the ids of its first and last analysis in the window
+        sql = f"""
+            SELECT t.ticker,
+                   f.analysis_date, f.{metric},
+                   l.analysis_date, l.{metric}, l.tech_signal, l.advice_action, l.current_price
+            FROM (SELECT t.ticker,
+                         (SELECT a.id FROM analyses a WHERE {bounds}
+                          ORDER BY a.analysis_date, a.id LIMIT 1) AS first_id,
+                         (SELECT a.id FROM analyses a WHERE {bounds}
+                          ORDER BY a.analysis_date DESC, a.id DESC LIMIT 1) AS last_id
+                  FROM tickers t) t
+            JOIN analyses f ON f.id = t.first_id
+            JOIN analyses l ON l.id = t.last_id
+            WHERE t.first_id != t.last_id
+        """
+        movers = []
+        for ticker, first_date, first_value, last_date, last_value, signal, action, price in \
+                self._reader().execute(sql, [start, end, start, end]):
+            if first_value is None or last_value is None:
+                continue
+            movers.append({"ticker": ticker, "metric": metric, "change": last_value - first_value,
+                           "first": first_value, "last": last_value, "first_date": first_date,
+                           "last_date": last_date, "tech_signal": signal, "advice_action": action,
+                           "current_price": price})
+
+        if direction == "up":
+            movers = sorted((m for m in movers if m["change"] > 0), key=lambda m: -m["change"])
+        elif direction == "down":
+            movers = sorted((m for m in movers if m["change"] < 0), key=lambda m: m["change"])
+        else:
+            movers.sort(key=lambda m: -abs(m["change"]))
+        return movers[offset:offset + limit]
+
+
+_store: Optional[HistoryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore(settings.history_path or os.path.join(settings.data_dir, "history.sqlite3"),
+                                  queue_size=settings.history_queue_size)
+            atexit.register(_store.close)
+    return _store
@@ -0,0 +1,427 @@
+"""
+Streaming indicator engine: O(1) state updates per new bar for the indicators
+TechnicalAnalyzer uses, so a refresh only folds in the bars since the last run
+instead of recomputing ~500 bars. Seeding follows TA-Lib (see indicators.py),
+so results match a full recomputation within floating-point tolerance.
+"""
+import copy
+import json
+import logging
+import math
+import os
+import tempfile
+from collections import deque
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from app.services.bars import Bars
+
+logger = logging.getLogger(__name__)
+
+NAN = float("nan")
+
+
+class RollingWindow:
+    """
+    Fixed-size window with running sum and sum of squares.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def push(self, value: float) -> None:
+        if len(self.values) == self.size:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.size
+
+    def mean(self) -> float:
+        return self.total / self.size if self.full else NAN
+
+    def std(self) -> float:
+        if not self.full:
+            return NAN
+        mean = self.total / self.size
+        return math.sqrt(max(self.total_sq / self.size - mean * mean, 0.0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"size": self.size, "values": list(self.values), "total": self.total, "total_sq": self.total_sq}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RollingWindow":
+        window = cls(data["size"])
+        window.values.extend(data["values"])
+        window.total = data["total"]
+        window.total_sq = data["total_sq"]
+        return window
+
+
+class SMAState:
+    def __init__(self, period: int):
+        self.window = RollingWindow(period)
+        self.value = NAN
+
+    def update(self, value: float) -> float:
+        self.window.push(value)
+        self.value = self.window.mean()
+        return self.value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"window": self.window.to_dict(), "value": self.value}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SMAState":
+        state = cls(data["window"]["size"])
+        state.window = RollingWindow.from_dict(data["window"])
+        state.value = data["value"]
+        return state
+
+
+class EMAState:
+    """
+    EMA seeded with the SMA of the last `period` values at the `seed_count`-th
+    value (defaults to `period`; the fast MACD line seeds where the slow one does).
+    """
+
+    def __init__(self, period: int, seed_count: Optional[int] = None):
+        self.period = period
+        self.seed_count = seed_count or period
+        self.k = 2.0 / (period + 1)
+        self.count = 0
+        self.window: Optional[RollingWindow] = RollingWindow(period)
+        self.value = NAN
+
+    def update(self, value: float) -> float:
+        self.count += 1
+        if self.window is not None:
+            self.window.push(value)
+            if self.count == self.seed_count:
+                self.value = self.window.mean()
+                self.window = None # Not needed once seeded
+            return self.value
+        self.value = self.value + self.k * (value - self.value)
+        return self.value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "period": self.period,
+            "seed_count": self.seed_count,
+            "count": self.count,
+            "window": self.window.to_dict() if self.window is not None else None,
+            "value": self.value,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EMAState":
+        state = cls(data["period"], data["seed_count"])
+        state.count = data["count"]
+        state.window = RollingWindow.from_dict(data["window"]) if data["window"] is not None else None
+        state.value = data["value"]
+        return state
+
+
+class MACDState:
+    def __init__(self, fastperiod: int = 12, slowperiod: int = 26, signalperiod: int = 9):
+        self.fast = EMAState(fastperiod, seed_count=slowperiod)
+        self.slow = EMAState(slowperiod)
+        self.signal = EMAState(signalperiod)
+        self.macd = NAN
+
+    def update(self, value: float) -> Dict[str, float]:
+        fast = self.fast.update(value)
+        slow = self.slow.update(value)
+        macd = fast - slow
+        signal = self.signal.update(macd) if not math.isnan(macd) else NAN
+        # TA-Lib only reports MACD once the signal line exists
+        self.macd = macd if not math.isnan(signal) else NAN
+        return self.latest()
+
+    def latest(self) -> Dict[str, float]:
+        signal = self.signal.value
+        return {"macd": self.macd, "signal": signal, "hist": self.macd - signal}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"fast": self.fast.to_dict(), "slow": self.slow.to_dict(),
+                "signal": self.signal.to_dict(), "macd": self.macd}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MACDState":
+        state = cls()
+        state.fast = EMAState.from_dict(data["fast"])
+        state.slow = EMAState.from_dict(data["slow"])
+        state.signal = EMAState.from_dict(data["signal"])
+        state.macd = data["macd"]
+        return state
+
+
+class RSIState:
+    """
+    Wilder RSI: simple average of the first `period` moves, then
+    avg = (avg * (period - 1) + move) / period.
+    """
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev_close = NAN
+        self.count = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.value = NAN
+
+    def update(self, close: float) -> float:
+        if math.isnan(self.prev_close):
+            self.prev_close = close
+            return self.value
+        diff = close - self.prev_close
+        self.prev_close = close
+        gain, loss = max(diff, 0.0), max(-diff, 0.0)
+        self.count += 1
+
+        if self.count < self.period:
+            self.avg_gain += gain
+            self.avg_loss += loss
+            return self.value
+        if self.count == self.period:
+            self.avg_gain = (self.avg_gain + gain) / self.period
+            self.avg_loss = (self.avg_loss + loss) / self.period
+        else:
+            self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+            self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+
+        total = self.avg_gain + self.avg_loss
+        # TA-Lib reports 0 when there was no movement at all
+        self.value = 100.0 * self.avg_gain / total if total != 0 else 0.0
+        return self.value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RSIState":
+        state = cls(data["period"])
+        state.__dict__.update(data)
+        return state
+
+
+class StochState:
+    """
+    Slow stochastic (KDJ): fast %K over `fastk_period` bars, K = SMA(fast %K),
+    D = SMA(K), J = 3K - 2D.
+    """
+
+    def __init__(self, fastk_period: int = 9, slowk_period: int = 3, slowd_period: int = 3):
+        self.highs = deque(maxlen=fastk_period)
+        self.lows = deque(maxlen=fastk_period)
+        self.slowk = SMAState(slowk_period)
+        self.slowd = SMAState(slowd_period)
+
+    def update(self, high: float, low: float, close: float) -> Dict[str, float]:
+        self.highs.append(high)
+        self.lows.append(low)
+        if len(self.highs) < self.highs.maxlen:
+            return self.latest()
+        # max/min over a fixed 9-bar window: constant work per bar
+        highest, lowest = max(self.highs), min(self.lows)
+        span = highest - lowest
+        fastk = 100.0 * (close - lowest) / span if span != 0 else 0.0
+        k = self.slowk.update(fastk)
+        if not math.isnan(k):
+            self.slowd.update(k)
+        return self.latest()
+
+    def latest(self) -> Dict[str, float]:
+        d = self.slowd.value
+        # TA-Lib only reports K once D exists
+        k = self.slowk.value if not math.isnan(d) else NAN
+        return {"k": k, "d": d, "j": 3 * k - 2 * d}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"period": self.highs.maxlen, "highs": list(self.highs), "lows": list(self.lows),
+                "slowk": self.slowk.to_dict(), "slowd": self.slowd.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StochState":
+        state = cls(data["period"])
+        state.highs.extend(data["highs"])
+        state.lows.extend(data["lows"])
+        state.slowk = SMAState.from_dict(data["slowk"])
+        state.slowd = SMAState.from_dict(data["slowd"])
+        return state
+
+
+class BollingerState:
+    def __init__(self, period: int = 20, nbdev: float = 2.0):
+        self.window = RollingWindow(period)
+        self.nbdev = nbdev
+
+    def update(self, close: float) -> Dict[str, float]:
+        self.window.push(close)
+        return self.latest()
+
+    def latest(self) -> Dict[str, float]:
+        middle, std = self.window.mean(), self.window.std()
+        return {"upper": middle + self.nbdev * std, "middle": middle, "lower": middle - self.nbdev * std}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"window": self.window.to_dict(), "nbdev": self.nbdev}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BollingerState":
+        state = cls(data["window"]["size"], data["nbdev"])
+        state.window = RollingWindow.from_dict(data["window"])
+        return state
+
+
+class IndicatorEngine:
+    """
+    All TechnicalAnalyzer indicators for one ticker, updated one bar at a time.
+    `last_date`/`last_close` identify the last bar folded in, so callers can
+    tell which bars are new and whether stored prices were re-adjusted.
+    """
+
+    def __init__(self):
+        self.macd = MACDState(12, 26, 9)
+        self.rsi = RSIState(14)
+        self.stoch = StochState(9, 3, 3)
+        self.bbands = BollingerState(20, 2.0)
+        self.ma5 = SMAState(5)
+        self.ma20 = SMAState(20)
+        self.last_date: Optional[str] = None
+        self.last_close = NAN
+
+    def update(self, date: str, high: float, low: float, close: float) -> None:
+        self.macd.update(close)
+        self.rsi.update(close)
+        self.stoch.update(high, low, close)
+        self.bbands.update(close)
+        self.ma5.update(close)
+        self.ma20.update(close)
+        self.last_date = date
+        self.last_close = close
+
+    def latest(self) -> Dict[str, float]:
+        """
+        Latest raw values (NaN while an indicator is still in its lookback period).
+        """
+        macd = self.macd.latest()
+        stoch = self.stoch.latest()
+        bbands = self.bbands.latest()
+        return {
+            "RSI": self.rsi.value,
+            "MACD": macd["macd"],
+            "MACD_Signal": macd["signal"],
+            "MACD_Hist": macd["hist"],
+            "KDJ_K": stoch["k"],
+            "KDJ_D": stoch["d"],
+            "KDJ_J": stoch["j"],
+            "MA5": self.ma5.value,
+            "MA20": self.ma20.value,
+            "BB_High": bbands["upper"],
+            "BB_Low": bbands["lower"],
+            "Close": self.last_close,
+        }
+
+    def copy(self) -> "IndicatorEngine":
+        return copy.deepcopy(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "macd": self.macd.to_dict(),
+            "rsi": self.rsi.to_dict(),
+            "stoch": self.stoch.to_dict(),
+            "bbands": self.bbands.to_dict(),
+            "ma5": self.ma5.to_dict(),
+            "ma20": self.ma20.to_dict(),
+            "last_date": self.last_date,
+            "last_close": self.last_close,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IndicatorEngine":
+        engine = cls()
+        engine.macd = MACDState.from_dict(data["macd"])
+        engine.rsi = RSIState.from_dict(data["rsi"])
+        engine.stoch = StochState.from_dict(data["stoch"])
+        engine.bbands = BollingerState.from_dict(data["bbands"])
+        engine.ma5 = SMAState.from_dict(data["ma5"])
+        engine.ma20 = SMAState.from_dict(data["ma20"])
+        engine.last_date = data["last_date"]
+        engine.last_close = data["last_close"]
+        return engine
+
+    def advance(self, bars: Union[Bars, pd.DataFrame]) -> int:
+        """
+        Fold in the bars (Date/High/Low/Close) after `last_date`.
+        Returns the number of bars applied.
+        """
+        dates = np.asarray(bars["Date"], dtype="datetime64[ns]")
+        start = 0
+        if self.last_date is not None:
+            start = int(dates.searchsorted(np.datetime64(self.last_date), side="right"))
+        days = np.datetime_as_string(dates[start:], unit="D")
+        highs, lows, closes = (np.asarray(bars[name], dtype=np.float64)[start:] for name in ("High", "Low", "Close"))
+        for i in range(len(days)):
+            self.update(str(days[i]), float(highs[i]), float(lows[i]), float(closes[i]))
+        return len(days)
+
+    def matches(self, bars: Union[Bars, pd.DataFrame]) -> bool:
+        """
+        Whether this state can be continued with `bars`: its last bar must be in
+        them with the same close (a changed qfq adjustment invalidates the state).
+        """
+        if self.last_date is None:
+            return False
+        last_date = np.datetime64(self.last_date)
+        dates = np.asarray(bars["Date"], dtype="datetime64[ns]")
+        i = int(dates.searchsorted(last_date))
+        return i < len(dates) and dates[i] == last_date and \
+            abs(np.asarray(bars["Close"], dtype=np.float64)[i] - self.last_close) <= 1e-6
+
+
+class IndicatorStateStore:
+    """
+    Persists one IndicatorEngine per ticker as JSON under <root>/<ticker>.json.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.root, f"{ticker}.json")
+
+    def load(self, ticker: str) -> Optional[IndicatorEngine]:
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                return IndicatorEngine.from_dict(json.load(f))
+        except Exception as e:
+            logger.warning(f"Discarding unreadable indicator state {path}: {str(e)}")
+            return None
+
+    def save(self, ticker: str, engine: IndicatorEngine) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(ticker)
+        # Unique temp name per write: concurrent analyses of one ticker save at once
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=f"{ticker}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                # NaN is written as the non-standard NaN literal, which json.load accepts
+                json.dump(engine.to_dict(), f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,216 @@
+"""
+Vectorized NumPy implementations of the TA-Lib indicators used by TechnicalAnalyzer.
+
+Every function works along the last axis, so it accepts a single series (bars,)
+or a panel (tickers, bars) and computes all tickers in one pass. Output follows
+TA-Lib conventions: same shape as the input, NaN during the lookback period, and
+the same seeding rules (EMAs start from an SMA, RSI uses Wilder smoothing).
+Rows may start with NaN padding (e.g. recently listed tickers in an aligned
+panel); each row is then seeded from its own first valid bars.
+
+Internally the arrays are handled time-major (bars first), so the recursive
+indicators walk the bars once and touch one contiguous slice of tickers per bar.
+"""
+import numpy as np
+
+
+def _time_major(real) -> np.ndarray:
+    return np.ascontiguousarray(np.moveaxis(np.asarray(real, dtype=np.float64), -1, 0))
+
+
+def _bars_last(out: np.ndarray) -> np.ndarray:
+    return np.moveaxis(out, 0, -1)
+
+
+def _cumsum(x: np.ndarray, dtype=np.float64) -> np.ndarray:
+    """
+    Cumulative sum over bars. np.cumsum along axis 0 of a wide panel is far
+    slower than adding one contiguous row of tickers at a time.
+    """
+    if x.ndim == 1:
+        return np.cumsum(x, dtype=dtype)
+    out = np.empty(x.shape, dtype=dtype)
+    if x.shape[0]:
+        out[0] = x[0]
+    for t in range(1, x.shape[0]):
+        np.add(out[t - 1], x[t], out=out[t])
+    return out
+
+
+def _rolling_sum(x: np.ndarray, period: int) -> np.ndarray:
+    """
+    Sum over the trailing `period` bars, NaN unless all of them are valid.
+    """
+    nan = np.isnan(x)
+    has_nan = nan.any()
+    out = _cumsum(np.where(nan, 0.0, x) if has_nan else x)
+    csum = out.copy()
+    out[period:] -= csum[:-period]
+    out[:period - 1] = np.nan
+    if has_nan:
+        bad = _cumsum(nan, dtype=np.int64)
+        bad[period:] -= bad[:-period].copy()
+        out[bad > 0] = np.nan
+    return out
+
+
+def _rolling_extreme(x: np.ndarray, period: int, func) -> np.ndarray:
+    out = np.full(x.shape, np.nan)
+    if x.shape[0] < period:
+        return out
+    window = out[period - 1:]
+    window[...] = x[period - 1:]
+    for lag in range(1, period):
+        # NaN propagates through np.maximum/np.minimum, as it should
+        func(window, x[period - 1 - lag:x.shape[0] - lag], out=window)
+    return out
+
+
+def _nth_valid_index(x: np.ndarray, n: int) -> np.ndarray:
+    """
+    Bar index of each row's n-th valid (non-NaN) value; len(x) if it has fewer.
+    """
+    nan = np.isnan(x)
+    if not nan.any():
+        return np.full(x.shape[1:], n - 1 if n <= x.shape[0] else x.shape[0])
+    count = _cumsum(~nan, dtype=np.int64)
+    reached = count >= n
+    return np.where(reached[-1], np.argmax(reached, axis=0), x.shape[0])
+
+
+def _ema(x: np.ndarray, period: int, seed_count: int = None) -> np.ndarray:
+    """
+    EMA seeded with the SMA of the `period` bars ending at the row's
+    `seed_count`-th valid bar (TA-Lib seeds at the period-th bar, except for
+    the fast MACD line, which starts where the slow one does).
+    """
+    k = 2.0 / (period + 1)
+    out = np.full(x.shape, np.nan)
+    seed_at = _nth_valid_index(x, seed_count or period)
+    if x.shape[0] == 0 or np.min(seed_at) >= x.shape[0]:
+        return out
+
+    sma = _rolling_sum(x, period) / period
+    if x.ndim == 1:
+        # Single series: plain floats are much cheaper than 0-d array ops per bar
+        start = int(seed_at)
+        ema = float(sma[start])
+        values = [ema]
+        for value in x[start + 1:].tolist():
+            ema = ema + k * (value - ema)
+            values.append(ema)
+        out[start:] = values
+        return out
+
+    ema = np.full(x.shape[1:], np.nan)
+    for t in range(int(np.min(seed_at)), x.shape[0]):
+        ema = ema + k * (x[t] - ema)
+        seeding = seed_at == t
+        if seeding.any():
+            ema = np.where(seeding, sma[t], ema)
+        out[t] = ema
+    return out
+
+
+def SMA(real, timeperiod: int = 30) -> np.ndarray:
+    return _bars_last(_rolling_sum(_time_major(real), timeperiod) / timeperiod)
+
+
+def EMA(real, timeperiod: int = 30) -> np.ndarray:
+    return _bars_last(_ema(_time_major(real), timeperiod))
+
+
+def MACD(real, fastperiod: int = 12, slowperiod: int = 26, signalperiod: int = 9):
+    x = _time_major(real)
+    if slowperiod < fastperiod:
+        fastperiod, slowperiod = slowperiod, fastperiod
+    fast = _ema(x, fastperiod, seed_count=slowperiod)
+    slow = _ema(x, slowperiod)
+    macd = fast - slow
+    signal = _ema(macd, signalperiod)
+    # TA-Lib only reports MACD once the signal line exists
+    macd[np.isnan(signal)] = np.nan
+    return _bars_last(macd), _bars_last(signal), _bars_last(macd - signal)
+
+
+def RSI(real, timeperiod: int = 14) -> np.ndarray:
+    x = _time_major(real)
+    out = np.full(x.shape, np.nan)
+    if x.shape[0] <= timeperiod:
+        return _bars_last(out)
+
+    diff = np.diff(x, axis=0)
+    # NaN moves (padding) stay NaN in both series
+    gain = np.where(diff < 0, 0.0, diff)
+    loss = np.where(diff > 0, 0.0, -diff)
+
+    # Wilder smoothing: seeded by the simple average of the first `timeperiod`
+    # moves, then avg = (avg * (n - 1) + move) / n
+    seed_at = _nth_valid_index(diff, timeperiod)
+    if np.min(seed_at) < diff.shape[0]:
+        seed_gain = _rolling_sum(gain, timeperiod) / timeperiod
+        seed_loss = _rolling_sum(loss, timeperiod) / timeperiod
+        avg_gain = np.full(diff.shape, np.nan)
+        avg_loss = np.full(diff.shape, np.nan)
+        start = int(np.min(seed_at))
+        if diff.ndim == 1:
+            g, l = float(seed_gain[start]), float(seed_loss[start])
+            gains, losses = [g], [l]
+            for up, down in zip(gain[start + 1:].tolist(), loss[start + 1:].tolist()):
+                g = (g * (timeperiod - 1) + up) / timeperiod
+                l = (l * (timeperiod - 1) + down) / timeperiod
+                gains.append(g)
+                losses.append(l)
+            avg_gain[start:] = gains
+            avg_loss[start:] = losses
+        else:
+            g = np.full(diff.shape[1:], np.nan)
+            l = np.full(diff.shape[1:], np.nan)
+            for t in range(start, diff.shape[0]):
+                g = (g * (timeperiod - 1) + gain[t]) / timeperiod
+                l = (l * (timeperiod - 1) + loss[t]) / timeperiod
+                seeding = seed_at == t
+                if seeding.any():
+                    g = np.where(seeding, seed_gain[t], g)
+                    l = np.where(seeding, seed_loss[t], l)
+                avg_gain[t] = g
+                avg_loss[t] = l
+
+        total = avg_gain + avg_loss
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # TA-Lib reports 0 when there was no movement at all
+            out[1:] = np.where(total == 0, 0.0, 100.0 * avg_gain / total)
+    return _bars_last(out)
+
+
+def STOCH(high, low, close, fastk_period: int = 5, slowk_period: int = 3, slowk_matype: int = 0,
+          slowd_period: int = 3, slowd_matype: int = 0):
+    if slowk_matype != 0 or slowd_matype != 0:
+        raise ValueError(f"Unsupported matype {slowk_matype}/{slowd_matype}: only SMA smoothing (0) is supported")
+    high, low, close = _time_major(high), _time_major(low), _time_major(close)
+
+    highest = _rolling_extreme(high, fastk_period, np.maximum)
+    lowest = _rolling_extreme(low, fastk_period, np.minimum)
+    span = highest - lowest
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fastk = np.where(span == 0, 0.0, 100.0 * (close - lowest) / span)
+
+    slowk = _rolling_sum(fastk, slowk_period) / slowk_period
+    slowd = _rolling_sum(slowk, slowd_period) / slowd_period
+    slowk[np.isnan(slowd)] = np.nan
+    return _bars_last(slowk), _bars_last(slowd)
+
+
+def BBANDS(real, timeperiod: int = 5, nbdevup: float = 2, nbdevdn: float = 2, matype: int = 0):
+    if matype != 0:
+        raise ValueError(f"Unsupported matype {matype}: only an SMA middle band (0) is supported")
+    x = _time_major(real)
+    # Center each row before the running sums so x^2 stays small and the
+    # variance doesn't lose precision to cancellation.
+    ref = np.nan_to_num(x[-1]) if x.shape[0] else 0.0
+    centered = x - ref
+    mean = _rolling_sum(centered, timeperiod) / timeperiod
+    var = _rolling_sum(centered * centered, timeperiod) / timeperiod - mean * mean
+    std = np.sqrt(np.maximum(var, 0.0))
+    middle = mean + ref
+    return _bars_last(middle + nbdevup * std), _bars_last(middle), _bars_last(middle - nbdevdn * std)
@@ -0,0 +1,289 @@
+"""
+Offline news corpus ingestion and a per-ticker inverted index for sentiment.
+
+    cd backend && python -m app.services.news_index dump.jsonl [more.csv ...] [--out data/news]
+
+Reads JSONL or CSV news dumps in one streaming pass, tags every article with the
+6-digit A-share codes it mentions, scores its polarity once with TextBlob and
+writes a compact index directory. TextBlob's lexicon is English only, so
+articles containing Chinese text are stored unscored (NaN) rather than as a
+misleading neutral 0.0; sentiment leaves them out of the mean.
+
+    meta.json       article count, sources, build time
+    titles.bin      UTF-8 headlines back to back; title_ptr.npy holds the byte offsets
+    dates.npy       publication day of each article (datetime64[D])
+    polarity.npy    TextBlob polarity of each article (float32, NaN if unscored)
+    codes.npy       distinct tagged codes (int32, sorted)
+    code_ptr.npy    postings of codes[i] are postings[code_ptr[i]:code_ptr[i + 1]]
+    postings.npy    article ids, grouped by code and sorted by date within a code
+    post_dates.npy  dates of the postings, so a date window is two searchsorted calls
+
+Arrays are memory-mapped on open, so a query reads only the slices it needs.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import time
+from array import array
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.startup import LazyModule
+
+logger = logging.getLogger(__name__)
+
+# Only building an index scores text; serving it does not need TextBlob
+textblob = LazyModule("textblob")
+
+# Main board (00/60), ChiNext (30) and STAR (68) codes, not part of a longer number
+CODE_PATTERN = re.compile(r"(?<![\d.])((?:00|30|60|68)\d{4})(?![\d.])")
+# CJK ideographs (Unified and Extension A)
+CJK_PATTERN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff]")
+
+# Field names tried in order; the Chinese ones match AkShare's stock_news_em columns
+TITLE_FIELDS = ("title", "headline", "新闻标题")
+BODY_FIELDS = ("content", "summary", "body", "text", "新闻内容")
+DATE_FIELDS = ("date", "published_at", "publish_time", "datetime", "time", "发布时间")
+CODES_FIELDS = ("codes", "tickers", "symbols", "关键词")
+
+
+def default_index_dir() -> str:
+    return os.path.join(settings.data_dir, "news")
+
+
+def _first(record: Dict, names: Iterable[str]) -> str:
+    for name in names:
+        value = record.get(name)
+        if isinstance(value, list):
+            value = " ".join(map(str, value))
+        if value not in (None, ""):
+            return str(value)
+    return ""
+
+
+def _parse_day(value: str) -> Optional[np.datetime64]:
+    value = value.strip()
+    if value.isdigit() and len(value) >= 10:
+        # Unix timestamp, seconds or milliseconds
+        seconds = int(value) / (1000 if len(value) > 10 else 1)
+        return np.datetime64(datetime.fromtimestamp(seconds).date(), "D")
+    for fmt, width in (("%Y-%m-%d", 10), ("%Y/%m/%d", 10), ("%Y%m%d", 8)):
+        try:
+            return np.datetime64(datetime.strptime(value[:width], fmt).date(), "D")
+        except ValueError:
+            continue
+    return None
+
+
+def tag_codes(*texts: str) -> List[int]:
+    """
+    Distinct A-share codes mentioned in the texts, as ints ("000001" -> 1).
+    """
+    return sorted({int(code) for text in texts if text for code in CODE_PATTERN.findall(text)})
+
+
+def score_polarity(text: str) -> float:
+    """
+    TextBlob polarity in [-1, 1], or NaN for text TextBlob cannot score (Chinese).
+    """
+    if CJK_PATTERN.search(text):
+        return float("nan")
+    return textblob.TextBlob(text).sentiment.polarity
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    """
+    Stream records from a .jsonl/.ndjson or .csv file without loading it whole.
+    """
+    lower = path.lower()
+    with open(path, encoding="utf-8", newline="") as f:
+        if lower.endswith(".csv"):
+            yield from csv.DictReader(f)
+            return
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"{path}:{line_no}: skipping malformed JSON line")
+
+
+def build_index(paths: List[str], out_dir: str) -> Dict:
+    """
+    Ingest news dumps into an index directory at `out_dir`, replacing any
+    previous index once the new one is complete.
+    """
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    title_ptr = array("q", [0])
+    days = array("q")
+    polarity = array("f")
+    post_codes = array("i")
+    post_ids = array("i")
+    seen = skipped = 0
+    started = time.perf_counter()
+
+    with open(os.path.join(tmp_dir, "titles.bin"), "wb") as titles:
+        for path in paths:
+            for record in read_records(path):
+                seen += 1
+                title = _first(record, TITLE_FIELDS).strip()
+                body = _first(record, BODY_FIELDS)
+                day = _parse_day(_first(record, DATE_FIELDS))
+                codes = tag_codes(title, body, _first(record, CODES_FIELDS))
+                if not title or day is None or not codes:
+                    skipped += 1
+                    continue
+
+                article_id = len(days)
+                encoded = title.encode("utf-8")
+                titles.write(encoded)
+                title_ptr.append(title_ptr[-1] + len(encoded))
+                days.append(int(day.astype(np.int64)))
+                polarity.append(score_polarity(f"{title}. {body}" if body else title))
+                post_codes.extend(codes)
+                post_ids.extend([article_id] * len(codes))
+
+    day_arr = np.frombuffer(days, dtype=np.int64).astype("datetime64[D]") if days else np.array([], dtype="datetime64[D]")
+    codes_arr = np.frombuffer(post_codes, dtype=np.int32) if post_codes else np.array([], dtype=np.int32)
+    ids_arr = np.frombuffer(post_ids, dtype=np.int32) if post_ids else np.array([], dtype=np.int32)
+    polarity_arr = np.frombuffer(polarity, dtype=np.float32) if polarity else np.array([], dtype=np.float32)
+
+    # Group postings by code, by date within a code
+    order = np.lexsort((day_arr[ids_arr], codes_arr))
+    codes_sorted = codes_arr[order]
+    postings = ids_arr[order]
+    unique_codes = np.unique(codes_sorted)
+    code_ptr = np.searchsorted(codes_sorted, np.append(unique_codes, np.iinfo(np.int32).max)).astype(np.int64)
+
+    np.save(os.path.join(tmp_dir, "title_ptr.npy"), np.frombuffer(title_ptr, dtype=np.int64))
+    np.save(os.path.join(tmp_dir, "dates.npy"), day_arr)
+    np.save(os.path.join(tmp_dir, "polarity.npy"), polarity_arr)
+    np.save(os.path.join(tmp_dir, "codes.npy"), unique_codes.astype(np.int32))
+    np.save(os.path.join(tmp_dir, "code_ptr.npy"), code_ptr)
+    np.save(os.path.join(tmp_dir, "postings.npy"), postings.astype(np.int32))
+    np.save(os.path.join(tmp_dir, "post_dates.npy"), day_arr[postings])
+
+    meta = {
+        "articles": len(days),
+        "unscored": int(np.isnan(polarity_arr).sum()),
+        "records_seen": seen,
+        "records_skipped": skipped,
+        "codes": int(unique_codes.size),
+        "postings": int(postings.size),
+        "sources": [os.path.abspath(p) for p in paths],
+        "built_at": datetime.now().isoformat(),
+        "build_seconds": round(time.perf_counter() - started, 3),
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    # Swap the finished index in
+    old_dir = f"{out_dir}.old-{os.getpid()}"
+    if os.path.exists(out_dir):
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return meta
+
+
+class NewsIndex:
+    """
+    Read side of an index built by build_index. Arrays are memory-mapped.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+        def load(name):
+            return np.load(os.path.join(root, f"{name}.npy"), mmap_mode="r")
+
+        self.title_ptr = load("title_ptr")
+        self.dates = load("dates")
+        self.polarity = load("polarity")
+        self.codes = load("codes")
+        self.code_ptr = load("code_ptr")
+        self.postings = load("postings")
+        self.post_dates = load("post_dates")
+        titles_path = os.path.join(root, "titles.bin")
+        self.titles = np.memmap(titles_path, dtype=np.uint8, mode="r") if os.path.getsize(titles_path) else b""
+
+    def title(self, article_id: int) -> str:
+        start, end = int(self.title_ptr[article_id]), int(self.title_ptr[article_id + 1])
+        return bytes(self.titles[start:end]).decode("utf-8")
+
+    def query(self, ticker: str, start: Optional[date] = None, end: Optional[date] = None) -> np.ndarray:
+        """
+        Ids of the articles tagged with `ticker` published in [start, end], oldest first.
+        """
+        if not (ticker.isdigit() and len(ticker) == 6) or self.codes.size == 0:
+            return np.array([], dtype=np.int32)
+        code = int(ticker)
+        i = int(np.searchsorted(self.codes, code))
+        if i >= self.codes.size or self.codes[i] != code:
+            return np.array([], dtype=np.int32)
+        first, last = int(self.code_ptr[i]), int(self.code_ptr[i + 1])
+        dates = self.post_dates[first:last]
+        lo = first + (int(np.searchsorted(dates, np.datetime64(start, "D"), side="left")) if start else 0)
+        hi = first + (int(np.searchsorted(dates, np.datetime64(end, "D"), side="right")) if end else dates.size)
+        return np.asarray(self.postings[lo:max(lo, hi)])
+
+    def articles(self, ticker: str, start: Optional[date] = None, end: Optional[date] = None) -> List[Tuple[str, str, float]]:
+        """
+        (date, title, polarity) of the matching articles, newest first.
+        """
+        ids = self.query(ticker, start, end)[::-1]
+        return [(str(self.dates[i]), self.title(i), float(self.polarity[i])) for i in ids]
+
+
+_index: Optional[NewsIndex] = None
+_index_stamp: Optional[float] = None
+
+
+def get_news_index(root: Optional[str] = None) -> Optional[NewsIndex]:
+    """
+    The index under data_dir/news, or None if none has been built. Reopened when
+    a rebuild replaces it (checked through meta.json's mtime).
+    """
+    global _index, _index_stamp
+    root = root or default_index_dir()
+    try:
+        stamp = os.stat(os.path.join(root, "meta.json")).st_mtime
+    except OSError:
+        _index = _index_stamp = None
+        return None
+    if _index is None or stamp != _index_stamp or _index.root != root:
+        try:
+            _index, _index_stamp = NewsIndex(root), stamp
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not open news index {root}: {str(e)}")
+            return None
+    return _index
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="JSONL/NDJSON or CSV news dumps")
+    parser.add_argument("--out", default=None, help="Index directory (default: <data_dir>/news)")
+    args = parser.parse_args(argv)
+
+    meta = build_index(args.paths, args.out or default_index_dir())
+    print(json.dumps(meta, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+PDF rendering off the event loop.
+
+WeasyPrint is CPU bound (hundreds of ms per document) and holds the GIL, so
+reports are rendered in a small process pool. Finished PDFs are stored under
+data_dir/reports/<sha256 of the analysis JSON and language>.pdf, which makes
+identical re-downloads a file read and gives every report a stable job id.
+
+Batches (render_batch) are either a zip of per-ticker PDFs, rendered in chunks
+across the pool and sharing the per-report cache, or one combined PDF rendered
+by a single worker (its pages have to be laid out in one WeasyPrint document).
+Each worker process compiles the template and parses the CSS and fonts once.
+"""
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+from app.core.concurrency import run_blocking
+from app.core.config import settings
+from app.models.schemas import AnalysisResponse
+
+logger = logging.getLogger(__name__)
+
+
+# Job ids are sha256 hex digests (job_id / batch_id); anything else never names a file
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class RenderQueueFullError(Exception):
+    pass
+
+
+# Per worker process, created on first use
+_worker_generator = None
+
+
+def _generator():
+    global _worker_generator
+    if _worker_generator is None:
+        from app.services.report_generator import ReportGenerator
+        _worker_generator = ReportGenerator()
+    return _worker_generator
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _render_in_worker(analysis_json: str, language: str, path: str) -> bytes:
+    pdf = _generator().generate_pdf(AnalysisResponse.model_validate_json(analysis_json), language)
+    _write_atomic(path, pdf)
+    return pdf
+
+
+def _render_chunk_in_worker(items: List[Tuple[str, str]], language: str):
+    # (analysis JSON, output path) pairs; several per task to amortize the IPC round trip
+    for analysis_json, path in items:
+        _write_atomic(path, _generator().generate_pdf(AnalysisResponse.model_validate_json(analysis_json), language))
+
+
+def _render_combined_in_worker(analysis_jsons: List[str], language: str, path: str):
+    analyses = [AnalysisResponse.model_validate_json(analysis_json) for analysis_json in analysis_jsons]
+    _write_atomic(path, _generator().generate_combined_pdf(analyses, language))
+
+
+class PDFRenderer:
+    """
+    Renders reports on a process pool with at most `max_queue` renders waiting
+    or running; past that, render/submit raise RenderQueueFullError.
+    Concurrent requests for the same report share one render.
+
+    Job state other than "done" lives in this process only; with several
+    server workers a job is visible to the worker that accepted it, and
+    to every worker once its PDF is on disk.
+    """
+
+    def __init__(self, cache_dir: str, max_workers: int = 2, max_queue: int = 32, max_files: int = 1000):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_files = max_files
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._failed: "OrderedDict[str, str]" = OrderedDict()
+        # Cached PDFs an in-flight zip still has to read (path -> batches using it); never pruned
+        self._pinned: Dict[str, int] = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a server process that already runs threads is unsafe
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    @staticmethod
+    def job_id(analysis: AnalysisResponse, language: str) -> str:
+        return hashlib.sha256(f"{language}\0{analysis.model_dump_json()}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def batch_id(analyses: List[AnalysisResponse], language: str, fmt: str) -> str:
+        digest = hashlib.sha256(f"{fmt}\0{language}".encode("utf-8"))
+        for analysis in analyses:
+            digest.update(PDFRenderer.job_id(analysis, language).encode("ascii"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def is_job_id(job_id: str) -> bool:
+        return JOB_ID_PATTERN.match(job_id) is not None
+
+    def path(self, job_id: str, fmt: str = "pdf") -> str:
+        return os.path.join(self.cache_dir, f"{job_id}.{fmt}")
+
+    def artifact(self, job_id: str) -> Optional[Tuple[str, str]]:
+        """
+        (path, format) of a finished job's output, if there is one.
+        """
+        for fmt in ("pdf", "zip"):
+            path = self.path(job_id, fmt)
+            if os.path.exists(path):
+                return path, fmt
+        return None
+
+    def cached(self, job_id: str) -> Optional[bytes]:
+        try:
+            with open(self.path(job_id), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _check_room(self):
+        if len(self._inflight) >= self.max_queue:
+            raise RenderQueueFullError(f"{len(self._inflight)} reports already rendering")
+
+    def _start(self, analysis: AnalysisResponse, language: str, job_id: str) -> asyncio.Future:
+        future = self._inflight.get(job_id)
+        if future is not None:
+            return future
+        self._check_room()
+        loop = asyncio.get_running_loop()
+        return self._track(job_id, loop.run_in_executor(
+            self._pool(), _render_in_worker, analysis.model_dump_json(), language, self.path(job_id)))
+
+    def _track(self, job_id: str, future: asyncio.Future) -> asyncio.Future:
+        self._inflight[job_id] = future
+        self._failed.pop(job_id, None)
+
+        def finished(done: asyncio.Future):
+            self._inflight.pop(job_id, None)
+            if done.cancelled():
+                return
+            error = done.exception()
+            if error is not None:
+                logger.error(f"PDF render {job_id[:12]} failed: {str(error)}")
+                if isinstance(error, BrokenProcessPool):
+                    # A worker died (e.g. OOM); start a fresh pool for the next render
+                    self._executor = None
+                self._failed[job_id] = str(error) or type(error).__name__
+                while len(self._failed) > 1000:
+                    self._failed.popitem(last=False)
+            else:
+                self._prune()
+
+        future.add_done_callback(finished)
+        return future
+
+    async def render(self, analysis: AnalysisResponse, language: str = "en") -> bytes:
+        job_id = self.job_id(analysis, language)
+        pdf = self.cached(job_id)
+        if pdf is not None:
+            return pdf
+        return await asyncio.shield(self._start(analysis, language, job_id))
+
+    def submit(self, analysis: AnalysisResponse, language: str = "en") -> str:
+        """
+        Queue a render without waiting for it; returns the job id.
+        """
+        job_id = self.job_id(analysis, language)
+        if not os.path.exists(self.path(job_id)):
+            self._start(analysis, language, job_id)
+        return job_id
+
+    async def _build_batch(self, analyses: List[AnalysisResponse], language: str, fmt: str, job_id: str):
+        loop = asyncio.get_running_loop()
+        out_path = self.path(job_id, fmt)
+        if fmt == "pdf":
+            await loop.run_in_executor(self._pool(), _render_combined_in_worker,
+                                       [analysis.model_dump_json() for analysis in analyses], language, out_path)
+            return
+
+        # Zip: render the reports not cached yet, in chunks spread over the pool
+        entries, missing = [], {}
+        names = set()
+        for analysis in analyses:
+            path = self.path(self.job_id(analysis, language))
+            name = f"report_{analysis.ticker}.pdf"
+            suffix = 2
+            while name in names:
+                name = f"report_{analysis.ticker}_{suffix}.pdf"
+                suffix += 1
+            names.add(name)
+            entries.append((name, path))
+            if path not in missing and not os.path.exists(path):
+                missing[path] = analysis.model_dump_json()
+        items = [(analysis_json, path) for path, analysis_json in missing.items()]
+        chunk = max(1, settings.report_batch_chunk)
+        paths = {path for _, path in entries}
+        self._pin(paths)
+        try:
+            await asyncio.gather(*(
+                loop.run_in_executor(self._pool(), _render_chunk_in_worker, items[i:i + chunk], language)
+                for i in range(0, len(items), chunk)))
+            await run_blocking(self._write_zip, entries, out_path)
+        finally:
+            self._unpin(paths)
+
+    def _pin(self, paths):
+        for path in paths:
+            self._pinned[path] = self._pinned.get(path, 0) + 1
+
+    def _unpin(self, paths):
+        for path in paths:
+            count = self._pinned.pop(path, 0) - 1
+            if count > 0:
+                self._pinned[path] = count
+
+    @staticmethod
+    def _write_zip(entries: List[Tuple[str, str]], out_path: str):
+        tmp_path = f"{out_path}.{os.getpid()}.tmp"
+        # PDFs are already compressed
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED) as archive:
+            for name, path in entries:
+                archive.write(path, name)
+        os.replace(tmp_path, out_path)
+
+    def _start_batch(self, analyses: List[AnalysisResponse], language: str, fmt: str, job_id: str) -> asyncio.Future:
+        future = self._inflight.get(job_id)
+        if future is not None:
+            return future
+        self._check_room()
+        return self._track(job_id, asyncio.ensure_future(self._build_batch(analyses, language, fmt, job_id)))
+
+    async def render_batch(self, analyses: List[AnalysisResponse], language: str = "en", fmt: str = "zip") -> str:
+        """
+        Render many reports into a zip of PDFs (fmt="zip") or one combined PDF
+        (fmt="pdf"); returns the path of the result.
+        """
+        job_id = self.batch_id(analyses, language, fmt)
+        path = self.path(job_id, fmt)
+        if not os.path.exists(path):
+            await asyncio.shield(self._start_batch(analyses, language, fmt, job_id))
+        return path
+
+    def submit_batch(self, analyses: List[AnalysisResponse], language: str = "en", fmt: str = "zip") -> str:
+        job_id = self.batch_id(analyses, language, fmt)
+        if not os.path.exists(self.path(job_id, fmt)):
+            self._start_batch(analyses, language, fmt, job_id)
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, str]]:
+        if job_id in self._inflight:
+            return {"job_id": job_id, "status": "pending"}
+        artifact = self.artifact(job_id)
+        if artifact is not None:
+            return {"job_id": job_id, "status": "done", "format": artifact[1]}
+        if job_id in self._failed:
+            return {"job_id": job_id, "status": "failed", "error": self._failed[job_id]}
+        return None
+
+    def _prune(self):
+        """
+        Keep at most max_files cached reports, dropping the least recently written.
+        PDFs pinned by a running zip batch are kept even past the limit.
+        """
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith((".pdf", ".zip"))]
+        except OSError:
+            return
+        excess = len(entries) - self.max_files
+        if excess <= 0:
+            return
+        entries = sorted((e for e in entries if e.path not in self._pinned), key=lambda e: e.stat().st_mtime)
+        for entry in entries[:excess]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_renderer: Optional[PDFRenderer] = None
+
+
+def get_pdf_renderer() -> PDFRenderer:
+    global _renderer
+    if _renderer is None:
+        _renderer = PDFRenderer(os.path.join(settings.data_dir, "reports"), max_workers=settings.report_workers,
+                                max_queue=settings.report_queue_size, max_files=settings.report_cache_files)
+    return _renderer
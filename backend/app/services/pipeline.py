@@ -0,0 +1,254 @@
+import asyncio
+from datetime import datetime
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Tuple, TypeVar, Union
+from app.core.concurrency import run_blocking
+from app.core.config import settings
+from app.core.metrics import record, span
+from app.models.schemas import AnalysisResponse
+from app.services.data_fetcher import StockDataFetcher
+from app.services.analyzer import TechnicalAnalyzer
+from app.services.sentiment import SentimentAnalyzer
+from app.services.advisor import InvestmentAdvisor
+from app.services.result_cache import AsyncResultCache
+from app.services.history_store import HistoryStore
+from app.services.bars import Bars
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DataNotFoundError(Exception):
+    pass
+
+
+class StageTimeoutError(Exception):
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"Stage '{stage}' timed out after {timeout:.1f}s")
+        self.stage = stage
+        self.timeout = timeout
+
+
+def bar_version(bars: Bars) -> Tuple[str, float]:
+    """
+    The last bar (date and close) identifies the data an analysis is based on:
+    a new bar, or an intraday update of today's bar, invalidates the result.
+    """
+    return str(bars['Date'][-1]), float(bars['Close'][-1])
+
+
+class AnalysisPipeline:
+    """
+    Runs fetch -> technical -> advice for one ticker without blocking the event loop.
+    Blocking stages run on the shared thread pool; sentiment does not depend on the
+    price history so it runs concurrently with the fetch and technical stages.
+
+    With a `cache`, identical concurrent requests share one run, and a finished
+    response is reused until its ticker gets a new (or revised) bar.
+    With a `history` store every freshly computed response is recorded.
+    """
+
+    def __init__(self, fetcher: StockDataFetcher, tech_analyzer: TechnicalAnalyzer,
+                 sentiment_analyzer: SentimentAnalyzer, advisor: InvestmentAdvisor,
+                 cache: Optional[AsyncResultCache] = None, history: Optional[HistoryStore] = None):
+        self.fetcher = fetcher
+        self.tech_analyzer = tech_analyzer
+        self.sentiment_analyzer = sentiment_analyzer
+        self.advisor = advisor
+        self.cache = cache
+        self.history = history
+
+    async def _stage(self, name: str, awaitable: Awaitable[T], timeout: float) -> T:
+        # On timeout the awaiting request gives up; a stage already running in a
+        # worker thread finishes in the background and its result is dropped.
+        start = time.perf_counter()
+        try:
+            if not timeout:
+                return await awaitable
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise StageTimeoutError(name, timeout)
+        finally:
+            record(name, time.perf_counter() - start)
+
+    async def fetch(self, stock_code: str) -> Bars:
+        """
+        The ticker's bars, through the fetch stage (timeout and timing).
+        """
+        return await self._stage("fetch", self.fetcher.fetch_bars_async(stock_code), settings.fetch_timeout)
+
+    async def run(self, stock_code: str, holding_cost: Optional[float] = None,
+                  current_price: Optional[float] = None,
+                  sentiment: Optional[Dict[str, Any]] = None, bars: Optional[Bars] = None) -> AnalysisResponse:
+        """
+        `current_price` lets batch callers pass a quote taken from a market-wide
+        spot snapshot; otherwise the last close of the history is used. Likewise
+        `sentiment` can be a result already computed by analyze_batch, and `bars`
+        a history the caller has just fetched.
+        """
+        if self.cache is None:
+            return await self._run(stock_code, holding_cost, current_price, sentiment, bars)
+        return await self.cache.coalesce(
+            (stock_code, holding_cost, current_price),
+            lambda: self._run(stock_code, holding_cost, current_price, sentiment, bars))
+
+    async def _run(self, stock_code: str, holding_cost: Optional[float], current_price: Optional[float],
+                   sentiment: Optional[Dict[str, Any]], bars: Optional[Bars] = None) -> AnalysisResponse:
+        cache_key = (stock_code, holding_cost, current_price)
+
+        def start_sentiment():
+            return asyncio.ensure_future(self._stage(
+                "sentiment", run_blocking(self.sentiment_analyzer.analyze, stock_code), settings.sentiment_timeout))
+
+        # With a cached result around, the fetch will most likely only confirm the
+        # last bar is unchanged; hold sentiment back so a hit doesn't pay for it.
+        likely_hit = self.cache is not None and self.cache.has(cache_key)
+        sentiment_task = None if likely_hit or sentiment is not None else start_sentiment()
+        try:
+            # 1. Fetch Data
+            # Array-backed bars, shared as is by the price and technical stages
+            if bars is None:
+                bars = await self.fetch(stock_code)
+            if bars.empty:
+                raise DataNotFoundError(f"No data found for {stock_code}")
+
+            version = bar_version(bars)
+            # Stale bars (AkShare unavailable) are neither served from nor put in the cache,
+            # so the response carries the flag and the next fresh fetch recomputes.
+            stale = bool(bars.attrs.get("stale"))
+            if self.cache is not None and not stale:
+                cached = self.cache.get(cache_key, version)
+                if cached is not None:
+                    return cached
+            if sentiment_task is None and sentiment is None:
+                sentiment_task = start_sentiment()
+
+            if current_price is None:
+                with span("price"):
+                    current_price = self.fetcher.get_current_price(stock_code, history=bars)
+
+            # 2. Technical Analysis
+            tech_result = await self._stage(
+                "technical", run_blocking(self.tech_analyzer.analyze_incremental, stock_code, bars), settings.technical_timeout)
+
+            # 3. Sentiment Analysis
+            sentiment_result = sentiment if sentiment is not None else await sentiment_task
+        finally:
+            if sentiment_task is not None and not sentiment_task.done():
+                sentiment_task.cancel()
+
+        # 4. Generate Advice
+        with span("advice"):
+            advice = self.advisor.generate_advice(
+                current_price=current_price,
+                tech_score=tech_result.score,
+                sentiment_score=sentiment_result['score'],
+                holding_cost=holding_cost
+            )
+
+        # 5. Construct Response
+        overall_score = (tech_result.score * 0.4) + (sentiment_result['score'] * 0.3) + (20) # +20 base/mock for advice component? 
+        # Actually let's just use weighted average logic
+        # 40% Tech, 30% Sentiment, 20% Advice (Action Strength?), 10% Summary
+        # We'll simplify to just returning the components and let frontend display or normalized score
+
+        response = AnalysisResponse(
+            ticker=stock_code,
+            current_price=current_price,
+            analysis_date=datetime.now().isoformat(),
+
+            tech_score=tech_result.score,
+            tech_signal=tech_result.signal,
+            indicators=tech_result.indicators,
+
+            sentiment_score=sentiment_result['score'],
+            sentiment_summary=sentiment_result['summary'],
+            news_headlines=sentiment_result['headlines'],
+
+            advice_action=advice.action,
+            advice_rationale=advice.rationale,
+            entry_point=advice.entry_point,
+            exit_point=advice.exit_point,
+
+            overall_score=overall_score, # Placeholder calculation
+            summary_text=f"Analysis complete for {stock_code}. {advice.action} recommendation.",
+            stale=stale
+        )
+        if self.cache is not None and not stale:
+            self.cache.put(cache_key, response, version)
+        if self.history is not None:
+            self.history.append(response)
+        return response
+
+    async def run_many(self, stock_codes: List[str], holding_costs: Optional[Dict[str, float]] = None,
+                       concurrency: int = 8) -> AsyncIterator[Tuple[str, Union[AnalysisResponse, Exception]]]:
+        """
+        Analyze many tickers with at most `concurrency` pipelines in flight.
+        Current prices come from a single spot snapshot. Yields (ticker, result)
+        in completion order; a failed ticker yields its exception instead.
+        """
+        holding_costs = holding_costs or {}
+        try:
+            spot = await self._stage("spot", self.fetcher.get_spot_snapshot_async(), settings.fetch_timeout)
+        except Exception as e:
+            # Not fatal: each ticker falls back to its last close.
+            logger.warning(f"Spot snapshot failed, using history closes: {str(e)}")
+            spot = {}
+
+        # One pass over the distinct headlines of the whole batch
+        try:
+            sentiments = await self._stage(
+                "sentiment", run_blocking(self.sentiment_analyzer.analyze_batch, stock_codes), settings.sentiment_timeout)
+        except Exception as e:
+            logger.warning(f"Batch sentiment failed, scoring per ticker: {str(e)}")
+            sentiments = {}
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def analyze_one(code: str):
+            async with semaphore:
+                try:
+                    return code, await self.run(code, holding_costs.get(code), current_price=spot.get(code),
+                                                 sentiment=sentiments.get(code))
+                except Exception as e:
+                    return code, e
+
+        tasks = [asyncio.ensure_future(analyze_one(code)) for code in stock_codes]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Client went away or the consumer stopped early
+            for task in tasks:
+                task.cancel()
+
+    async def warm(self, stock_codes: List[str],
+                   concurrency: int = 8) -> AsyncIterator[Tuple[str, Optional[Exception]]]:
+        """
+        Bring the bar store and indicator state of many tickers up to date without
+        analyzing them: no sentiment, advice, result cache entry or history row.
+        Yields (ticker, None) in completion order, or (ticker, exception) on failure.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def warm_one(code: str):
+            async with semaphore:
+                try:
+                    bars = await self.fetch(code)
+                    if bars.empty:
+                        raise DataNotFoundError(f"No data found for {code}")
+                    await self._stage("technical", run_blocking(self.tech_analyzer.analyze_incremental, code, bars),
+                                      settings.technical_timeout)
+                    return code, None
+                except Exception as e:
+                    return code, e
+
+        tasks = [asyncio.ensure_future(warm_one(code)) for code in stock_codes]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
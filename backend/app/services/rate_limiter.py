@@ -0,0 +1,117 @@
+import asyncio
+import os
+import struct
+import threading
+import time
+from typing import Optional
+from app.core.concurrency import run_blocking
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; the bucket then stays per-process.
+    fcntl = None
+
+
+_STATE = struct.Struct("dd")  # (tokens, updated_at)
+
+
+class TokenBucket:
+    """
+    O(1) token bucket. Callers reserve a token up front and are told how long to
+    wait before using it, so waiting can be done with time.sleep (worker threads)
+    or asyncio.sleep (event loop) without holding any lock.
+
+    When `state_path` is given the bucket state lives in a small file guarded by
+    flock, so every process on the host (uvicorn/gunicorn workers, screener
+    workers...) draws from the same budget.
+    """
+
+    def __init__(self, rate_per_min: float, capacity: Optional[float] = None, state_path: Optional[str] = None):
+        self.rate = rate_per_min / 60.0  # tokens per second
+        self.capacity = capacity if capacity is not None else rate_per_min
+        self.state_path = state_path if fcntl is not None else None
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = time.time()
+        self._fd = None
+        self._fd_pid = None
+
+    def _reserve(self) -> float:
+        """
+        Take one token, going into debt if none is left.
+        Returns the number of seconds the caller has to wait before proceeding.
+        """
+        with self._lock:
+            if self.state_path:
+                return self._reserve_shared()
+            self._tokens, self._updated, wait = self._take(self._tokens, self._updated)
+            return wait
+
+    def _take(self, tokens: float, updated: float):
+        now = time.time()
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate) - 1
+        wait = -tokens / self.rate if tokens < 0 else 0.0
+        return tokens, now, wait
+
+    def _reserve_shared(self) -> float:
+        # flock is tied to the open file description, which a forked child shares
+        # with its parent, so every process needs its own descriptor.
+        if self._fd is None or self._fd_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            self._fd = os.open(self.state_path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._fd_pid = os.getpid()
+
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            raw = os.pread(self._fd, _STATE.size, 0)
+            tokens, updated = _STATE.unpack(raw) if len(raw) == _STATE.size else (self.capacity, time.time())
+            tokens, updated, wait = self._take(tokens, updated)
+            os.pwrite(self._fd, _STATE.pack(tokens, updated), 0)
+            return wait
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def acquire(self) -> float:
+        """
+        Blocking acquisition for code running in worker threads.
+        Returns the time spent waiting.
+        """
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        """
+        Awaitable acquisition; waiting yields the event loop instead of blocking it.
+        Returns the time spent waiting.
+        """
+        if self.state_path:
+            # flock waits for whichever process holds the state file; keep that off the event loop
+            wait = await run_blocking(self._reserve)
+        else:
+            wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+_limiter: Optional[TokenBucket] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> TokenBucket:
+    """
+    Process-wide AkShare rate limiter, shared by every fetcher instance.
+    """
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                state_path = None
+                if settings.rate_limit_shared:
+                    state_path = os.path.join(settings.data_dir, "akshare.ratelimit")
+                _limiter = TokenBucket(settings.akshare_requests_per_min, state_path=state_path)
+    return _limiter
@@ -1,19 +1,67 @@
-from jinja2 import Environment, FileSystemLoader
-from weasyprint import HTML
 import os
-from typing import Optional
+import threading
+from typing import TYPE_CHECKING, List, Optional
 from app.models.schemas import AnalysisResponse
 
+if TYPE_CHECKING:
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+
 class ReportGenerator:
     def __init__(self, template_dir="app/templates"):
-        self.env = Environment(loader=FileSystemLoader(template_dir))
-        
-    def generate_html(self, analysis: AnalysisResponse) -> str:
-        template = self.env.get_template("report.html")
-        return template.render(analysis=analysis)
-        
-    def generate_pdf(self, analysis: AnalysisResponse) -> bytes:
-        html_content = self.generate_html(analysis)
-        return HTML(string=html_content).write_pdf()
-
-report_generator = ReportGenerator()
+        # Jinja and WeasyPrint are imported here and on the first PDF rather than
+        # with the module, so API workers that never render a report don't load them
+        from jinja2 import Environment, FileSystemLoader
+        # Templates ship with the code, so compile once and never stat them again
+        self.env = Environment(loader=FileSystemLoader(template_dir), auto_reload=False)
+        self.template = self.env.get_template("report.html")
+        with open(os.path.join(template_dir, "report.css"), encoding="utf-8") as f:
+            self.css = f.read()
+        # Parsed on the first PDF and reused for every document after it
+        self._font_config: Optional["FontConfiguration"] = None
+        self._stylesheet: Optional["CSS"] = None
+
+    def _pdf_style(self):
+        if self._stylesheet is None:
+            from weasyprint import CSS
+            from weasyprint.text.fonts import FontConfiguration
+            self._font_config = FontConfiguration()
+            self._stylesheet = CSS(string=self.css, font_config=self._font_config)
+        return self._stylesheet, self._font_config
+
+    def generate_html(self, analysis: AnalysisResponse, language: str = "en", inline_css: bool = True) -> str:
+        return self.template.render(analysis=analysis, language=language,
+                                    inline_css=self.css if inline_css else None)
+
+    def _document(self, analysis: AnalysisResponse, language: str):
+        from weasyprint import HTML
+        stylesheet, font_config = self._pdf_style()
+        html_content = self.generate_html(analysis, language, inline_css=False)
+        return HTML(string=html_content).render(stylesheets=[stylesheet], font_config=font_config)
+
+    def generate_pdf(self, analysis: AnalysisResponse, language: str = "en") -> bytes:
+        return self._document(analysis, language).write_pdf()
+
+    def generate_combined_pdf(self, analyses: List[AnalysisResponse], language: str = "en") -> bytes:
+        """
+        One PDF with the reports one after the other, each starting on a new page.
+        """
+        documents = [self._document(analysis, language) for analysis in analyses]
+        pages = [page for document in documents for page in document.pages]
+        return documents[0].copy(pages).write_pdf()
+
+
+_report_generator: Optional[ReportGenerator] = None
+_report_generator_lock = threading.Lock()
+
+
+def get_report_generator() -> ReportGenerator:
+    """
+    Process-wide generator, built on the first report.
+    """
+    global _report_generator
+    if _report_generator is None:
+        with _report_generator_lock:
+            if _report_generator is None:
+                _report_generator = ReportGenerator()
+    return _report_generator
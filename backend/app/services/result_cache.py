@@ -0,0 +1,97 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+from app.core.config import settings
+from app.core.metrics import cache_result
+
+T = TypeVar("T")
+
+
+class AsyncResultCache:
+    """
+    Bounded LRU cache with a TTL, plus request coalescing: concurrent callers
+    asking for the same key while it is being computed share one computation.
+    Meant to be used from a single event loop.
+
+    Each entry also carries a `version` (e.g. the last bar a result was computed
+    from); a lookup with a different version is a miss, and the next put
+    replaces the stale entry.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0, name: str = "result"):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Hashable, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _live(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def has(self, key: Hashable) -> bool:
+        """
+        Whether an unexpired entry exists for `key`, whatever its version.
+        Does not count as a hit or miss.
+        """
+        return self._live(key) is not None
+
+    def get(self, key: Hashable, version: Hashable = None) -> Optional[Any]:
+        entry = self._live(key)
+        if entry is None or entry[1] != version:
+            self.misses += 1
+            cache_result(self.name, "miss")
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        cache_result(self.name, "hit")
+        return entry[2]
+
+    def put(self, key: Hashable, value: Any, version: Hashable = None) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, version, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def coalesce(self, key: Hashable, compute: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `compute` unless an identical computation is already in flight, in which
+        case wait for that one. The computation runs as its own task, so one caller
+        going away (client disconnect) does not cancel it for the others.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+            cache_result(self.name, "coalesced")
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "inflight": len(self._inflight),
+                "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+
+_analysis_cache: Optional[AsyncResultCache] = None
+
+
+def get_analysis_cache() -> AsyncResultCache:
+    """
+    Process-wide cache of AnalysisResponse objects for /analyze.
+    """
+    global _analysis_cache
+    if _analysis_cache is None:
+        _analysis_cache = AsyncResultCache(settings.analysis_cache_size, settings.analysis_cache_ttl, name="analysis")
+    return _analysis_cache
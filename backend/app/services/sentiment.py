@@ -1,41 +1,182 @@
-from textblob import TextBlob
+from collections import OrderedDict
+import hashlib
 import random
-from typing import Dict, Any
+import re
+import threading
+from datetime import date, timedelta
+from typing import Dict, Any, Iterable, List, Optional
+import numpy as np
+from app.core.config import settings
+from app.core.metrics import cache_result
+from app.core.startup import LazyModule
+from app.services.news_index import NewsIndex, get_news_index
+
+# Headlines are scored with the ticker replaced by this placeholder so the same
+# wording is only scored once across tickers. Only done for codes without
+# letters: digits carry no polarity, but a symbol like "GOOD" would.
+TICKER_PLACEHOLDER = "000000"
+
+# TextBlob (and NLTK under it) is loaded on the first cache miss
+textblob = LazyModule("textblob")
+
+
+class PolarityCache:
+    """
+    Bounded, thread-safe LRU of TextBlob polarity keyed by a hash of the text.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[float]:
+        with self._lock:
+            polarity = self._entries.get(key)
+            if polarity is not None:
+                self._entries.move_to_end(key)
+            return polarity
+
+    def put(self, key: bytes, polarity: float) -> None:
+        with self._lock:
+            self._entries[key] = polarity
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_polarity_cache: Optional[PolarityCache] = None
+
+
+def get_polarity_cache() -> PolarityCache:
+    global _polarity_cache
+    if _polarity_cache is None:
+        _polarity_cache = PolarityCache(settings.sentiment_cache_size)
+    return _polarity_cache
+
 
 class SentimentAnalyzer:
-    def analyze(self, ticker: str) -> Dict[str, Any]:
+    def __init__(self, noise: Optional[float] = None, seed: Optional[int] = None,
+                 cache: Optional[PolarityCache] = None, news_index: Optional[NewsIndex] = None):
         """
-        Mock sentiment analysis. 
-        In a real app, this would fetch news for the ticker and run NLP.
+        `noise` is the width of the offset added to the average polarity of the
+        template headlines (0 turns it off). The offset is a fixed function of
+        (seed, ticker, headlines), so repeated and cached analyses return the
+        same score and only a change in the headlines moves it.
+
+        Tickers with articles in the news index (see app.services.news_index)
+        within the last `settings.news_window_days` are scored from their
+        precomputed polarity instead, without noise.
         """
+        self.noise = settings.sentiment_noise if noise is None else noise
+        self.seed = settings.sentiment_seed if seed is None else seed
+        self.cache = cache or get_polarity_cache()
+        self.news_index = news_index if news_index is not None else get_news_index()
+
+    def _headlines(self, ticker: str) -> List[str]:
         # Mocking generic news headlines
-        mock_news = [
+        return [
             f"{ticker} announces new product line.",
             f"Analysts upgrade {ticker} rating.",
             f"Market volatility affects {ticker}.",
             f"{ticker} quarterly earnings beat expectations."
         ]
-        
-        # Simple analysis simulation using random for variation but weighted slightly positive for demo
-        # We can also use TextBlob on the mock headlines
-        
-        polarity_sum = 0
-        for news in mock_news:
-            blob = TextBlob(news)
-            polarity_sum += blob.sentiment.polarity
-            
-        avg_polarity = polarity_sum / len(mock_news)
-        
-        # Add some random noise to simulate dynamic data
-        avg_polarity += (random.random() - 0.5) * 0.2
-        
-        # Scale to 0-100 score for consistency (0 is very negative, 50 neutral, 100 very positive)
-        # Polarity is -1 to 1.
-        sentiment_score = (avg_polarity + 1) * 50
-        sentiment_score = max(0, min(100, sentiment_score))
-        
+
+    def _mask(self, text: str, ticker: str) -> str:
+        if not ticker or any(ch.isalpha() for ch in ticker):
+            return text
+        return re.sub(rf"(?<!\w){re.escape(ticker)}(?!\w)", TICKER_PLACEHOLDER, text)
+
+    def _noise(self, ticker: str, headlines: List[str]) -> float:
+        if not self.noise:
+            return 0.0
+        rng = random.Random("\n".join([f"{self.seed}:{ticker}", *headlines]))
+        return (rng.random() - 0.5) * self.noise
+
+    def polarities(self, texts: Iterable[str]) -> Dict[str, float]:
+        """
+        Polarity of each distinct text, running TextBlob only on texts not in the cache.
+        """
+        result = {}
+        for text in texts:
+            if text in result:
+                continue
+            key = self.cache.key(text)
+            polarity = self.cache.get(key)
+            if polarity is None:
+                cache_result("polarity", "miss")
+                polarity = textblob.TextBlob(text).sentiment.polarity
+                self.cache.put(key, polarity)
+            else:
+                cache_result("polarity", "hit")
+            result[text] = polarity
+        return result
+
+    def _from_index(self, ticker: str) -> Optional[Dict[str, Any]]:
+        if self.news_index is None:
+            return None
+        today = date.today()
+        ids = self.news_index.query(ticker, today - timedelta(days=settings.news_window_days), today)
+        if ids.size == 0:
+            return None
+        polarity = np.asarray(self.news_index.polarity[ids])
+        # Unscored (Chinese) articles are NaN; with none scored, fall back instead of reporting neutral
+        scored = polarity[~np.isnan(polarity)]
+        if scored.size == 0:
+            return None
+        avg_polarity = float(scored.mean())
+        sentiment_score = max(0, min(100, (avg_polarity + 1) * 50))
+        latest = ids[::-1][:settings.news_max_headlines]
         return {
             "score": sentiment_score,
-            "headlines": mock_news,
+            "headlines": [self.news_index.title(i) for i in latest],
             "summary": "Positive market sentiment detected." if sentiment_score > 55 else "Mixed/Neutral sentiment."
         }
+
+    def analyze_batch(self, tickers: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Analyze many tickers with one pass over their distinct (ticker-masked) headlines.
+        """
+        results = {}
+        tickers = list(dict.fromkeys(tickers))
+        for ticker in tickers:
+            indexed = self._from_index(ticker)
+            if indexed is not None:
+                results[ticker] = indexed
+        tickers = [ticker for ticker in tickers if ticker not in results]
+
+        headlines = {ticker: self._headlines(ticker) for ticker in tickers}
+        masked = {ticker: [self._mask(news, ticker) for news in headlines[ticker]] for ticker in tickers}
+        polarity = self.polarities(text for texts in masked.values() for text in texts)
+
+        for ticker in tickers:
+            avg_polarity = sum(polarity[text] for text in masked[ticker]) / len(masked[ticker])
+
+            # Deterministic per-ticker spread, so the mock headlines don't all score alike
+            avg_polarity += self._noise(ticker, headlines[ticker])
+
+            # Scale to 0-100 score for consistency (0 is very negative, 50 neutral, 100 very positive)
+            # Polarity is -1 to 1.
+            sentiment_score = (avg_polarity + 1) * 50
+            sentiment_score = max(0, min(100, sentiment_score))
+
+            results[ticker] = {
+                "score": sentiment_score,
+                "headlines": headlines[ticker],
+                "summary": "Positive market sentiment detected." if sentiment_score > 55 else "Mixed/Neutral sentiment."
+            }
+        return results
+
+    def analyze(self, ticker: str) -> Dict[str, Any]:
+        """
+        Sentiment from the ticker's recent articles in the news index, falling
+        back to mock headlines when there are none.
+        """
+        return self.analyze_batch([ticker])[ticker]
@@ -0,0 +1,186 @@
+"""
+Server-push fan-out of live signals (GET /stream/signals, Server-Sent Events).
+
+Each subscribed ticker gets one refresh loop, however many clients watch it:
+every `stream_interval` seconds the loop fetches the bars, re-runs the pipeline
+only if the last bar changed, and publishes an event only when the signal did.
+The hub's pipelines record no history, so a watched ticker doesn't add a row
+to the history store on every refresh. An event is serialized once and the same
+string is queued to every subscriber, so the cost of a refresh scales with the
+number of tickers, not clients. The loop stops when its last subscriber leaves.
+
+Events:
+    event: snapshot   {"ticker", "data": {...}}      on subscribe and first refresh
+    event: delta      {"ticker", "as_of", "changes"} only the fields that changed
+    event: error      {"ticker", "error"}
+A client that falls too far behind has its backlog dropped and gets fresh
+snapshots instead.
+"""
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+from app.core.config import settings
+from app.models.schemas import AnalysisResponse
+from app.services.pipeline import AnalysisPipeline, bar_version
+
+logger = logging.getLogger(__name__)
+
+# Response fields pushed to subscribers; the rest (headlines, texts) only change with them
+_FIELDS = ("current_price", "tech_score", "tech_signal", "sentiment_score", "overall_score",
+           "advice_action", "entry_point", "exit_point", "stale")
+
+
+def _sse(event: str, payload: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _state(response: AnalysisResponse) -> Dict[str, Any]:
+    state = {field: getattr(response, field) for field in _FIELDS}
+    state["indicators"] = dict(response.indicators)
+    return state
+
+
+def _diff(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    changes = {key: value for key, value in current.items()
+               if key != "indicators" and previous.get(key) != value}
+    indicators = {key: value for key, value in current["indicators"].items()
+                  if previous["indicators"].get(key) != value}
+    if indicators:
+        changes["indicators"] = indicators
+    return changes
+
+
+class Subscription:
+    def __init__(self, tickers: List[str], queue_size: int):
+        self.tickers = tickers
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=queue_size)
+        self.resync = False
+
+    def push(self, message: str):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Slow client: it gets snapshots of everything once it catches up
+            self.resync = True
+
+
+class SignalHub:
+    def __init__(self, pipeline_factory: Callable[[], AnalysisPipeline], interval: float = 60.0,
+                 concurrency: int = 8, queue_size: int = 256, heartbeat: float = 15.0):
+        self.pipeline_factory = pipeline_factory
+        self.interval = interval
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._loops: Dict[str, asyncio.Task] = {}
+        # Latest snapshot event per ticker, for clients joining between refreshes
+        self._snapshots: Dict[str, str] = {}
+
+    def subscribe(self, tickers: List[str]) -> Subscription:
+        subscription = Subscription(tickers, self.queue_size)
+        for ticker in tickers:
+            self._subscribers.setdefault(ticker, set()).add(subscription)
+            if ticker in self._snapshots:
+                subscription.push(self._snapshots[ticker])
+            if ticker not in self._loops:
+                self._loops[ticker] = asyncio.ensure_future(self._refresh(ticker))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for ticker in subscription.tickers:
+            subscribers = self._subscribers.get(ticker)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[ticker]
+                self._snapshots.pop(ticker, None)
+                loop = self._loops.pop(ticker, None)
+                if loop is not None:
+                    loop.cancel()
+
+    def _publish(self, ticker: str, message: str):
+        for subscription in self._subscribers.get(ticker, ()):
+            subscription.push(message)
+
+    async def _refresh(self, ticker: str):
+        pipeline = self.pipeline_factory()
+        previous: Optional[Dict[str, Any]] = None
+        version = None
+        while True:
+            async with self._semaphore:
+                response = None
+                try:
+                    bars = await pipeline.fetch(ticker)
+                    # Only a new or revised last bar (or a change in staleness) can change the signal
+                    latest = None if bars.empty else (*bar_version(bars), bool(bars.attrs.get("stale")))
+                    if latest is None or latest != version:
+                        response = await pipeline.run(ticker, bars=bars)
+                        version = latest
+                except Exception as e:
+                    logger.warning(f"Signal refresh failed for {ticker}: {str(e)}")
+                    self._publish(ticker, _sse("error", {"ticker": ticker, "error": str(e) or type(e).__name__}))
+                    version = None
+
+            if response is not None:
+                state = _state(response)
+                snapshot = _sse("snapshot", {"ticker": ticker, "as_of": response.analysis_date, "data": state})
+                self._snapshots[ticker] = snapshot
+                if previous is None:
+                    self._publish(ticker, snapshot)
+                else:
+                    changes = _diff(previous, state)
+                    if changes:
+                        self._publish(ticker, _sse("delta", {"ticker": ticker, "as_of": response.analysis_date,
+                                                             "changes": changes}))
+                previous = state
+            await asyncio.sleep(self.interval)
+
+    async def stream(self, tickers: List[str]) -> AsyncIterator[str]:
+        """
+        SSE body for one client; unsubscribes when the client goes away.
+        """
+        subscription = self.subscribe(tickers)
+        try:
+            while True:
+                if subscription.resync:
+                    subscription.resync = False
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    for ticker in tickers:
+                        if ticker in self._snapshots:
+                            yield self._snapshots[ticker]
+                try:
+                    yield await asyncio.wait_for(subscription.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    # SSE comment, keeps proxies from closing an idle connection
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    async def stop(self):
+        loops = list(self._loops.values())
+        self._loops.clear()
+        for loop in loops:
+            loop.cancel()
+        await asyncio.gather(*loops, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"tickers": len(self._loops),
+                "subscribers": len({sub for subs in self._subscribers.values() for sub in subs})}
+
+
+_hub: Optional[SignalHub] = None
+
+
+def start_signal_hub(pipeline_factory: Callable[[], AnalysisPipeline]) -> SignalHub:
+    global _hub
+    _hub = SignalHub(pipeline_factory, interval=settings.stream_interval, concurrency=settings.stream_concurrency,
+                     queue_size=settings.stream_queue_size, heartbeat=settings.stream_heartbeat)
+    return _hub
+
+
+def get_signal_hub() -> Optional[SignalHub]:
+    return _hub
@@ -0,0 +1,222 @@
+"""
+Resilient calls to AkShare.
+
+Every attempt runs on a small dedicated thread pool, so the caller can stop
+waiting after `upstream_timeout` seconds even though the blocking AkShare call
+itself cannot be interrupted. On top of that:
+
+- failures are retried with full-jitter exponential backoff;
+- an attempt still running after `upstream_hedge_after` seconds gets a
+  duplicate (hedged) request, and whichever answers first wins;
+- a circuit breaker per endpoint opens after `upstream_breaker_failures`
+  consecutive failures, failing calls immediately for `upstream_breaker_reset`
+  seconds, then lets a single probe call through to decide whether to close.
+
+While the breaker is open the fetcher serves stored bars marked as stale (see
+AkShareFetcher), so an upstream incident costs requests a few milliseconds
+instead of a blocked worker each.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, TypeVar
+from app.core.config import settings
+from app.core.metrics import CIRCUIT_STATE, UPSTREAM_CALLS, UPSTREAM_HEDGES, UPSTREAM_RETRIES, UPSTREAM_SECONDS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f"Upstream '{endpoint}' is unavailable (circuit open, next probe in {retry_in:.0f}s)")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+@contextmanager
+def upstream_call(endpoint: str):
+    """
+    Count and time one AkShare request.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_CALLS.labels(endpoint, "error").inc()
+        raise
+    else:
+        UPSTREAM_CALLS.labels(endpoint, "ok").inc()
+    finally:
+        UPSTREAM_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    _GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, endpoint: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(endpoint).set(0)
+
+    def _set(self, state: str):
+        if state != self.state:
+            logger.warning(f"Upstream '{self.endpoint}' circuit {self.state} -> {state}")
+            self.state = state
+            CIRCUIT_STATE.labels(self.endpoint).set(self._GAUGE[state])
+
+    def allow(self) -> None:
+        """
+        Raise CircuitOpenError unless a call may go out now.
+        Half-open lets exactly one probe through at a time.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                retry_in = self._opened_at + self.reset_timeout - time.monotonic()
+                if retry_in > 0:
+                    raise CircuitOpenError(self.endpoint, retry_in)
+                self._set(self.HALF_OPEN)
+                self._probing = False
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    raise CircuitOpenError(self.endpoint, 0)
+                self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._set(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set(self.OPEN)
+
+    def is_open(self) -> bool:
+        return self.state == self.OPEN and time.monotonic() < self._opened_at + self.reset_timeout
+
+
+class UpstreamClient:
+    def __init__(self, endpoint: str, executor: ThreadPoolExecutor, breaker: Optional[CircuitBreaker] = None,
+                 timeout: float = 10.0, retries: int = 2, backoff: float = 0.5, backoff_max: float = 4.0,
+                 hedge_after: float = 0.0):
+        self.endpoint = endpoint
+        self.executor = executor
+        self.breaker = breaker or CircuitBreaker(endpoint)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+
+    def call(self, func: Callable[..., T], *args: Any, throttle: Optional[Callable[[], Any]] = None,
+             **kwargs: Any) -> T:
+        """
+        Call func(*args, **kwargs) with timeout, retries, hedging and the breaker.
+        The caller is expected to have rate-limited the first request already;
+        `throttle` is called before every extra one (retries and hedges).
+        Raises CircuitOpenError without calling upstream when the breaker is open.
+        """
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            try:
+                result = self._attempt(func, args, kwargs, throttle)
+            except Exception as e:
+                self.breaker.record_failure()
+                if attempt >= self.retries or self.breaker.is_open():
+                    raise
+                attempt += 1
+                delay = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** (attempt - 1)))
+                UPSTREAM_RETRIES.labels(self.endpoint).inc()
+                logger.warning(f"{self.endpoint} failed ({str(e) or type(e).__name__}), "
+                               f"retry {attempt}/{self.retries} in {delay:.2f}s")
+                time.sleep(delay)
+                if throttle is not None:
+                    throttle()
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _attempt(self, func: Callable[..., T], args, kwargs, throttle) -> T:
+        def request():
+            with upstream_call(self.endpoint):
+                return func(*args, **kwargs)
+
+        deadline = time.monotonic() + self.timeout
+        pending = {self.executor.submit(request)}
+        if 0 < self.hedge_after < self.timeout:
+            done, _ = wait(pending, timeout=self.hedge_after)
+            if not done:
+                if throttle is not None:
+                    throttle()
+                UPSTREAM_HEDGES.labels(self.endpoint).inc()
+                pending.add(self.executor.submit(request))
+
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    self._abandon(pending)
+                    return future.result()
+                error = future.exception()
+        self._abandon(pending)
+        if error is not None and not pending:
+            raise error
+        raise TimeoutError(f"{self.endpoint} did not answer within {self.timeout:.1f}s")
+
+    @staticmethod
+    def _abandon(pending):
+        # Queued requests are dropped; ones already running finish in the
+        # background and their result is discarded.
+        for future in pending:
+            future.cancel()
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_clients: Dict[str, UpstreamClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_upstream(endpoint: str) -> UpstreamClient:
+    """
+    Process-wide client (and breaker) for one AkShare endpoint.
+    """
+    global _executor
+    client = _clients.get(endpoint)
+    if client is None:
+        with _clients_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.upstream_max_inflight,
+                                               thread_name_prefix="quantai-upstream")
+            client = _clients.get(endpoint)
+            if client is None:
+                breaker = CircuitBreaker(endpoint, settings.upstream_breaker_failures, settings.upstream_breaker_reset)
+                client = UpstreamClient(endpoint, _executor, breaker, timeout=settings.upstream_timeout,
+                                        retries=settings.upstream_retries, backoff=settings.upstream_backoff,
+                                        backoff_max=settings.upstream_backoff_max,
+                                        hedge_after=settings.upstream_hedge_after)
+                _clients[endpoint] = client
+    return client
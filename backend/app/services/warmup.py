@@ -0,0 +1,206 @@
+"""
+Pre-market warm-up: fetch the bars of a watchlist (or the whole A-share
+universe) and fold them into the indicator state ahead of the open, so the
+morning's first requests find an up-to-date bar store and indicator state and
+only pay for sentiment and advice. Warm-up produces no analyses: nothing is
+put in the result cache (whose entries would expire long before the open)
+and nothing is recorded in the history store.
+
+Started from the FastAPI lifespan (app/main.py). Runs every weekday at
+settings.warmup_time (settings.warmup_timezone). AkShare calls go through the
+normal fetcher, so they draw from the same rate limit as live traffic. With
+several server workers only one of them runs a given warm-up (file lock); the
+on-disk bars and indicator state it produces are shared by all of them.
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+from app.core.config import settings
+from app.services.pipeline import AnalysisPipeline
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WarmupStatus:
+    state: str = "idle" # idle, running, done, skipped, failed
+    total: int = 0
+    done: int = 0
+    failed: int = 0
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    next_run: Optional[str] = None
+    message: Optional[str] = None
+
+
+class WarmupScheduler:
+    def __init__(self, pipeline_factory: Callable[[], AnalysisPipeline], watchlist: Optional[List[str]] = None,
+                 at: str = "07:30", timezone: str = "Asia/Shanghai", concurrency: int = 4):
+        self.pipeline_factory = pipeline_factory
+        self.watchlist = [code.upper() for code in (watchlist or [])]
+        self.at = datetime.strptime(at, "%H:%M").time()
+        self.tz = ZoneInfo(timezone)
+        self.concurrency = concurrency
+        self.status = WarmupStatus()
+        self._started = 0.0
+        self._loop_task: Optional[asyncio.Task] = None
+        self._run_task: Optional[asyncio.Task] = None
+
+    def next_run(self, now: Optional[datetime] = None) -> datetime:
+        """
+        Next weekday at `at`, in the scheduler's timezone.
+        """
+        now = now or datetime.now(self.tz)
+        candidate = now.replace(hour=self.at.hour, minute=self.at.minute, second=0, microsecond=0)
+        if candidate <= now:
+            candidate += timedelta(days=1)
+        while candidate.weekday() >= 5:
+            candidate += timedelta(days=1)
+        return candidate
+
+    def start(self, run_now: bool = False):
+        self._loop_task = asyncio.ensure_future(self._schedule(run_now))
+
+    async def stop(self):
+        for task in (self._loop_task, self._run_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+    async def _schedule(self, run_now: bool):
+        self.status.next_run = self.next_run().isoformat()
+        if run_now:
+            await self.run_once()
+        while True:
+            next_run = self.next_run()
+            self.status.next_run = next_run.isoformat()
+            await asyncio.sleep(max(0.0, (next_run - datetime.now(self.tz)).total_seconds()))
+            await self.run_once()
+
+    def trigger(self) -> bool:
+        """
+        Start a warm-up in the background now. False if one is already running,
+        scheduled or triggered, in this worker or another.
+        """
+        if self.status.state == "running":
+            return False
+        lock = self._try_lock()
+        if lock is False:
+            return False
+        # Marked running before returning, so an overlapping trigger or scheduled run backs off
+        self._begin()
+        self._run_task = asyncio.ensure_future(self._run(lock))
+        return True
+
+    async def _tickers(self, pipeline: AnalysisPipeline) -> List[str]:
+        if self.watchlist:
+            return self.watchlist
+        # Full universe: every code in the market-wide spot snapshot
+        snapshot = await pipeline.fetcher.get_spot_snapshot_async()
+        return sorted(snapshot)
+
+    async def run_once(self):
+        if self.status.state == "running":
+            return
+        lock = self._try_lock()
+        if lock is False:
+            self.status.state = "skipped"
+            self.status.message = "Warm-up already running in another worker"
+            return
+        self._begin()
+        await self._run(lock)
+
+    def _begin(self):
+        self.status = WarmupStatus(state="running", started_at=datetime.now(self.tz).isoformat(),
+                                   next_run=self.status.next_run)
+        self._started = time.monotonic()
+
+    async def _run(self, lock):
+        try:
+            pipeline = self.pipeline_factory()
+            tickers = await self._tickers(pipeline)
+            self.status.total = len(tickers)
+            logger.info(f"Warm-up started for {len(tickers)} tickers")
+            async for code, error in pipeline.warm(tickers, concurrency=self.concurrency):
+                if error is not None:
+                    self.status.failed += 1
+                    logger.debug(f"Warm-up failed for {code}: {str(error)}")
+                self.status.done += 1
+            self.status.state = "done"
+            logger.info(f"Warm-up finished: {self.status.done} tickers, {self.status.failed} failed, "
+                        f"{time.monotonic() - self._started:.0f}s")
+        except asyncio.CancelledError:
+            self.status.state = "idle"
+            self.status.message = "Cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Warm-up failed: {str(e)}")
+            self.status.state = "failed"
+            self.status.message = str(e)
+        finally:
+            self.status.finished_at = datetime.now(self.tz).isoformat()
+            if lock:
+                os.close(lock)
+
+    def _try_lock(self):
+        """
+        fd of the held warm-up lock, None without fcntl, or False if another process holds it.
+        """
+        if fcntl is None:
+            return None
+        os.makedirs(settings.data_dir, exist_ok=True)
+        fd = os.open(os.path.join(settings.data_dir, "warmup.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        return fd
+
+    def eta_seconds(self) -> Optional[float]:
+        if self.status.state != "running" or not self.status.total:
+            return None
+        remaining = self.status.total - self.status.done
+        if self.status.done:
+            elapsed = time.monotonic() - self._started
+            return remaining * elapsed / self.status.done
+        # Nothing finished yet: at least one AkShare request per ticker
+        return remaining * 60.0 / settings.akshare_requests_per_min
+
+    def snapshot(self) -> Dict:
+        status = asdict(self.status)
+        status["watchlist"] = len(self.watchlist) or "universe"
+        status["progress"] = round(self.status.done / self.status.total, 4) if self.status.total else None
+        eta = self.eta_seconds()
+        status["eta_seconds"] = round(eta, 1) if eta is not None else None
+        return status
+
+
+_scheduler: Optional[WarmupScheduler] = None
+
+
+def start_warmup(pipeline_factory: Callable[[], AnalysisPipeline]) -> Optional[WarmupScheduler]:
+    global _scheduler
+    if not settings.warmup_enabled:
+        return None
+    _scheduler = WarmupScheduler(pipeline_factory, watchlist=settings.warmup_watchlist, at=settings.warmup_time,
+                                 timezone=settings.warmup_timezone, concurrency=settings.warmup_concurrency)
+    _scheduler.start(run_now=settings.warmup_on_startup)
+    return _scheduler
+
+
+def get_warmup_scheduler() -> Optional[WarmupScheduler]:
+    return _scheduler
@@ -0,0 +1,121 @@
+"""
+Offline, deterministic stand-in for the AkShare calls the backend makes.
+
+    from benchmarks.fake_akshare import FakeAkShare, install
+    with install(FakeAkShare(seed=1, latency=0.05, jitter=0.02)) as fake:
+        ...  # AkShareFetcher now talks to `fake`
+        fake.calls  # {"stock_zh_a_hist": n, "stock_zh_a_spot_em": m}
+
+Prices are a seeded random walk per ticker over a fixed business-day calendar,
+so the same (seed, ticker, date range) always returns the same bars whatever
+the call order. Latency is latency +/- jitter seconds per call (uniform).
+"""
+import random
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Calendar the synthetic history lives on; ranges outside it come back empty
+CALENDAR = pd.bdate_range("2010-01-04", "2030-12-31")
+
+
+def universe(size: int) -> List[str]:
+    """
+    `size` A-share-looking codes, spread over the 000/300/600 boards.
+    """
+    boards = ("000", "300", "600")
+    return [f"{boards[i % 3]}{i // 3 + 1:03d}" for i in range(size)]
+
+
+class FakeAkShare:
+    def __init__(self, seed: int = 0, latency: float = 0.0, jitter: float = 0.0, universe_size: int = 5000):
+        self.seed = seed
+        self.latency = latency
+        self.jitter = jitter
+        self.codes = universe(universe_size)
+        self.calls: Dict[str, int] = {"stock_zh_a_hist": 0, "stock_zh_a_spot_em": 0}
+        self._series: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._latency_rng = random.Random(seed)
+
+    def _sleep(self, name: str):
+        with self._lock:
+            self.calls[name] += 1
+            delay = self.latency + self._latency_rng.uniform(-self.jitter, self.jitter) if self.latency else 0.0
+        if delay > 0:
+            time.sleep(delay)
+
+    def _ohlcv(self, symbol: str) -> np.ndarray:
+        """
+        (bars, 5) array of open, close, high, low, volume over CALENDAR.
+        """
+        series = self._series.get(symbol)
+        if series is None:
+            rng = np.random.default_rng([self.seed, zlib.crc32(symbol.encode())])
+            n = len(CALENDAR)
+            close = rng.uniform(5, 100) * np.exp(np.cumsum(rng.normal(0.0002, 0.02, n)))
+            open_ = close * np.exp(rng.normal(0, 0.005, n))
+            high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.02, n))
+            low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.02, n))
+            volume = rng.integers(10_000, 5_000_000, n).astype(float)
+            series = np.round(np.column_stack([open_, close, high, low, volume]), 2)
+            with self._lock:
+                self._series[symbol] = series
+        return series
+
+    def stock_zh_a_hist(self, symbol: str, period: str = "daily", start_date: str = "19700101",
+                        end_date: str = "20500101", adjust: str = "") -> pd.DataFrame:
+        self._sleep("stock_zh_a_hist")
+        lo = CALENDAR.searchsorted(pd.Timestamp(start_date))
+        hi = CALENDAR.searchsorted(pd.Timestamp(end_date), side="right")
+        # Nothing after today, like the real endpoint
+        hi = min(hi, CALENDAR.searchsorted(pd.Timestamp(date.today()), side="right"))
+        bars = self._ohlcv(symbol)[lo:hi]
+        close = bars[:, 1]
+        prev_close = np.concatenate([[close[0]], close[:-1]]) if len(close) else close
+        return pd.DataFrame({
+            "日期": CALENDAR[lo:hi].date,
+            "股票代码": symbol,
+            "开盘": bars[:, 0],
+            "收盘": close,
+            "最高": bars[:, 2],
+            "最低": bars[:, 3],
+            "成交量": bars[:, 4],
+            "成交额": bars[:, 4] * close,
+            "振幅": np.round((bars[:, 2] - bars[:, 3]) / prev_close * 100, 2),
+            "涨跌幅": np.round((close / prev_close - 1) * 100, 2),
+            "涨跌额": np.round(close - prev_close, 2),
+            "换手率": 1.0,
+        })
+
+    def stock_zh_a_spot_em(self) -> pd.DataFrame:
+        self._sleep("stock_zh_a_spot_em")
+        today = CALENDAR.searchsorted(pd.Timestamp(date.today()), side="right") - 1
+        prices = [self._ohlcv(code)[today, 1] for code in self.codes]
+        return pd.DataFrame({
+            "序号": np.arange(1, len(self.codes) + 1),
+            "代码": self.codes,
+            "名称": [f"FAKE{code}" for code in self.codes],
+            "最新价": prices,
+        })
+
+
+@contextmanager
+def install(fake: Optional[FakeAkShare] = None) -> Iterator[FakeAkShare]:
+    """
+    Point app.services.data_fetcher at `fake` for the duration of the block.
+    """
+    from app.services import data_fetcher
+    fake = fake or FakeAkShare()
+    original = data_fetcher.ak
+    data_fetcher.ak = fake
+    try:
+        yield fake
+    finally:
+        data_fetcher.ak = original
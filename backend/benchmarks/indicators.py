@@ -0,0 +1,119 @@
+"""
+Accuracy and throughput check of the NumPy indicator backend against TA-Lib.
+
+    cd backend && python -m benchmarks.indicators [--bars 500] [--tickers 5000] [--out result.json]
+
+For every indicator TechnicalAnalyzer uses, compares the NumPy output with
+TA-Lib on a synthetic random walk (same NaN lookback layout, max absolute
+difference) and times both on a single series and on a (tickers, bars) panel.
+TA-Lib is optional; without it only the NumPy timings are reported.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from app.services import indicators as ta_numpy
+
+try:
+    import talib
+except ImportError:
+    talib = None
+
+TOLERANCE = 1e-8
+
+
+def _random_walk(rng: np.random.Generator, shape):
+    close = 20 * np.cumprod(1 + rng.normal(0, 0.02, shape), axis=-1)
+    high = close * (1 + rng.uniform(0, 0.02, shape))
+    low = close * (1 - rng.uniform(0, 0.02, shape))
+    return high, low, close
+
+
+def _cases(high, low, close):
+    return {
+        "SMA": lambda lib: lib.SMA(close, timeperiod=20),
+        "MACD": lambda lib: lib.MACD(close, fastperiod=12, slowperiod=26, signalperiod=9),
+        "RSI": lambda lib: lib.RSI(close, timeperiod=14),
+        "STOCH": lambda lib: lib.STOCH(high, low, close, fastk_period=9, slowk_period=3, slowk_matype=0,
+                                       slowd_period=3, slowd_matype=0),
+        "BBANDS": lambda lib: lib.BBANDS(close, timeperiod=20, nbdevup=2, nbdevdn=2, matype=0),
+    }
+
+
+def _outputs(result):
+    return result if isinstance(result, tuple) else (result,)
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def check_accuracy(bars: int, seed: int = 0):
+    high, low, close = _random_walk(np.random.default_rng(seed), bars)
+    report = {}
+    for name, case in _cases(high, low, close).items():
+        ours = _outputs(case(ta_numpy))
+        theirs = _outputs(case(talib))
+        same_nan = all(np.array_equal(np.isnan(a), np.isnan(b)) for a, b in zip(ours, theirs))
+        max_abs = max(float(np.nanmax(np.abs(a - b))) for a, b in zip(ours, theirs))
+        report[name] = {"same_lookback": same_nan, "max_abs_diff": max_abs,
+                        "ok": same_nan and max_abs <= TOLERANCE}
+    return report
+
+
+def benchmark(bars: int, tickers: int, repeat: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    series = _random_walk(rng, bars)
+    panel = _random_walk(rng, (tickers, bars))
+    report = {}
+    for name in _cases(*series):
+        single = _cases(*series)[name]
+        batched = _cases(*panel)[name]
+        entry = {"numpy_series_us": _best_of(lambda: single(ta_numpy), repeat) * 1e6,
+                 "numpy_panel_s": _best_of(lambda: batched(ta_numpy), repeat)}
+        if talib is not None:
+            entry["talib_series_us"] = _best_of(lambda: single(talib), repeat) * 1e6
+            # TA-Lib is 1-D only: one call per ticker
+            entry["talib_panel_s"] = _best_of(
+                lambda: [_cases(*(a[i] for a in panel))[name](talib) for i in range(tickers)], 1)
+        entry["numpy_panel_tickers_per_s"] = tickers / entry["numpy_panel_s"]
+        report[name] = entry
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, default=500)
+    parser.add_argument("--tickers", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    result = {
+        "bars": args.bars,
+        "tickers": args.tickers,
+        "talib_available": talib is not None,
+        "accuracy": check_accuracy(args.bars) if talib is not None else None,
+        "timings": benchmark(args.bars, args.tickers, args.repeat),
+    }
+    payload = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+    accuracy = result["accuracy"] or {}
+    return 0 if all(entry["ok"] for entry in accuracy.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Offline benchmark of the analysis pipeline, against a fake AkShare.
+
+    cd backend && python -m benchmarks.pipeline [--clients 1,8,32] [--requests 200] [--latency 0.05]
+                                                [--jitter 0.02] [--seed 0] [--out result.json]
+
+The load scenarios need httpx, from the dev requirements (pip install -r requirements-dev.txt).
+
+Micro-benchmarks: TechnicalAnalyzer.analyze (DataFrame and Bars),
+SentimentAnalyzer.analyze (cold and warm polarity cache),
+InvestmentAdvisor.generate_advice and report rendering (HTML; PDF when
+WeasyPrint is installed).
+
+Load scenarios: POST /api/v1/analyze through the ASGI app at N concurrent
+clients. Every scenario starts on tickers no earlier scenario has seen, so the
+first pass over its `--tickers` codes goes to the fake upstream (latency +/-
+jitter per call) and later requests hit the bar store and caches. The analysis
+result cache is off unless --result-cache is given, so every request runs the
+pipeline.
+
+Everything runs against a throwaway data directory; the live AkShare servers
+are never contacted. Output is a JSON report, to compare runs over time.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.core.config import settings
+from benchmarks.fake_akshare import FakeAkShare, install, universe
+
+# Micro-benchmark ticker; on the STAR board, which load scenarios never use
+MICRO_TICKER = "688001"
+
+
+def _configure(data_dir: str, seed: int, result_cache: bool):
+    # Before anything reads them: the rate limiter, history store and caches
+    # are process-wide singletons built from settings on first use.
+    settings.data_dir = data_dir
+    settings.akshare_requests_per_min = 10**9
+    settings.rate_limit_shared = False
+    settings.warmup_enabled = False
+    settings.sentiment_seed = seed
+    settings.analysis_cache_ttl = settings.analysis_cache_ttl if result_cache else 0
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples) * 1000
+    return {"n": len(samples), "mean_ms": float(ms.mean()), "p50_ms": float(np.percentile(ms, 50)),
+            "p90_ms": float(np.percentile(ms, 90)), "p99_ms": float(np.percentile(ms, 99)),
+            "min_ms": float(ms.min()), "max_ms": float(ms.max())}
+
+
+def _timed(func: Callable, iterations: int, warmup: int = 3) -> Dict[str, float]:
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return _summary(samples)
+
+
+def micro(iterations: int, seed: int) -> Dict[str, Dict]:
+    from app.services.advisor import InvestmentAdvisor
+    from app.services.analyzer import TechnicalAnalyzer
+    from app.services.bars import Bars
+    from app.services.data_fetcher import AkShareFetcher
+    from app.services.sentiment import PolarityCache, SentimentAnalyzer
+
+    with install(FakeAkShare(seed=seed)):
+        history = AkShareFetcher().fetch_history(MICRO_TICKER, "500d")
+
+    report = {}
+    analyzer = TechnicalAnalyzer()
+    report["technical_analyze"] = _timed(lambda: analyzer.analyze(history), iterations)
+    bars = Bars.from_frame(history)
+    report["technical_analyze_bars"] = _timed(lambda: analyzer.analyze(bars), iterations)
+    tech = analyzer.analyze(history)
+
+    # Cold: a fresh polarity cache every call, so every headline goes through TextBlob
+    codes = iter(universe(iterations + 10))
+    report["sentiment_analyze_cold"] = _timed(
+        lambda: SentimentAnalyzer(seed=seed, cache=PolarityCache()).analyze(next(codes)), iterations)
+    sentiment = SentimentAnalyzer(seed=seed, cache=PolarityCache())
+    report["sentiment_analyze_warm"] = _timed(lambda: sentiment.analyze(MICRO_TICKER), iterations)
+
+    advisor = InvestmentAdvisor()
+    price = float(history["Close"].iloc[-1])
+    report["generate_advice"] = _timed(
+        lambda: advisor.generate_advice(price, tech.score, 55.0, holding_cost=price * 0.9), iterations)
+
+    from app.services.report_generator import get_report_generator
+    generator = get_report_generator()
+    response = _sample_response(history, tech, price)
+    report["report_html"] = _timed(lambda: generator.generate_html(response), iterations)
+    try:
+        # PDFs are slow; a handful is enough for a stable number
+        report["report_pdf"] = _timed(lambda: generator.generate_pdf(response), max(3, iterations // 20), warmup=1)
+    except (ImportError, OSError) as e:
+        # OSError: WeasyPrint installed but its native libraries (pango, cairo) are missing
+        report["report_pdf"] = {"skipped": f"WeasyPrint unavailable: {e}"}
+    return report
+
+
+def _sample_response(history, tech, price):
+    from app.models.schemas import AnalysisResponse
+    return AnalysisResponse(
+        ticker=MICRO_TICKER, analysis_date=datetime.now().isoformat(), current_price=price,
+        tech_score=tech.score, tech_signal=tech.signal, indicators=tech.indicators,
+        sentiment_score=55.0, sentiment_summary="Benchmark", news_headlines=["Benchmark headline"],
+        advice_action="HOLD", advice_rationale="Benchmark", entry_point=None, exit_point=price * 1.1,
+        overall_score=60.0, summary_text="Benchmark")
+
+
+async def _load(app, codes: List[str], clients: int, requests: int) -> Dict:
+    import httpx
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    queue: "asyncio.Queue[str]" = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(codes[i % len(codes)])
+
+    async def client(http: httpx.AsyncClient):
+        while True:
+            try:
+                code = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                status = (await http.post("/api/v1/analyze", json={"stock_code": code})).status_code
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    errors = sum(count for status, count in statuses.items() if status != "200")
+    return {"clients": clients, "requests": requests, "tickers": len(codes), "elapsed_s": elapsed,
+            "rps": requests / elapsed, "errors": errors, "status": statuses, "latency": _summary(latencies)}
+
+
+def load(clients: List[int], requests: int, tickers: int, latency: float, jitter: float, seed: int) -> List[Dict]:
+    from app.main import app
+
+    codes = universe(tickers * len(clients))
+    scenarios = []
+    with install(FakeAkShare(seed=seed, latency=latency, jitter=jitter, universe_size=len(codes))) as fake:
+        for i, n in enumerate(clients):
+            before = dict(fake.calls)
+            result = asyncio.run(_load(app, codes[i * tickers:(i + 1) * tickers], n, requests))
+            result["upstream_calls"] = {name: count - before[name] for name, count in fake.calls.items()}
+            scenarios.append(result)
+    return scenarios
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per load scenario")
+    parser.add_argument("--tickers", type=int, default=50, help="Distinct tickers per load scenario")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake AkShare latency per call (s)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Uniform +/- jitter on the latency (s)")
+    parser.add_argument("--iterations", type=int, default=200, help="Iterations per micro-benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--result-cache", action="store_true", help="Keep the analysis result cache on under load")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--out", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+    clients = [int(n) for n in args.clients.split(",") if n.strip()]
+
+    data_dir = tempfile.mkdtemp(prefix="quantai-bench-")
+    _configure(data_dir, args.seed, args.result_cache)
+    try:
+        result = {
+            "started_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "params": {key: value for key, value in vars(args).items() if key != "out"},
+            "micro": None if args.skip_micro else micro(args.iterations, args.seed),
+            "load": None if args.skip_load else load(clients, args.requests, args.tickers,
+                                                     args.latency, args.jitter, args.seed),
+        }
+    finally:
+        if settings.history_enabled and not args.skip_load:
+            from app.services.history_store import get_history_store
+            get_history_store().close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    payload = json.dumps(result, indent=2, default=str)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+    errors = sum(scenario["errors"] for scenario in result["load"] or [])
+    return 0 if errors == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Cold-start report: import cost per module and per-worker memory.
+
+    cd backend && python -m benchmarks.startup [--top 25] [--out result.json]
+
+Each scenario runs in a fresh interpreter under `python -X importtime`:
+
+    app        import app.main, as a single uvicorn process or a worker without preload
+    preloaded  app.main plus settings.preload_modules, as the gunicorn master does
+
+For each it reports the total import time, the slowest modules (cumulative, i.e.
+including what they import) and the packages with the most import time of their
+own, which heavy optional stacks ended up loaded, and the RSS of the process.
+Where fork is available it also forks a child after gc.freeze(), like
+gunicorn.conf.py, and reports that child's RSS split into pages shared with the
+master and private ones: the private part is what every extra worker costs.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+from app.core.config import settings
+
+# Heavy stacks that should only be loaded on first use
+HEAVY_MODULES = ("akshare", "textblob", "nltk", "weasyprint", "jinja2")
+
+_CHILD = """
+import gc, json, os, sys, time
+start = time.perf_counter()
+import app.main
+from app.core.startup import memory_usage, preload
+preload({preload!r})
+result = {{"import_s": time.perf_counter() - start, "modules": len(sys.modules),
+          "heavy_loaded": [name for name in {heavy!r} if name in sys.modules],
+          "memory": memory_usage()}}
+if hasattr(os, "fork"):
+    gc.collect()
+    gc.freeze()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        gc.collect()
+        os.write(write_fd, json.dumps(memory_usage()).encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        result["worker_memory"] = json.loads(f.read() or "{{}}")
+    os.waitpid(pid, 0)
+print(json.dumps(result))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """
+    `-X importtime` lines as {"module", "depth", "self_us", "cumulative_us"}.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # Header line
+        name = parts[2].rstrip()
+        # One space after the bar, two more per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append({"module": name.strip(), "depth": depth, "self_us": self_us, "cumulative_us": cumulative_us})
+    return modules
+
+
+def _mb(usage: Dict[str, int]) -> Dict[str, float]:
+    return {key: round(value / 2**20, 1) for key, value in usage.items()}
+
+
+def scenario(preload: List[str], top: int) -> Dict:
+    code = _CHILD.format(preload=list(preload), heavy=HEAVY_MODULES)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if proc.returncode != 0:
+        raise RuntimeError(f"Import failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    modules = parse_importtime(proc.stderr)
+
+    packages: Dict[str, int] = {}
+    for module in modules:
+        package = module["module"].split(".")[0]
+        packages[package] = packages.get(package, 0) + module["self_us"]
+    slowest = sorted(modules, key=lambda m: m["cumulative_us"], reverse=True)[:top]
+    return {
+        "import_s": round(result["import_s"], 3),
+        "modules": result["modules"],
+        "heavy_loaded": result["heavy_loaded"],
+        "memory_mb": _mb(result["memory"]),
+        "worker_memory_mb": _mb(result["worker_memory"]) if "worker_memory" in result else None,
+        "top_modules": [{"module": m["module"], "cumulative_ms": round(m["cumulative_us"] / 1000, 1),
+                         "self_ms": round(m["self_us"] / 1000, 1)} for m in slowest],
+        "packages": [{"package": name, "self_ms": round(us / 1000, 1)}
+                     for name, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=25, help="Modules and packages listed per scenario")
+    parser.add_argument("--preload", help="Comma-separated modules to preload (default: settings.preload_modules)")
+    parser.add_argument("--out", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+    preload = [name.strip() for name in args.preload.split(",") if name.strip()] if args.preload \
+        else settings.preload_modules
+
+    result = {
+        "started_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "preload_modules": preload,
+        "app": scenario([], args.top),
+        "preloaded": scenario(preload, args.top),
+    }
+
+    payload = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
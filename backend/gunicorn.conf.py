@@ -0,0 +1,57 @@
+"""
+Production server: a gunicorn master that imports the app once and forks
+uvicorn workers from it.
+
+    cd backend && gunicorn -c gunicorn.conf.py app.main:app
+
+With preload_app the master imports app.main and settings.preload_modules
+(akshare, TextBlob) before forking, so each worker starts with them loaded and
+shares their memory copy-on-write instead of paying the import again; a
+worker's private RSS is then mostly what it allocates serving requests. Only
+imports happen in the master: thread pools, the history writer, the warm-up
+scheduler and the signal hub are all created in the workers (lifespan or first
+use), since threads do not survive a fork.
+
+Environment: QUANTAI_BIND (default 0.0.0.0:8000), WEB_CONCURRENCY (workers,
+default CPU count), PROMETHEUS_MULTIPROC_DIR (default <tmp>/quantai-metrics,
+emptied on start so /metrics aggregates only this server's workers).
+"""
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get("QUANTAI_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# SSE streams stay open; the graceful timeout bounds how long a reload waits for them
+graceful_timeout = 30
+
+# Has to be set before app.core.metrics is imported, i.e. before the app is preloaded
+metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR",
+                                    os.path.join(tempfile.gettempdir(), "quantai-metrics"))
+shutil.rmtree(metrics_dir, ignore_errors=True)
+os.makedirs(metrics_dir, exist_ok=True)
+
+
+def on_starting(server):
+    # Runs in the master after the app is preloaded and before the first fork
+    from app.core.config import settings
+    from app.core.startup import memory_usage, preload
+
+    timings = preload(settings.preload_modules)
+    loaded = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items() if seconds is not None)
+    # Everything imported so far lives for the whole process; freezing it keeps the
+    # workers' garbage collector from writing to (and so un-sharing) those pages
+    gc.collect()
+    gc.freeze()
+    rss = memory_usage().get("rss", 0) / 2**20
+    server.log.info(f"Preloaded {loaded or 'nothing'}; master RSS {rss:.0f} MB, "
+                    f"{gc.get_freeze_count()} objects frozen")
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,24 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from app.services.bar_store import BAR_COLUMNS, BarStore
+
+
+def _bars(n: int) -> pd.DataFrame:
+    dates = pd.bdate_range("2024-01-01", periods=n)
+    return pd.DataFrame({"Date": dates, "Open": 10.0, "Close": 10.5, "High": 11.0, "Low": 9.5, "Volume": 1000.0})
+
+
+def test_concurrent_saves_of_one_ticker(tmp_path):
+    store = BarStore(str(tmp_path))
+    frames = [_bars(50 + i) for i in range(200)]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda df: store.save("600519", "qfq", df), frames))
+
+    loaded = store.load("600519", "qfq")
+    assert list(loaded.columns) == BAR_COLUMNS
+    assert 50 <= len(loaded) < 250
+    # No temp files left behind
+    assert os.listdir(tmp_path / "qfq") == ["600519.parquet"]
@@ -0,0 +1,19 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.incremental import IndicatorEngine, IndicatorStateStore
+
+
+def test_concurrent_saves_of_one_ticker(tmp_path):
+    store = IndicatorStateStore(str(tmp_path))
+    engine = IndicatorEngine()
+    for i in range(40):
+        engine.update(f"2024-01-{i % 28 + 1:02d}", 11.0 + i * 0.1, 9.0 + i * 0.1, 10.0 + i * 0.1)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda _: store.save("600519", engine), range(800)))
+
+    loaded = store.load("600519")
+    assert loaded is not None
+    assert loaded.to_dict() == engine.to_dict()
+    assert os.listdir(tmp_path) == ["600519.json"]
@@ -0,0 +1,12 @@
+import numpy as np
+import pytest
+
+from app.services import indicators
+
+
+def test_unsupported_matype_is_a_value_error():
+    close = np.linspace(10, 20, 50)
+    with pytest.raises(ValueError):
+        indicators.BBANDS(close, timeperiod=20, matype=1)
+    with pytest.raises(ValueError):
+        indicators.STOCH(close + 1, close - 1, close, slowd_matype=2)
@@ -0,0 +1,32 @@
+import json
+import math
+from datetime import date
+
+from app.services.news_index import NewsIndex, build_index
+from app.services.sentiment import PolarityCache, SentimentAnalyzer
+
+
+def _index(tmp_path, records) -> NewsIndex:
+    dump = tmp_path / "dump.jsonl"
+    dump.write_text("\n".join(json.dumps(r, ensure_ascii=False) for r in records), encoding="utf-8")
+    build_index([str(dump)], str(tmp_path / "news"))
+    return NewsIndex(str(tmp_path / "news"))
+
+
+def test_chinese_articles_are_unscored_and_fall_back(tmp_path):
+    today = date.today().isoformat()
+    index = _index(tmp_path, [
+        {"新闻标题": "贵州茅台业绩大增，股价创新高", "新闻内容": "600519 一季度净利润同比增长", "发布时间": today},
+        {"title": "000001 posts excellent results", "date": today},
+        {"新闻标题": "平安银行发布公告", "关键词": "000001", "发布时间": today},
+    ])
+    [(_, _, polarity)] = index.articles("600519")
+    assert math.isnan(polarity)
+
+    analyzer = SentimentAnalyzer(cache=PolarityCache(), news_index=index)
+    # Only Chinese articles: falls back to the mock headlines instead of a flat 50
+    assert analyzer._from_index("600519") is None
+    # Mixed: the English article alone sets the score
+    mixed = analyzer._from_index("000001")
+    assert mixed["score"] > 50
+    assert len(mixed["headlines"]) == 2
@@ -0,0 +1,48 @@
+import asyncio
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from app.models.schemas import AnalysisResponse
+from app.services import pdf_renderer
+from app.services.pdf_renderer import PDFRenderer
+
+
+class FakeGenerator:
+    def generate_pdf(self, analysis, language="en"):
+        # Batch reports render slowly, so a single render finishes (and prunes) mid-batch
+        time.sleep(0.1 if analysis.ticker.startswith("60") else 0)
+        return f"%PDF {analysis.ticker}".encode()
+
+
+def _analysis(ticker: str) -> AnalysisResponse:
+    return AnalysisResponse(
+        ticker=ticker, analysis_date="2024-01-02T00:00:00", current_price=10.0, tech_score=60.0,
+        tech_signal="BUY", indicators={}, sentiment_score=50.0, sentiment_summary="Neutral",
+        news_headlines=[], advice_action="HOLD", advice_rationale="Test", entry_point=None,
+        exit_point=None, overall_score=55.0, summary_text="Test")
+
+
+def test_prune_keeps_pdfs_of_a_running_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_renderer, "_generator", lambda: FakeGenerator())
+    renderer = PDFRenderer(str(tmp_path), max_files=2)
+    renderer._executor = ThreadPoolExecutor(max_workers=2)
+    batch = [_analysis(f"60000{i}") for i in range(6)]
+
+    async def scenario():
+        zip_task = asyncio.ensure_future(renderer.render_batch(batch, fmt="zip"))
+        await asyncio.sleep(0.35)
+        await renderer.render(_analysis("000001"))
+        return await zip_task
+
+    try:
+        path = asyncio.run(scenario())
+    finally:
+        renderer.shutdown()
+
+    with zipfile.ZipFile(path) as archive:
+        assert sorted(archive.namelist()) == sorted(f"report_{a.ticker}.pdf" for a in batch)
+    assert not renderer._pinned
+    # Back under the limit once the batch is done
+    assert len([name for name in os.listdir(tmp_path) if name.endswith((".pdf", ".zip"))]) <= 2
@@ -0,0 +1,41 @@
+import asyncio
+
+import numpy as np
+
+from app.services.bars import FIELDS, Bars
+from app.services.pipeline import AnalysisPipeline, DataNotFoundError
+
+
+class FakeFetcher:
+    async def fetch_bars_async(self, ticker):
+        if ticker == "000000":
+            return Bars.empty_bars()
+        dates = np.arange("2024-01-01", "2024-03-01", dtype="datetime64[D]").astype("datetime64[ns]")
+        return Bars(dates, np.full((len(FIELDS), len(dates)), 10.0))
+
+
+class RecordingAnalyzer:
+    def __init__(self):
+        self.analyzed = []
+
+    def analyze_incremental(self, ticker, bars):
+        self.analyzed.append((ticker, len(bars)))
+
+
+class Forbidden:
+    def __getattr__(self, name):
+        raise AssertionError(f"warm() must not use {name}")
+
+
+def test_warm_only_fetches_and_updates_indicator_state():
+    analyzer = RecordingAnalyzer()
+    pipeline = AnalysisPipeline(FakeFetcher(), analyzer, Forbidden(), Forbidden(),
+                                cache=Forbidden(), history=Forbidden())
+
+    async def scenario():
+        return {code: error async for code, error in pipeline.warm(["600519", "000001", "000000"], concurrency=2)}
+
+    results = asyncio.run(scenario())
+    assert results["600519"] is None and results["000001"] is None
+    assert isinstance(results["000000"], DataNotFoundError)
+    assert sorted(ticker for ticker, _ in analyzer.analyzed) == ["000001", "600519"]
@@ -0,0 +1,36 @@
+import asyncio
+import fcntl
+import os
+import threading
+
+from app.services.rate_limiter import TokenBucket
+
+
+def test_acquire_async_does_not_block_the_loop_on_a_held_lock(tmp_path):
+    state_path = str(tmp_path / "akshare.ratelimit")
+    bucket = TokenBucket(6000, state_path=state_path)
+    # Another process holding the shared state for a while
+    fd = os.open(state_path, os.O_RDWR | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    release = threading.Timer(0.3, lambda: (fcntl.flock(fd, fcntl.LOCK_UN), os.close(fd)))
+    release.start()
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        wait = await bucket.acquire_async()
+        task.cancel()
+        return ticks, wait
+
+    ticks, wait = asyncio.run(scenario())
+    release.join()
+    assert wait == 0.0
+    # The loop kept running while the reservation waited on the lock
+    assert ticks >= 10
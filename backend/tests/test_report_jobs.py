@@ -0,0 +1,27 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "warmup_enabled", False)
+    from app.services import pdf_renderer
+    monkeypatch.setattr(pdf_renderer, "_renderer", None)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("job_id", ["..%5C..%5Cetc%5Cpasswd", "report", "A" * 64, "0" * 63, "0" * 64 + ".pdf"])
+def test_malformed_job_ids_are_404(client, job_id):
+    for url in (f"/api/v1/report/pdf/jobs/{job_id}", f"/api/v1/report/batch/jobs/{job_id}/download"):
+        response = client.get(url)
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Unknown report job"
+
+
+def test_well_formed_unknown_job_id_is_404(client):
+    assert client.get(f"/api/v1/report/pdf/jobs/{'ab' * 32}").status_code == 404
@@ -0,0 +1,38 @@
+from app import screener
+from app.screener import Checkpoints
+
+
+def test_resume_reuses_the_saved_universe(tmp_path, monkeypatch):
+    root = str(tmp_path / "checkpoints")
+    Checkpoints(root, ["600519", "000001", "300750"], 2).open(resume=False, prices={"600519": 1700.0})
+
+    def new_snapshot(tickers, tickers_file):
+        raise AssertionError("a resumed run must not take a new spot snapshot")
+
+    calls = {}
+
+    def fake_screen(tickers, prices, workers, shard_size, checkpoints, resume, sentiment):
+        calls.update(tickers=tickers, prices=prices, shard_size=shard_size,
+                     done=checkpoints.open(resume, prices))
+        return [{"ticker": ticker, "error": "skipped"} for ticker in tickers], {}
+
+    monkeypatch.setattr(screener, "load_universe", new_snapshot)
+    monkeypatch.setattr(screener, "screen", fake_screen)
+    monkeypatch.setattr(screener, "write", lambda df, path: None)
+    assert screener.main(["--checkpoint-dir", root, "--resume", "--shard-size", "2", "--workers", "1"]) == 0
+    assert calls["tickers"] == ["600519", "000001", "300750"]
+    assert calls["prices"] == {"600519": 1700.0}
+
+
+def test_shard_size_is_clamped_once(tmp_path, monkeypatch):
+    root = str(tmp_path / "checkpoints")
+    seen = {}
+
+    def fake_screen(tickers, prices, workers, shard_size, checkpoints, resume, sentiment):
+        seen.update(shard_size=shard_size, manifest=checkpoints.manifest["shard_size"])
+        return [{"ticker": ticker, "error": "skipped"} for ticker in tickers], {}
+
+    monkeypatch.setattr(screener, "screen", fake_screen)
+    monkeypatch.setattr(screener, "write", lambda df, path: None)
+    screener.main(["--tickers", "600519", "--checkpoint-dir", root, "--shard-size", "0"])
+    assert seen == {"shard_size": 1, "manifest": 1}
@@ -0,0 +1,17 @@
+from app.services.sentiment import PolarityCache, SentimentAnalyzer
+
+
+def _analyzer() -> SentimentAnalyzer:
+    return SentimentAnalyzer(cache=PolarityCache(), news_index=None)
+
+
+def test_identical_calls_score_identically():
+    first = _analyzer().analyze("600519")
+    second = _analyzer().analyze("600519")
+    assert first == second
+    assert _analyzer().analyze_batch(["600519", "000001"])["600519"] == first
+
+
+def test_noise_still_varies_across_tickers():
+    scores = {_analyzer().analyze(code)["score"] for code in ("600519", "000001", "300750", "688981")}
+    assert len(scores) > 1
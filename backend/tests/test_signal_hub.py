@@ -0,0 +1,61 @@
+import asyncio
+
+import numpy as np
+
+from app.models.schemas import AnalysisResponse
+from app.services.bars import FIELDS, Bars
+from app.services.signal_hub import SignalHub
+
+
+class FakePipeline:
+    def __init__(self):
+        self.close = 10.0
+        self.runs = 0
+
+    async def fetch(self, ticker):
+        dates = np.arange("2024-01-01", "2024-02-01", dtype="datetime64[D]").astype("datetime64[ns]")
+        block = np.full((len(FIELDS), len(dates)), 10.0)
+        block[FIELDS.index("Close"), -1] = self.close
+        return Bars(dates, block)
+
+    async def run(self, ticker, bars=None):
+        self.runs += 1
+        price = float(bars["Close"][-1])
+        return AnalysisResponse(
+            ticker=ticker, analysis_date=f"run-{self.runs}", current_price=price, tech_score=60.0,
+            tech_signal="BUY", indicators={}, sentiment_score=50.0, sentiment_summary="Neutral",
+            news_headlines=[], advice_action="HOLD", advice_rationale="Test", entry_point=None,
+            exit_point=None, overall_score=55.0, summary_text="Test")
+
+
+def test_refresh_recomputes_only_when_the_last_bar_changes():
+    pipeline = FakePipeline()
+    hub = SignalHub(lambda: pipeline, interval=0.01)
+
+    async def scenario():
+        subscription = hub.subscribe(["600519"])
+        await asyncio.sleep(0.2)
+        runs_unchanged = pipeline.runs
+        pipeline.close = 11.0
+        await asyncio.sleep(0.1)
+        hub.unsubscribe(subscription)
+        await hub.stop()
+        events = []
+        while not subscription.queue.empty():
+            events.append(subscription.queue.get_nowait())
+        return runs_unchanged, events
+
+    runs_unchanged, events = asyncio.run(scenario())
+    assert runs_unchanged == 1
+    assert pipeline.runs == 2
+    assert [event.split("\n")[0] for event in events] == ["event: snapshot", "event: delta"]
+
+
+def test_hub_pipelines_record_no_history(monkeypatch):
+    from app.api import endpoints
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "history_enabled", True)
+    monkeypatch.setattr(endpoints, "get_history_store", lambda: "history")
+    assert endpoints.build_pipeline().history == "history"
+    assert endpoints.build_pipeline(record_history=False).history is None
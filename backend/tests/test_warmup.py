@@ -0,0 +1,63 @@
+import asyncio
+import fcntl
+import os
+
+from app.core.config import settings
+from app.services.warmup import WarmupScheduler
+
+
+class SlowPipeline:
+    async def warm(self, tickers, concurrency):
+        for code in tickers:
+            await asyncio.sleep(0.05)
+            yield code, None
+
+
+def _scheduler() -> WarmupScheduler:
+    return WarmupScheduler(SlowPipeline, watchlist=["600519", "000001"])
+
+
+async def _trigger(scheduler: WarmupScheduler) -> bool:
+    # trigger() schedules its run on the running loop
+    return scheduler.trigger()
+
+
+def test_trigger_refused_while_a_scheduled_run_is_going(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    scheduler = _scheduler()
+
+    async def scenario():
+        scheduled = asyncio.ensure_future(scheduler.run_once())
+        await asyncio.sleep(0.01)
+        refused = scheduler.trigger()
+        await scheduled
+        return refused
+
+    assert asyncio.run(scenario()) is False
+    assert scheduler.status.state == "done"
+    assert scheduler.status.done == 2
+
+
+def test_trigger_refused_while_another_worker_holds_the_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    fd = os.open(os.path.join(tmp_path, "warmup.lock"), os.O_RDWR | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    try:
+        scheduler = _scheduler()
+        assert asyncio.run(_trigger(scheduler)) is False
+        assert scheduler.status.state == "idle"
+    finally:
+        os.close(fd)
+
+
+def test_overlapping_triggers_start_one_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    scheduler = _scheduler()
+
+    async def scenario():
+        results = [scheduler.trigger(), scheduler.trigger()]
+        await scheduler._run_task
+        return results
+
+    assert asyncio.run(scenario()) == [True, False]
+    assert scheduler.status.done == 2